@@ -0,0 +1,209 @@
+from engine import step_padded
+from geometry import Geometry
+from history import cell_keys
+from rule import Rule
+from world import World
+import numpy
+
+
+class WorldBatch(object):
+    """
+    Many worlds of the same size and geometry, kept as one (boards, rows,
+    columns) array and stepped together by one call to step_padded, so
+    thousands of small worlds cost about what one big world does. Every
+    generation each board is hashed (like the CycleDetector, 64 cells at a
+    time) and compared with its last maxPeriod hashes. A board that repeats,
+    or that reaches maxGenerations, is retired: it stops being stepped and
+    its lifetime, period and population are kept, while the rest of the
+    batch goes on. The boards still running are kept together at the front
+    of the array so that stepping them needs no copying. Cycles longer than
+    maxPeriod aren't noticed.
+    """
+
+    maxPeriod = 256
+
+    def __init__(self, boards, rows, columns, geometry='bowl', maxGenerations=None, rule='B3/S23'):
+        """
+        :param boards: how many worlds.
+        :param rows: rows in every world.
+        :param columns: columns in every world.
+        :param geometry: a key to the bounded Geometry.geometries.
+        :param maxGenerations: retire boards that haven't repeated by this
+                               generation, or None to run until they do.
+        :param rule: the rule every board runs by, a Rule or a B/S string.
+        """
+        if geometry not in Geometry.bounded:
+            raise ValueError(f'Geometry must be in {Geometry.bounded}.')
+        self.__boards = boards
+        self.__rows = rows
+        self.__columns = columns
+        self.__geometry = geometry
+        self.__rule = Rule.get(rule)
+        if self.__rule.range > 1:
+            raise ValueError(f'A batch can\'t run Larger than Life rules like {self.__rule}.')
+        self.__halo = Geometry.get(geometry).halo(rows, columns)
+        self.__maxGenerations = maxGenerations
+        self.__cells = numpy.zeros((boards, rows, columns), dtype=numpy.uint8)
+        self.__padded = numpy.zeros((boards, rows + 2, columns + 2), dtype=numpy.uint8)
+        #
+        # slots[n] is which board is in place n of the arrays. The first
+        # running of them are still being stepped.
+        #
+        self.__slots = numpy.arange(boards)
+        self.__running = boards
+        self.__generation = 0
+        self.__hashes = numpy.zeros((boards, WorldBatch.maxPeriod), dtype=numpy.uint64)
+        self.__lifetimes = numpy.full(boards, -1, dtype=numpy.int64)
+        self.__periods = numpy.zeros(boards, dtype=numpy.int64)
+        self.__steps = numpy.zeros(boards, dtype=numpy.int64)
+        self.__populations = numpy.zeros(boards, dtype=numpy.int64)
+
+    def get_boards(self):
+        return self.__boards
+
+    def get_rows(self):
+        return self.__rows
+
+    def get_columns(self):
+        return self.__columns
+
+    def get_rule(self):
+        return self.__rule
+
+    def get_generation(self):
+        return self.__generation
+
+    def get_running(self):
+        """Return the numbers of the boards that are still being stepped."""
+        return numpy.sort(self.__slots[:self.__running])
+
+    def place_of(self, board):
+        return int(numpy.flatnonzero(self.__slots == board)[0])
+
+    def get_board(self, board):
+        """Return a copy of one board as a (rows, columns) uint8 array."""
+        return self.__cells[self.place_of(board)].copy()
+
+    def set_board(self, board, cells):
+        """Replace one board, which can only be done before stepping."""
+        if self.__generation:
+            raise ValueError('Boards can only be set before the batch is stepped.')
+        self.__cells[self.place_of(board)] = numpy.asarray(cells).reshape(self.__rows, self.__columns) != 0
+
+    def randomize(self, percents, seed=None):
+        """
+        Make every board random.
+        :param percents: the percent of cells alive, for every board or as an
+                         array with one for each board.
+        :param seed: seed for the random numbers, or None for a new one.
+        :return: None
+        """
+        if self.__generation:
+            raise ValueError('Boards can only be set before the batch is stepped.')
+        percents = numpy.broadcast_to(numpy.asarray(percents, dtype=float), (self.__boards,))
+        thresholds = numpy.round(numpy.clip(percents, 0, 100) * 65536 / 100)
+        numbers = numpy.random.default_rng(seed).integers(0, 65536, size=self.__cells.shape, dtype=numpy.uint16)
+        self.__cells[:] = numbers < thresholds[self.__slots, None, None]
+
+    def get_world(self, board):
+        """Return one board as a normal World, at the generation it is on."""
+        world = World(self.__rows, self.__columns)
+        world.set_geometry(self.__geometry)
+        world.set_rule(self.__rule)
+        world.set_cells(self.get_board(board))
+        world.set_generation(int(self.__steps[board]))
+        return world
+
+    def get_lifetimes(self):
+        """Return the generation each board's cycle started in, or -1 for the
+        boards that haven't repeated."""
+        return self.__lifetimes.copy()
+
+    def get_periods(self):
+        """Return the period of each board's cycle, or 0."""
+        return self.__periods.copy()
+
+    def get_steps(self):
+        """Return how many generations each board has been stepped."""
+        return self.__steps.copy()
+
+    def get_populations(self):
+        """Return how many cells are alive on each board."""
+        running = self.__slots[:self.__running]
+        self.__populations[running] = numpy.count_nonzero(self.__cells[:self.__running], axis=(1, 2))
+        return self.__populations.copy()
+
+    def hash_boards(self, cells):
+        """Return the 64 bit Zobrist hash of every board in a stack."""
+        packed = numpy.packbits(cells.reshape(len(cells), -1), axis=1)
+        words = numpy.zeros((len(cells), (packed.shape[1] + 7) // 8 * 8), dtype=numpy.uint8)
+        words[:, :packed.shape[1]] = packed
+        words = words.view('<u8')
+        keys = cell_keys(numpy.arange(words.shape[1])[None, :], words)
+        return numpy.bitwise_xor.reduce(keys, axis=1)
+
+    def record(self):
+        """Hash the running boards and retire the ones that repeated."""
+        running = self.__running
+        if not running:
+            return
+        hashes = self.hash_boards(self.__cells[:running])
+        generation = self.__generation
+        slot = generation % WorldBatch.maxPeriod
+        #
+        # periods[n] is how long ago the hash in column n was recorded;
+        # columns that were never written are ignored.
+        #
+        periods = (slot - numpy.arange(WorldBatch.maxPeriod) - 1) % WorldBatch.maxPeriod + 1
+        matches = (self.__hashes[:running] == hashes[:, None]) & (periods <= generation)
+        repeated = matches.any(axis=1)
+        self.__hashes[:running, slot] = hashes
+        boards = self.__slots[:running]
+        if repeated.any():
+            period = numpy.where(matches[repeated], periods, WorldBatch.maxPeriod + 1).min(axis=1)
+            self.__periods[boards[repeated]] = period
+            self.__lifetimes[boards[repeated]] = generation - period
+        retired = repeated
+        if self.__maxGenerations is not None and generation >= self.__maxGenerations:
+            retired = numpy.ones(running, dtype=bool)
+        if retired.any():
+            self.retire(retired)
+
+    def retire(self, retired):
+        """Stop stepping the running boards where retired is True, moving
+        the boards still running to the front."""
+        running = self.__running
+        self.__populations[self.__slots[:running][retired]] = numpy.count_nonzero(
+            self.__cells[:running][retired], axis=(1, 2))
+        order = numpy.concatenate((numpy.flatnonzero(~retired), numpy.flatnonzero(retired)))
+        for array in (self.__cells, self.__slots, self.__hashes):
+            array[:running] = array[:running][order]
+        self.__running = int(numpy.count_nonzero(~retired))
+
+    def step(self):
+        """Advance every running board one generation."""
+        if self.__generation == 0:
+            self.record()
+        running = self.__running
+        if not running:
+            return
+        cells = self.__cells[:running]
+        padded = self.__padded[:running]
+        padded[:, 1:-1, 1:-1] = cells
+        haloRows, haloColumns, sourceRows, sourceColumns = self.__halo
+        padded[:, haloRows, haloColumns] = cells[:, sourceRows, sourceColumns]
+        step_padded(padded, cells, rule=self.__rule)
+        self.__steps[self.__slots[:running]] += 1
+        self.__generation += 1
+        self.record()
+
+    def run(self, generations=None):
+        """
+        Step until every board is retired, or for a number of generations.
+        :return: how many boards are still running.
+        """
+        generation = 0
+        while self.__running and (generations is None or generation < generations):
+            self.step()
+            generation += 1
+        return self.__running
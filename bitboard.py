@@ -0,0 +1,228 @@
+from geometry import Geometry
+from rule import Rule
+import numpy
+
+
+class BitboardEngine(object):
+    """
+    Steps a world that is stored one bit per cell. Each row is packed into
+    64 bit words (column 0 is the lowest bit of the first word), so one
+    bitwise operation works on 64 cells at once. The neighbor counts are
+    never stored as numbers; they are added up bit by bit with full adder
+    logic across the shifted rows. The cells just off the edges are read
+    from the geometry's halo map every generation, which only costs as
+    much as the edges are long. Rules other than Life have to be
+    totalistic, since only the totals of the blocks of nine are worked out.
+    """
+
+    name = 'bitboard'
+
+    geometries = Geometry.bounded
+
+    wordType = numpy.dtype('<u8')
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__words = (columns + 63) // 64
+        self.__board = numpy.zeros((rows, self.__words), dtype=BitboardEngine.wordType)
+        #
+        # The unused bits at the end of the last word have to stay dead, or
+        # they would leak into the last column when the rows are shifted.
+        #
+        self.__lastBit = (columns - 1) % 64
+        self.__mask = numpy.full(self.__words, 0xFFFFFFFFFFFFFFFF, dtype=BitboardEngine.wordType)
+        self.__mask[-1] = (1 << (self.__lastBit + 1)) - 1
+        self.__rule = Rule.get('B3/S23')
+        self.set_geometry(geometry)
+
+    def set_rule(self, rule):
+        """Change the rule to a totalistic Rule."""
+        if not rule.totalistic:
+            raise ValueError(f'The bitboard engine can only run totalistic rules, not {rule}.')
+        self.__rule = rule
+
+    def get_cells(self):
+        """Returns the board unpacked into a (rows, columns) uint8 array."""
+        bits = numpy.unpackbits(self.__board.view(numpy.uint8), axis=1, bitorder='little')
+        return bits[:, :self.__columns]
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        cells = numpy.asarray(cells, dtype=numpy.uint8).reshape(self.__rows, self.__columns)
+        padded = numpy.zeros((self.__rows, self.__words * 64), dtype=numpy.uint8)
+        padded[:, :self.__columns] = cells != 0
+        packed = numpy.packbits(padded, axis=1, bitorder='little')
+        self.__board = packed.view(BitboardEngine.wordType).copy()
+
+    def get_cell(self, row, column):
+        word = int(self.__board[row, column >> 6])
+        return bool((word >> (column & 63)) & 1)
+
+    def set_cell(self, row, column, living):
+        word = int(self.__board[row, column >> 6])
+        bit = 1 << (column & 63)
+        if living:
+            word |= bit
+        else:
+            word &= ~bit & 0xFFFFFFFFFFFFFFFF
+        self.__board[row, column >> 6] = word
+
+    def get_positions(self, rows, columns):
+        """Returns the cells at arrays of rows and columns, as uint8."""
+        words = self.__board[rows, columns >> 6]
+        return ((words >> (columns & 63).astype(BitboardEngine.wordType)) & 1).astype(numpy.uint8)
+
+    def set_positions(self, rows, columns, living):
+        """Set the cells at arrays of rows and columns to an array of 0s and 1s."""
+        bits = numpy.left_shift(1, (columns & 63).astype(BitboardEngine.wordType), dtype=BitboardEngine.wordType)
+        living = numpy.asarray(living, dtype=bool)
+        numpy.bitwise_and.at(self.__board, (rows[~living], columns[~living] >> 6), ~bits[~living])
+        numpy.bitwise_or.at(self.__board, (rows[living], columns[living] >> 6), bits[living])
+
+    def set_geometry(self, geometry):
+        """
+        Split the geometry's halo map into the four edges: the top and
+        bottom rows (columns -1 to columns) and the left and right columns.
+        """
+        haloRows, haloColumns, sourceRows, sourceColumns = Geometry.get(geometry).halo(self.__rows, self.__columns)
+        self.__halo = []
+        for edge in [haloRows == 0, haloRows == self.__rows + 1,
+                     (haloColumns == 0) & (haloRows > 0) & (haloRows <= self.__rows),
+                     (haloColumns == self.__columns + 1) & (haloRows > 0) & (haloRows <= self.__rows)]:
+            self.__halo.append((haloRows[edge], haloColumns[edge],
+                                sourceRows[edge], sourceColumns[edge] >> 6,
+                                (sourceColumns[edge] & 63).astype(BitboardEngine.wordType)))
+
+    def read_edge(self, edge, length, byRow):
+        """Return one edge of the halo as an array of 0s and 1s."""
+        haloRows, haloColumns, sourceRows, sourceWords, sourceBits = self.__halo[edge]
+        values = numpy.zeros(length, dtype=numpy.uint8)
+        bits = (self.__board[sourceRows, sourceWords] >> sourceBits) & 1
+        if byRow:
+            values[haloRows - 1] = bits
+        else:
+            values[haloColumns] = bits
+        return values
+
+    def pack_row_sums(self, haloRow):
+        """Add up each cell of a halo row (columns -1 to columns) with its
+        left and right neighbors and return the two bits of the sums packed
+        like a row of the board."""
+        sums = haloRow[:-2] + haloRow[1:-1] + haloRow[2:]
+        bits = numpy.zeros((2, self.__words * 64), dtype=numpy.uint8)
+        bits[0, :self.__columns] = sums & 1
+        bits[1, :self.__columns] = sums >> 1
+        packed = numpy.packbits(bits, axis=1, bitorder='little')
+        return packed.view(BitboardEngine.wordType)
+
+    def population(self):
+        return int(numpy.bitwise_count(self.__board).sum())
+
+    def west(self, board, leftEdge):
+        """Return the board where every cell holds the value of the cell to
+        its left (the left neighbor of each cell)."""
+        shifted = board << 1
+        shifted[:, 1:] |= board[:, :-1] >> 63
+        shifted[:, 0] |= leftEdge
+        shifted &= self.__mask
+        return shifted
+
+    def east(self, board, rightEdge):
+        """Return the board where every cell holds the value of the cell to
+        its right."""
+        shifted = board >> 1
+        shifted[:, :-1] |= board[:, 1:] << 63
+        shifted[:, -1] |= rightEdge.astype(BitboardEngine.wordType) << self.__lastBit
+        return shifted
+
+    def north(self, board, topRow):
+        """Return the board where every row holds the row above it."""
+        shifted = numpy.empty_like(board)
+        shifted[1:] = board[:-1]
+        shifted[0] = topRow
+        return shifted
+
+    def south(self, board, bottomRow):
+        """Return the board where every row holds the row below it."""
+        shifted = numpy.empty_like(board)
+        shifted[:-1] = board[1:]
+        shifted[-1] = bottomRow
+        return shifted
+
+    def step(self):
+        """Advance the board one generation."""
+        board = self.__board
+        rows = self.__rows
+        columns = self.__columns
+        top = self.pack_row_sums(self.read_edge(0, columns + 2, False))
+        bottom = self.pack_row_sums(self.read_edge(1, columns + 2, False))
+        #
+        # Add each cell to its left and right neighbors. The sum of three
+        # bits is a two bit number: ones0 is the low bit, ones1 the high.
+        #
+        west = self.west(board, self.read_edge(2, rows, True))
+        east = self.east(board, self.read_edge(3, rows, True))
+        westXorCenter = west ^ board
+        ones0 = westXorCenter ^ east
+        ones1 = (west & board) | (east & westXorCenter)
+        #
+        # Add the row sums from above, here and below. The low bits add up
+        # to sum0 (worth 1) and a carry (worth 2), the high bits to twos0
+        # (worth 2) and fours (worth 4).
+        #
+        above0 = self.north(ones0, top[0])
+        below0 = self.south(ones0, bottom[0])
+        above1 = self.north(ones1, top[1])
+        below1 = self.south(ones1, bottom[1])
+        sum0 = above0 ^ ones0 ^ below0
+        carry = (above0 & ones0) | (below0 & (above0 ^ ones0))
+        twos0 = above1 ^ ones1 ^ below1
+        fours = (above1 & ones1) | (below1 & (above1 ^ ones1))
+        #
+        # Put the carry into the twos and the twos' carry into the fours.
+        # The total of the block of nine is then
+        # sum0 + 2 * sum1 + 4 * sum2 + 8 * sum3.
+        #
+        sum1 = carry ^ twos0
+        twosCarry = carry & twos0
+        sum2 = fours ^ twosCarry
+        sum3 = fours & twosCarry
+        if not self.__rule.is_life():
+            self.__board = self.apply_rule((sum0, sum1, sum2, sum3), board) & self.__mask
+            return
+        #
+        # The block of nine includes the cell itself: a total of 3 means
+        # birth or survival, a total of 4 means survival for a live cell.
+        #
+        three = sum0 & sum1 & ~sum2
+        four = ~sum0 & ~sum1 & sum2 & board
+        self.__board = (three | four) & ~sum3 & self.__mask
+
+    def apply_rule(self, sums, board):
+        """
+        Work out the next generation by a totalistic rule from the bits of
+        the totals of the blocks of nine.
+        :param sums: (sum0, sum1, sum2, sum3), the bits of the totals.
+        :param board: the board this generation.
+        :return: the next board (the unused bits aren't cleared).
+        """
+        following = numpy.zeros_like(board)
+        #
+        # A dead cell is born when the total is in the rule's births and a
+        # live cell survives when the total less itself is in its
+        # survivals.
+        #
+        for total in range(10):
+            born = total in self.__rule.born
+            survives = total - 1 in self.__rule.survive
+            if not born and not survives:
+                continue
+            if born and survives:
+                matches = numpy.full_like(board, 0xFFFFFFFFFFFFFFFF)
+            else:
+                matches = board if survives else ~board
+            for place, bits in enumerate(sums):
+                matches = matches & (bits if (total >> place) & 1 else ~bits)
+            following |= matches
+        return following
@@ -41,14 +41,21 @@ class Cell(object):
         Cell.displaySets[key] = {'liveChar': alive, 'deadChar': dead}
 
 
-    def __init__(self, row, column):
+    __slots__ = ('__row', '__column', '__living', '__neighbors', '__world')
+
+    def __init__(self, row, column, world=None):
         """Given a row and a column, creates a cell that knows its row,
            column, living (all cells start off with living as False), and
-           neighbors (all cells start off with an empty list for neighbors)."""
+           neighbors (all cells start off with an empty list for neighbors).
+           Given a world as well, the cell is only a view of that position
+           in the world: it keeps no state of its own, living reads and
+           writes the world, and its neighbors come from the world."""
         self.__row = row
         self.__column = column
-        self.living = False
-        self.__neighbors = []
+        self.__world = world
+        if world is None:
+            self.__living = False
+            self.__neighbors = []
 
     def __str__(self):
         """Returns either the liveChar or the deadChar for the Cell class
@@ -58,6 +65,19 @@ class Cell(object):
         else:
             return Cell.deadChar
 
+    @property
+    def living(self):
+        if self.__world is None:
+            return self.__living
+        return self.__world.is_living(self.__row, self.__column)
+
+    @living.setter
+    def living(self, state):
+        if self.__world is None:
+            self.__living = state
+        else:
+            self.__world.set_cell(self.__row, self.__column, state)
+
     def get_living(self):
         """Returns whether the cell is alive."""
         return self.living
@@ -81,11 +101,21 @@ class Cell(object):
         # out you know all the neighbors are working.
         #
         #print(f'{self.__repr__()} add neighbor {cell.__repr__()}')
+        if self.__world is not None:
+            raise TypeError('the neighbors of a view come from its world.')
         self.__neighbors.append(cell)
 
+    def get_neighbors(self):
+        """Returns a list of the neighboring cells. For a view these are made
+        on demand from the world's topology."""
+        if self.__world is None:
+            return self.__neighbors
+        return [Cell(row, column, self.__world)
+                for row, column in self.__world.neighbors_of(self.__row, self.__column)]
+
     def living_neighbors(self):
         neighborCount = 0
-        for neighbor in self.__neighbors:
+        for neighbor in self.get_neighbors():
             if neighbor.get_living() == True:
                 neighborCount += 1
         return neighborCount
@@ -99,8 +129,9 @@ class Cell(object):
 
     def debug(self):
         """Sometimes you just need to know about a cell."""
-        neighbors = len(self.__neighbors)
+        allNeighbors = self.get_neighbors()
+        neighbors = len(allNeighbors)
         string = self.__repr__() + f' neighbors: {self.living_neighbors()}/{neighbors}'
-        for neighbor in self.__neighbors:
+        for neighbor in allNeighbors:
             string += '\n     ' + neighbor.__repr__()
         print(string)
\ No newline at end of file
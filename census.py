@@ -0,0 +1,316 @@
+from collections import Counter
+from hashlife import HashLifeEngine
+from rule import Rule
+from sparse import SparseEngine
+from topology import Topology
+from world import World
+import json
+import numpy
+import os
+
+
+def phase_key(cells):
+    """
+    Return the same string for a pattern however it is turned or flipped:
+    the smallest of the keys of its eight orientations, where a key is the
+    size of the pattern and its cells packed into hex.
+    :param cells: (rows, columns) array of 0s and 1s, trimmed to the pattern.
+    :return: string like '2x2:f0'.
+    """
+    cells = numpy.asarray(cells, dtype=numpy.uint8)
+    keys = []
+    for turned in (cells, cells.T):
+        for flipped in (turned, turned[::-1], turned[:, ::-1], turned[::-1, ::-1]):
+            keys.append(f'{flipped.shape[0]}x{flipped.shape[1]}:' +
+                        numpy.packbits(flipped).tobytes().hex())
+    return min(keys)
+
+
+def trim(positions):
+    """Turn a collection of (row, column) positions into the smallest array
+    that holds them, and return it with the top left corner."""
+    positions = numpy.array(list(positions), dtype=numpy.int64).reshape(-1, 2)
+    top, left = positions.min(axis=0)
+    bottom, right = positions.max(axis=0)
+    cells = numpy.zeros((bottom - top + 1, right - left + 1), dtype=numpy.uint8)
+    cells[positions[:, 0] - top, positions[:, 1] - left] = 1
+    return cells, (int(top), int(left))
+
+
+def unwrap(values, size):
+    """Move a run of positions on a circle of size so it doesn't wrap
+    around the edge, by starting the circle at the biggest gap."""
+    used = numpy.unique(values)
+    if len(used) < 2 or used[0] != 0 or used[-1] != size - 1:
+        return values
+    gaps = numpy.diff(numpy.concatenate((used, [used[0] + size])))
+    if gaps.max() <= 1:
+        return values
+    start = used[(numpy.argmax(gaps) + 1) % len(used)]
+    return (values - start) % size
+
+
+class Census(object):
+    """
+    Says what is left of a world once it has settled down: how many blocks,
+    blinkers, beehives, gliders and so on. Cells are grouped into objects
+    by their 8 neighbors, over every phase of the world's cycle (up to
+    envelopeGenerations of them), so an object like a beacon, whose halves
+    only touch in one phase, isn't split in two. Each object is then looked
+    up by its phase_key in a cache of the objects that have been seen
+    before. Only a new object is run on its own to find its period and how
+    far it moves in a period; every phase of it goes into the cache then,
+    so a typical soup is all cache hits. The cache and the running totals
+    can be kept in a JSON file, so a census adds up over many runs.
+
+    Objects are run by the world's rule, and the cache is kept apart for
+    every rule, since the same cells can be a still life by one rule and
+    die by another. Rules with B0 and Larger than Life rules can't be
+    counted: with B0 nothing is ever left on its own, and a range rule's
+    objects aren't made of cells next to each other.
+
+    Objects are named the way apgsearch does: xs for still lifes, xp for
+    oscillators and xq for spaceships, then the population (still lifes)
+    or period, then part of a hash. The common ones have their usual names.
+    """
+
+    envelopeGenerations = 16
+
+    #
+    # Objects that don't repeat within this many generations on their own
+    # are counted as unknown.
+    #
+    maxPeriod = 64
+
+    common = {'block': ['OO', 'OO'],
+              'beehive': ['.OO.', 'O..O', '.OO.'],
+              'loaf': ['.OO.', 'O..O', '.O.O', '..O.'],
+              'boat': ['OO.', 'O.O', '.O.'],
+              'ship': ['OO.', 'O.O', '.OO'],
+              'tub': ['.O.', 'O.O', '.O.'],
+              'pond': ['.OO.', 'O..O', 'O..O', '.OO.'],
+              'long boat': ['OO..', 'O.O.', '.O.O', '..O.'],
+              'barge': ['.O..', 'O.O.', '.O.O', '..O.'],
+              'blinker': ['OOO'],
+              'toad': ['.OOO', 'OOO.'],
+              'beacon': ['OO..', 'OO..', '..OO', '..OO'],
+              'glider': ['.O.', '..O', 'OOO']}
+
+    def __init__(self, filename=None):
+        """
+        :param filename: a JSON file to keep the cache and totals in, or
+                         None to keep them only in memory.
+        """
+        self.__filename = filename
+        self.__phases = {}
+        self.__objects = {}
+        self.__totals = Counter()
+        if filename is not None and os.path.exists(filename):
+            with open(filename, 'r') as cacheFile:
+                saved = json.load(cacheFile)
+            self.__phases = saved['phases']
+            #
+            # Caches from before rules were kept apart are all Life.
+            #
+            if any(isinstance(name, str) for name in self.__phases.values()):
+                self.__phases = {'B3/S23': self.__phases}
+            self.__objects = saved['objects']
+            self.__totals = Counter(saved['totals'])
+        self.__hits = 0
+        self.__misses = 0
+        if not self.__objects:
+            for name, rows in Census.common.items():
+                positions = [(row, column) for row, text in enumerate(rows)
+                             for column, letter in enumerate(text) if letter == 'O']
+                self.study(positions, name)
+
+    def save(self, filename=None):
+        """Write the cache and totals to the file."""
+        filename = filename if filename is not None else self.__filename
+        with open(filename, 'w') as cacheFile:
+            json.dump({'phases': self.__phases, 'objects': self.__objects,
+                       'totals': self.__totals}, cacheFile)
+
+    def get_totals(self):
+        """Return a Counter of every object counted so far."""
+        return Counter(self.__totals)
+
+    def get_object(self, name):
+        """Return what is known about an object: period, displacement,
+        population and key."""
+        return self.__objects[name]
+
+    def get_cache_stats(self):
+        """Returns (hits, misses)."""
+        return self.__hits, self.__misses
+
+    def check_rule(self, rule):
+        """Return a rule as a Rule, or raise a ValueError if the census
+        can't count it."""
+        rule = Rule.get(rule)
+        if rule.range > 1:
+            raise ValueError(f'The census can\'t count Larger than Life rules like {rule}.')
+        if rule.births_from_nothing():
+            raise ValueError(f'The census can\'t count {rule}, where cells are born with no neighbors.')
+        return rule
+
+    def study(self, positions, name=None, rule='B3/S23'):
+        """
+        Run an object on its own to find its period and how far it moves,
+        and put every phase of it into the cache.
+        :param positions: (row, column) positions of the object's cells.
+        :param name: what to call it, or None to make up a name.
+        :param rule: the rule to run it by, a Rule or a B/S string.
+        :return: the object's name.
+        """
+        rule = self.check_rule(rule)
+        #
+        # The sparse engine is quickest for small objects but only runs
+        # totalistic rules; HashLife runs the rest.
+        #
+        engine = SparseEngine(1, 1, 'plane') if rule.totalistic else HashLifeEngine(1, 1, 'plane')
+        engine.set_rule(rule)
+        engine.set_living(positions)
+        first, corner = trim(positions)
+        phases = [phase_key(first)]
+        period = None
+        for generation in range(1, Census.maxPeriod + 1):
+            engine.step()
+            living = engine.get_living()
+            if not living:
+                break
+            cells, newCorner = trim(living)
+            if cells.shape == first.shape and (cells == first).all():
+                period = generation
+                displacement = sorted([abs(newCorner[0] - corner[0]), abs(newCorner[1] - corner[1])])
+                break
+            phases.append(phase_key(cells))
+        population = len(positions)
+        key = min(phases)
+        if name is None:
+            if period is None:
+                name = f'zz_{population}'
+            else:
+                if period == 1:
+                    prefix = f'xs{population}'
+                elif displacement == [0, 0]:
+                    prefix = f'xp{period}'
+                else:
+                    prefix = f'xq{period}'
+                name = f'{prefix}_{key.split(":")[1][:8]}'
+                #
+                # Different objects with the same start, or the same start
+                # by different rules, get told apart.
+                #
+                while name in self.__objects and (self.__objects[name]['key'] != key or
+                                                  self.__objects[name].get('rule', 'B3/S23') != str(rule)):
+                    name += '+'
+        ruleKey = str(rule)
+        phaseNames = self.__phases.setdefault(ruleKey, {})
+        if period is None:
+            phaseNames[phase_key(first)] = name
+            self.__objects.setdefault(name, {'period': 0, 'displacement': None,
+                                             'population': population, 'key': key, 'rule': ruleKey})
+        else:
+            for phase in phases:
+                phaseNames[phase] = name
+            self.__objects[name] = {'period': period, 'displacement': displacement,
+                                    'population': population, 'key': key, 'rule': ruleKey}
+        return name
+
+    def classify(self, positions, rule='B3/S23'):
+        """Return the name of the object with the given cells, run by a
+        rule."""
+        rule = Rule.get(rule)
+        cells, corner = trim(positions)
+        name = self.__phases.get(str(rule), {}).get(phase_key(cells))
+        if name is None:
+            self.__misses += 1
+            name = self.study([(int(row), int(column)) for row, column in numpy.argwhere(cells)], rule=rule)
+        else:
+            self.__hits += 1
+        return name
+
+    def objects(self, world, period=None):
+        """
+        Split a world into objects.
+        :param world: a World on a bounded geometry.
+        :param period: the period of the world's cycle, or None to ask the
+                       world.
+        :return: list of arrays of the (row, column) positions of each object.
+        """
+        rule = self.check_rule(world.get_rule())
+        rows = world.get_rows()
+        columns = world.get_columns()
+        cells = numpy.array(world.get_cells(), dtype=numpy.uint8)
+        #
+        # Add up every phase of the cycle, so objects that fall apart in
+        # some phases are still one object.
+        #
+        if period is None:
+            cycle = world.get_cycle()
+            period = cycle[1] if cycle else 1
+        phases = max(1, min(period, Census.envelopeGenerations))
+        envelope = cells.copy()
+        if phases > 1:
+            copy = World(rows, columns)
+            copy.set_history(False)
+            copy.set_geometry(world.get_geometry())
+            copy.set_rule(rule)
+            copy.set_cells(cells)
+            for phase in range(phases - 1):
+                copy.next_generation()
+                envelope |= copy.get_cells()
+        #
+        # Label the living cells of the envelope: every cell starts with its
+        # own number and takes the smallest number of its neighbors until
+        # nothing changes.
+        #
+        neighbors = Topology.get(rows, columns, world.get_geometry()).neighbors
+        alive = numpy.flatnonzero(envelope)
+        if not alive.size:
+            return []
+        labels = numpy.full(rows * columns + 1, rows * columns, dtype=numpy.int64)
+        labels[alive] = alive
+        around = neighbors[:, alive]
+        while True:
+            smallest = numpy.minimum(labels[alive], labels[around].min(axis=0))
+            if (smallest == labels[alive]).all():
+                break
+            labels[alive] = smallest
+            #
+            # Jump straight to the label's label, which halves the number
+            # of rounds for long objects.
+            #
+            labels[alive] = labels[labels[alive]]
+        living = alive[cells.ravel()[alive] == 1]
+        order = numpy.argsort(labels[living], kind='stable')
+        living = living[order]
+        groups = numpy.split(living, numpy.flatnonzero(numpy.diff(labels[living])) + 1)
+        found = []
+        for group in groups:
+            if group.size:
+                objectRows, objectColumns = numpy.divmod(group, columns)
+                found.append(numpy.stack((unwrap(objectRows, rows),
+                                          unwrap(objectColumns, columns)), axis=1))
+        return found
+
+    def count(self, world, period=None):
+        """Return a Counter of the objects in a world, without adding it to
+        the totals."""
+        rule = world.get_rule()
+        return Counter(self.classify(positions, rule) for positions in self.objects(world, period))
+
+    def add(self, world, period=None):
+        """Count the objects in a world and add them to the totals."""
+        counts = self.count(world, period)
+        self.__totals.update(counts)
+        return counts
+
+    def add_batch(self, batch):
+        """Count the objects on every board of a WorldBatch."""
+        counts = Counter()
+        periods = batch.get_periods()
+        for board in range(batch.get_boards()):
+            counts.update(self.add(batch.get_world(board), int(periods[board]) or None))
+        return counts
@@ -0,0 +1,142 @@
+from geometry import Geometry
+from rule import Rule
+import numpy
+
+
+def step_padded(padded, out, columnSums=None, counts=None, rule=None):
+    """
+    Work out the next generation of a board that has its halo around it.
+    The other engines that split the board up use this on each piece, and
+    WorldBatch uses it on a whole stack of boards at once.
+    :param padded: (rows + 2, columns + 2) uint8 array of the board and halo,
+                   or (boards, rows + 2, columns + 2) for a stack of boards.
+    :param out: (rows, columns) uint8 array to write the next generation to,
+                or (boards, rows, columns).
+    :param columnSums: (rows, columns + 2) uint8 scratch array, or None.
+    :param counts: (rows, columns) uint8 scratch array, or None.
+    :param rule: the Rule, or None for B3/S23.
+    :return: None
+    """
+    rows = padded.shape[-2] - 2
+    columns = padded.shape[-1] - 2
+    if rule is not None and not rule.totalistic:
+        #
+        # Number every block of nine the way Rule.table is numbered and
+        # look the numbers up.
+        #
+        blocks = numpy.zeros(padded.shape[:-2] + (rows, columns), dtype=numpy.uint16)
+        for row in range(3):
+            for column in range(3):
+                blocks += padded[..., row:row + rows, column:column + columns] * Rule.weights[row, column]
+        numpy.take(rule.table, blocks, out=out, mode='clip')
+        return
+    if columnSums is None:
+        columnSums = numpy.empty(padded.shape[:-2] + (rows, columns + 2), dtype=numpy.uint8)
+    if counts is None:
+        counts = numpy.empty(padded.shape[:-2] + (rows, columns), dtype=numpy.uint8)
+    #
+    # Add up each column of three first and then add three of those
+    # side by side. That is four additions instead of seven, but the
+    # total includes the cell itself.
+    #
+    numpy.add(padded[..., :-2, :], padded[..., 1:-1, :], out=columnSums)
+    columnSums += padded[..., 2:, :]
+    numpy.add(columnSums[..., :-2], columnSums[..., 1:-1], out=counts)
+    counts += columnSums[..., 2:]
+    #
+    # A cell is alive next generation if the block of nine has three
+    # living cells, or if it has four and the cell itself is one of them.
+    #
+    if rule is not None and not rule.is_life():
+        #
+        # Rule.totals wants 2 * neighbors + the cell, which is 2 * the
+        # block's total - the cell.
+        #
+        counts *= 2
+        counts -= padded[..., 1:-1, 1:-1]
+        numpy.take(rule.totals, counts, out=out, mode='clip')
+        return
+    born = counts == 3
+    survived = (counts == 4) & (padded[..., 1:-1, 1:-1] == 1)
+    numpy.logical_or(born, survived, out=out.view(numpy.bool_))
+
+
+class NumpyEngine(object):
+    """
+    Steps a world that is stored as a two dimensional uint8 array, one byte
+    per cell (1 is alive, 0 is dead). Neighbor counts are the sum of the
+    eight shifted slices of a copy of the board that has a one cell border
+    (the halo) around it. The halo is filled from the geometry's halo map,
+    so it works on every bounded geometry.
+    """
+
+    name = 'numpy'
+
+    geometries = Geometry.bounded
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__halo = Geometry.get(geometry).halo(rows, columns)
+        self.__cells = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        #
+        # These buffers are reused every generation so that stepping
+        # doesn't have to allocate a new board each time.
+        #
+        self.__padded = numpy.zeros((rows + 2, columns + 2), dtype=numpy.uint8)
+        self.__columnSums = numpy.zeros((rows, columns + 2), dtype=numpy.uint8)
+        self.__counts = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        self.__rule = None
+
+    def set_rule(self, rule):
+        """Change the rule to a Rule (every rule works here)."""
+        self.__rule = rule
+
+    def get_cells(self):
+        """Returns the board as a (rows, columns) uint8 array. Don't change it."""
+        return self.__cells
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        self.__cells = numpy.array(cells, dtype=numpy.uint8).reshape(self.__rows, self.__columns)
+
+    def get_cell(self, row, column):
+        return bool(self.__cells[row, column])
+
+    def set_cell(self, row, column, living):
+        self.__cells[row, column] = living
+
+    def get_positions(self, rows, columns):
+        """Returns the cells at arrays of rows and columns, as uint8."""
+        return self.__cells[rows, columns]
+
+    def set_positions(self, rows, columns, living):
+        """Set the cells at arrays of rows and columns to an array of 0s and 1s."""
+        self.__cells[rows, columns] = living
+
+    def set_geometry(self, geometry):
+        self.__halo = Geometry.get(geometry).halo(self.__rows, self.__columns)
+        #
+        # The halo cells that are always dead are never written, so clear
+        # out whatever the old geometry left there.
+        #
+        self.__padded[0] = 0
+        self.__padded[-1] = 0
+        self.__padded[:, 0] = 0
+        self.__padded[:, -1] = 0
+
+    def population(self):
+        return int(numpy.count_nonzero(self.__cells))
+
+    def fill_halo(self):
+        """Copy the board into the middle of the padded buffer and fill the
+        border around it according to the geometry."""
+        padded = self.__padded
+        padded[1:-1, 1:-1] = self.__cells
+        haloRows, haloColumns, sourceRows, sourceColumns = self.__halo
+        padded[haloRows, haloColumns] = self.__cells[sourceRows, sourceColumns]
+        return padded
+
+    def step(self):
+        """Advance the board one generation."""
+        step_padded(self.fill_halo(), self.__cells, self.__columnSums, self.__counts, self.__rule)
@@ -0,0 +1,159 @@
+import numpy
+
+
+def bowl(rows, columns, row, column):
+    """Everything off the edge of a bowl is dead."""
+    inside = (row >= 0) & (row < rows) & (column >= 0) & (column < columns)
+    return row, column, inside
+
+
+def torus(rows, columns, row, column):
+    """Off the top is the bottom and off the left is the right."""
+    return row % rows, column % columns, numpy.ones_like(row, dtype=bool)
+
+
+def klein(rows, columns, row, column):
+    """Like a torus, except going off the top or bottom flips the world
+    left to right."""
+    flipped = (row // rows) % 2 == 1
+    column = numpy.where(flipped, columns - 1 - column, column)
+    return row % rows, column % columns, numpy.ones_like(row, dtype=bool)
+
+
+def mobius(rows, columns, row, column):
+    """Going off the left or right flips the world upside down. The top
+    and bottom are dead, like a bowl."""
+    flipped = (column // columns) % 2 == 1
+    row = numpy.where(flipped, rows - 1 - row, row)
+    inside = (row >= 0) & (row < rows)
+    return row, column % columns, inside
+
+
+def projective(rows, columns, row, column):
+    """Going off the top or bottom flips the world left to right, and going
+    off the left or right flips it upside down."""
+    rowFlipped = (column // columns) % 2 == 1
+    columnFlipped = (row // rows) % 2 == 1
+    row = row % rows
+    column = column % columns
+    row = numpy.where(rowFlipped, rows - 1 - row, row)
+    column = numpy.where(columnFlipped, columns - 1 - column, column)
+    return row, column, numpy.ones_like(row, dtype=bool)
+
+
+def reflect(rows, columns, row, column):
+    """The edges are mirrors: the cell just off the edge is the same as the
+    cell on the edge."""
+    return (numpy.clip(row, 0, rows - 1), numpy.clip(column, 0, columns - 1),
+            numpy.ones_like(row, dtype=bool))
+
+
+class Geometry(object):
+    """
+    The shape of a world. A geometry is nothing more than a rule (wrap)
+    that says where a position just off the edge of the world really is,
+    or that it is dead. From that rule each geometry works out, once for
+    each size of world, the maps that the engines use: the halo (the ring
+    of cells just outside the world and where each one comes from) and the
+    neighbors of every cell (see Topology). After that switching geometry
+    costs nothing, and stepping costs the same on every surface.
+    """
+
+    geometries = {}
+
+    #
+    # The names of the geometries that have edges, in menu order. Engines
+    # that can run on any of them use this list as their geometries.
+    #
+    bounded = []
+
+    #
+    # Every geometry, including the unbounded plane, which has no edges at
+    # all and so no maps.
+    #
+    names = []
+
+    cacheSize = 8
+
+    @classmethod
+    def register(cls, name, wrap, description):
+        """
+        Add a geometry to the geometries.
+        :param name: what to call the geometry.
+        :param wrap: a function (rows, columns, row, column) that takes arrays
+                     of positions and returns the rows and columns they
+                     really are and whether they are alive at all, or None
+                     for an unbounded geometry.
+        :param description: a few words for the menu.
+        :return: the new Geometry.
+        """
+        geometry = Geometry(name, wrap, description)
+        cls.geometries[name] = geometry
+        cls.names.append(name)
+        if wrap is not None:
+            cls.bounded.append(name)
+        return geometry
+
+    @classmethod
+    def get(cls, name):
+        legalValues = cls.geometries.keys()
+        if name in legalValues:
+            return cls.geometries[name]
+        else:
+            raise ValueError(f'Geometry must be in {list(legalValues)}.')
+
+    def __init__(self, name, wrap, description):
+        self.name = name
+        self.wrap = wrap
+        self.description = description
+        self.__halos = {}
+
+    def locate(self, rows, columns, row, column):
+        """
+        Return where positions really are in a world of the given size.
+        :param row: array of rows, which can be off the edge.
+        :param column: array of columns, which can be off the edge.
+        :return: (rows, columns, living) arrays. living is False where the
+                 position is dead no matter what.
+        """
+        row = numpy.asarray(row, dtype=numpy.int64)
+        column = numpy.asarray(column, dtype=numpy.int64)
+        return self.wrap(rows, columns, row, column)
+
+    def halo(self, rows, columns, width=1):
+        """
+        Return the map for the ring of cells around a world of the given
+        size. The ring is given in padded coordinates, where the world
+        itself is rows width to rows + width - 1 and the same for columns.
+        :param width: how many cells wide the ring is; 1 for the engines
+                      that only look at the 8 cells next to each cell.
+        :return: (haloRows, haloColumns, sourceRows, sourceColumns) arrays,
+                 only for the halo cells that aren't always dead.
+        """
+        key = (rows, columns, width)
+        if key not in self.__halos:
+            if len(self.__halos) >= Geometry.cacheSize:
+                del self.__halos[next(iter(self.__halos))]
+            #
+            # The top and bottom bands run the full padded width, the left
+            # and right ones only down the sides of the world.
+            #
+            across = numpy.arange(-width, columns + width)
+            down = numpy.arange(rows)
+            bands = [(numpy.arange(-width, 0), across), (numpy.arange(rows, rows + width), across),
+                     (down, numpy.arange(-width, 0)), (down, numpy.arange(columns, columns + width))]
+            ring = numpy.concatenate([numpy.stack(numpy.meshgrid(bandRows, bandColumns, indexing='ij'),
+                                                  axis=-1).reshape(-1, 2) for bandRows, bandColumns in bands])
+            ring = ring.astype(numpy.int64)
+            sourceRows, sourceColumns, living = self.locate(rows, columns, ring[:, 0], ring[:, 1])
+            self.__halos[key] = (ring[living, 0] + width, ring[living, 1] + width,
+                                 sourceRows[living], sourceColumns[living])
+        return self.__halos[key]
+
+Geometry.register('bowl', bowl, 'bowl')
+Geometry.register('torus', torus, 'torus')
+Geometry.register('plane', None, 'unbounded plane')
+Geometry.register('klein', klein, 'Klein bottle')
+Geometry.register('mobius', mobius, 'Mobius strip')
+Geometry.register('projective', projective, 'projective plane')
+Geometry.register('reflect', reflect, 'reflecting walls')
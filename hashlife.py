@@ -0,0 +1,386 @@
+from rule import Rule
+import numpy
+
+
+class Node(object):
+    """
+    A square of 2**level by 2**level cells in the HashLife quadtree. A node
+    at level 0 is a single cell; every other node is made of four nodes one
+    level down. Nodes are never changed once they are made, and the
+    HashLifeEngine makes sure there is only ever one node for any given
+    square, so two nodes are the same square exactly when they are the same
+    object.
+    """
+
+    __slots__ = ('level', 'population', 'nw', 'ne', 'sw', 'se')
+
+    def __init__(self, level, population, nw=None, ne=None, sw=None, se=None):
+        self.level = level
+        self.population = population
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+
+    def __repr__(self):
+        return f'Node(level {self.level}, population {self.population})'
+
+
+class HashLifeEngine(object):
+    """
+    Steps a world on the unbounded plane with Bill Gosper's HashLife
+    algorithm. The world is a quadtree of canonical nodes and the future of
+    every node is remembered, so repeating patterns can be moved forward by
+    millions of generations in a handful of steps.
+
+    The node table and the remembered results can grow without bound, so
+    when the table holds more than maxNodes nodes everything that the
+    current world doesn't use is thrown away.
+
+    Any rule works except ones where cells are born with no living
+    neighbors (B0), which would fill the whole plane.
+    """
+
+    name = 'hashlife'
+
+    geometries = ('plane',)
+
+    maxNodes = 2000000
+
+    dead = Node(0, 0)
+    alive = Node(0, 1)
+
+    def __init__(self, rows, columns, geometry='plane', maxNodes=None):
+        self.__rows = rows
+        self.__columns = columns
+        self.__geometry = geometry
+        if maxNodes is not None:
+            self.maxNodes = maxNodes
+        self.__nodes = {}
+        self.__results = {}
+        self.__empty = [HashLifeEngine.dead]
+        self.__collections = 0
+        self.__rule = Rule.get('B3/S23')
+        #
+        # The root always covers the window. rootRow and rootColumn are
+        # where its top left corner is on the plane.
+        #
+        level = 1
+        while 2 ** level < max(rows, columns):
+            level += 1
+        self.__root = self.empty(level)
+        self.__rootRow = 0
+        self.__rootColumn = 0
+
+    def set_rule(self, rule):
+        """Change the rule to a Rule, forgetting every result worked out by
+        the old one."""
+        if rule.births_from_nothing():
+            raise ValueError(f'HashLife can\'t run {rule}, where cells are born with no neighbors.')
+        if rule != self.__rule:
+            self.__rule = rule
+            self.__results = {}
+
+    def join(self, nw, ne, sw, se):
+        """Return the one node made of these four quadrants."""
+        key = (nw, ne, sw, se)
+        node = self.__nodes.get(key)
+        if node is None:
+            population = nw.population + ne.population + sw.population + se.population
+            node = Node(nw.level + 1, population, nw, ne, sw, se)
+            self.__nodes[key] = node
+        return node
+
+    def empty(self, level):
+        """Return the dead node at the given level."""
+        while len(self.__empty) <= level:
+            smaller = self.__empty[-1]
+            self.__empty.append(self.join(smaller, smaller, smaller, smaller))
+        return self.__empty[level]
+
+    def expand(self, node):
+        """Return a node one level up with the given node in the middle."""
+        empty = self.empty(node.level - 1)
+        return self.join(self.join(empty, empty, empty, node.nw),
+                         self.join(empty, empty, node.ne, empty),
+                         self.join(empty, node.sw, empty, empty),
+                         self.join(node.se, empty, empty, empty))
+
+    def life_4x4(self, node):
+        """Return the middle 2x2 of a level 2 node one generation later."""
+        bits = [[0] * 4 for row in range(4)]
+        for quadrantRow, quadrantColumn, quadrant in [(0, 0, node.nw), (0, 2, node.ne),
+                                                      (2, 0, node.sw), (2, 2, node.se)]:
+            bits[quadrantRow][quadrantColumn] = quadrant.nw.population
+            bits[quadrantRow][quadrantColumn + 1] = quadrant.ne.population
+            bits[quadrantRow + 1][quadrantColumn] = quadrant.sw.population
+            bits[quadrantRow + 1][quadrantColumn + 1] = quadrant.se.population
+        middle = []
+        table = self.__rule.table
+        for row in (1, 2):
+            for column in (1, 2):
+                #
+                # Number the block of nine around the cell the way
+                # Rule.table is numbered.
+                #
+                number = 0
+                for neighborRow in (row - 1, row, row + 1):
+                    for neighborColumn in (column - 1, column, column + 1):
+                        number = number * 2 + bits[neighborRow][neighborColumn]
+                living = table[number]
+                middle.append(HashLifeEngine.alive if living else HashLifeEngine.dead)
+        return self.join(*middle)
+
+    def successor(self, node, speed):
+        """
+        Return the middle half of a node (one level down) 2**speed
+        generations later. speed can be at most node.level - 2.
+        """
+        if node.population == 0:
+            return node.nw
+        speed = min(speed, node.level - 2)
+        key = (node, speed)
+        result = self.__results.get(key)
+        if result is not None:
+            return result
+        if node.level == 2:
+            result = self.life_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            #
+            # Split the node into nine overlapping squares, each half as
+            # wide, and move each of them forward.
+            #
+            n00 = self.successor(nw, speed)
+            n01 = self.successor(self.join(nw.ne, ne.nw, nw.se, ne.sw), speed)
+            n02 = self.successor(ne, speed)
+            n10 = self.successor(self.join(nw.sw, nw.se, sw.nw, sw.ne), speed)
+            n11 = self.successor(self.join(nw.se, ne.sw, sw.ne, se.nw), speed)
+            n12 = self.successor(self.join(ne.sw, ne.se, se.nw, se.ne), speed)
+            n20 = self.successor(sw, speed)
+            n21 = self.successor(self.join(sw.ne, se.nw, sw.se, se.sw), speed)
+            n22 = self.successor(se, speed)
+            if speed < node.level - 2:
+                #
+                # The nine squares are already far enough along, so just
+                # put the middles back together.
+                #
+                result = self.join(self.join(n00.se, n01.sw, n10.ne, n11.nw),
+                                   self.join(n01.se, n02.sw, n11.ne, n12.nw),
+                                   self.join(n10.se, n11.sw, n20.ne, n21.nw),
+                                   self.join(n11.se, n12.sw, n21.ne, n22.nw))
+            else:
+                result = self.join(self.successor(self.join(n00, n01, n10, n11), speed),
+                                   self.successor(self.join(n01, n02, n11, n12), speed),
+                                   self.successor(self.join(n10, n11, n20, n21), speed),
+                                   self.successor(self.join(n11, n12, n21, n22), speed))
+        self.__results[key] = result
+        return result
+
+    def is_padded(self, node):
+        """Return True if all the living cells are in the middle quarter of
+        the node, so nothing can escape while it is moved forward."""
+        middle = (node.nw.se.se.population + node.ne.sw.sw.population +
+                  node.sw.ne.ne.population + node.se.nw.nw.population)
+        return middle == node.population
+
+    def advance(self, generations):
+        """
+        Move the world forward by any number of generations. Every bit that
+        is set in generations is one jump of 2**bit generations.
+        :param generations: how many generations to move forward.
+        :return: None
+        """
+        speed = 0
+        while generations > 0:
+            if generations & 1:
+                while self.__root.level < speed + 3 or not self.is_padded(self.__root):
+                    self.grow()
+                half = 2 ** (self.__root.level - 2)
+                self.__root = self.successor(self.__root, speed)
+                self.__rootRow += half
+                self.__rootColumn += half
+                if len(self.__nodes) > self.maxNodes:
+                    self.collect()
+            generations >>= 1
+            speed += 1
+        self.shrink()
+
+    def step(self):
+        """Advance the board one generation."""
+        self.advance(1)
+
+    def grow(self):
+        """Make the root one level bigger, keeping the cells in place."""
+        quarter = 2 ** (self.__root.level - 1)
+        self.__root = self.expand(self.__root)
+        self.__rootRow -= quarter
+        self.__rootColumn -= quarter
+
+    def shrink(self):
+        """Make the root smaller while it still covers the living cells and
+        the window."""
+        root = self.__root
+        while root.level > 1 and self.is_padded(root):
+            quarter = 2 ** (root.level - 2)
+            row = self.__rootRow + quarter
+            column = self.__rootColumn + quarter
+            size = 2 ** (root.level - 1)
+            if row > 0 or column > 0 or row + size < self.__rows or column + size < self.__columns:
+                break
+            root = self.join(root.nw.se, root.ne.sw, root.sw.ne, root.se.nw)
+            self.__rootRow = row
+            self.__rootColumn = column
+        self.__root = root
+
+    def collect(self):
+        """Throw away every remembered result and every node that the
+        current world doesn't use."""
+        self.__collections += 1
+        self.__results = {}
+        kept = {}
+        stack = [self.__root]
+        while stack:
+            node = stack.pop()
+            if node.level == 0:
+                continue
+            key = (node.nw, node.ne, node.sw, node.se)
+            if key not in kept:
+                kept[key] = node
+                stack.extend(key)
+        for empty in self.__empty[1:]:
+            kept[(empty.nw, empty.ne, empty.sw, empty.se)] = empty
+        self.__nodes = kept
+
+    def get_node_count(self):
+        return len(self.__nodes)
+
+    def get_collections(self):
+        return self.__collections
+
+    def build(self, cells, level):
+        """Return a node at the given level made from a square array."""
+        if level == 0:
+            return HashLifeEngine.alive if cells[0, 0] else HashLifeEngine.dead
+        if not cells.any():
+            return self.empty(level)
+        half = 2 ** (level - 1)
+        return self.join(self.build(cells[:half, :half], level - 1),
+                         self.build(cells[:half, half:], level - 1),
+                         self.build(cells[half:, :half], level - 1),
+                         self.build(cells[half:, half:], level - 1))
+
+    def draw(self, node, row, column, cells):
+        """Copy the living cells of a node at (row, column) into cells,
+        clipping it to the window."""
+        size = 2 ** node.level
+        if (node.population == 0 or row >= self.__rows or column >= self.__columns or
+                row + size <= 0 or column + size <= 0):
+            return
+        if node.level == 0:
+            cells[row, column] = 1
+            return
+        half = size // 2
+        self.draw(node.nw, row, column, cells)
+        self.draw(node.ne, row, column + half, cells)
+        self.draw(node.sw, row + half, column, cells)
+        self.draw(node.se, row + half, column + half, cells)
+
+    def get_cells(self):
+        """Returns the (rows, columns) window of the board as a uint8 array."""
+        cells = numpy.zeros((self.__rows, self.__columns), dtype=numpy.uint8)
+        self.draw(self.__root, self.__rootRow, self.__rootColumn, cells)
+        return cells
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        cells = numpy.asarray(cells).reshape(self.__rows, self.__columns)
+        size = 2 ** self.__root.level
+        square = numpy.zeros((size, size), dtype=numpy.uint8)
+        square[:self.__rows, :self.__columns] = cells != 0
+        self.__root = self.build(square, self.__root.level)
+        self.__rootRow = 0
+        self.__rootColumn = 0
+
+    def get_living(self):
+        """Returns the set of (row, column) positions of the living cells."""
+        living = set()
+        stack = [(self.__root, self.__rootRow, self.__rootColumn)]
+        while stack:
+            node, row, column = stack.pop()
+            if node.population == 0:
+                continue
+            if node.level == 0:
+                living.add((row, column))
+                continue
+            half = 2 ** (node.level - 1)
+            stack.append((node.nw, row, column))
+            stack.append((node.ne, row, column + half))
+            stack.append((node.sw, row + half, column))
+            stack.append((node.se, row + half, column + half))
+        return living
+
+    def set_living(self, living):
+        """Replace the whole board with the given (row, column) positions."""
+        rows = [row for row, column in living] + [0, self.__rows - 1]
+        columns = [column for row, column in living] + [0, self.__columns - 1]
+        top = min(rows)
+        left = min(columns)
+        level = 1
+        while 2 ** level < max(max(rows) - top, max(columns) - left) + 1:
+            level += 1
+        square = numpy.zeros((2 ** level, 2 ** level), dtype=numpy.uint8)
+        for row, column in living:
+            square[row - top, column - left] = 1
+        self.__root = self.build(square, level)
+        self.__rootRow = top
+        self.__rootColumn = left
+
+    def get_cell(self, row, column):
+        node = self.__root
+        row -= self.__rootRow
+        column -= self.__rootColumn
+        size = 2 ** node.level
+        if not (0 <= row < size and 0 <= column < size):
+            return False
+        while node.level > 0 and node.population > 0:
+            half = 2 ** (node.level - 1)
+            if row < half:
+                node = node.nw if column < half else node.ne
+            else:
+                node = node.sw if column < half else node.se
+            row %= half
+            column %= half
+        return node.population == 1
+
+    def set_node(self, node, row, column, living):
+        """Return a copy of node with the cell at (row, column) changed."""
+        if node.level == 0:
+            return HashLifeEngine.alive if living else HashLifeEngine.dead
+        half = 2 ** (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        if row < half and column < half:
+            nw = self.set_node(nw, row, column, living)
+        elif row < half:
+            ne = self.set_node(ne, row, column - half, living)
+        elif column < half:
+            sw = self.set_node(sw, row - half, column, living)
+        else:
+            se = self.set_node(se, row - half, column - half, living)
+        return self.join(nw, ne, sw, se)
+
+    def set_cell(self, row, column, living):
+        while True:
+            size = 2 ** self.__root.level
+            if (self.__rootRow <= row < self.__rootRow + size and
+                    self.__rootColumn <= column < self.__rootColumn + size):
+                break
+            self.grow()
+        self.__root = self.set_node(self.__root, row - self.__rootRow,
+                                    column - self.__rootColumn, bool(living))
+
+    def set_geometry(self, geometry):
+        self.__geometry = geometry
+
+    def population(self):
+        return self.__root.population
@@ -0,0 +1,238 @@
+from bisect import bisect_right
+import numpy
+
+
+def cell_keys(rows, columns):
+    """
+    Return the 64 bit Zobrist key of each (row, column) position. The keys
+    aren't stored anywhere; they are worked out from the position with the
+    splitmix64 mixer, which makes them look random and works for positions
+    anywhere on the plane.
+    :param rows: array of rows.
+    :param columns: array of columns.
+    :return: uint64 array of keys.
+    """
+    rows = numpy.asarray(rows).astype(numpy.uint64)
+    columns = numpy.asarray(columns).astype(numpy.uint64)
+    key = rows * numpy.uint64(0x9E3779B97F4A7C15) + columns
+    key ^= key >> numpy.uint64(30)
+    key *= numpy.uint64(0xBF58476D1CE4E5B9)
+    key ^= key >> numpy.uint64(27)
+    key *= numpy.uint64(0x94D049BB133111EB)
+    key ^= key >> numpy.uint64(31)
+    return key
+
+
+def xor_keys(rows, columns):
+    """Return all the keys of the given positions XORed together."""
+    if len(rows) == 0:
+        return 0
+    return int(numpy.bitwise_xor.reduce(cell_keys(rows, columns)))
+
+
+def pack_words(cells):
+    """Pack a board into a flat array of 64 bit words, 64 cells a word."""
+    packed = numpy.packbits(numpy.asarray(cells).ravel())
+    words = numpy.zeros((packed.size + 7) // 8 * 8, dtype=numpy.uint8)
+    words[:packed.size] = packed
+    return words.view('<u8')
+
+
+def unpack_words(words, shape):
+    """Undo pack_words."""
+    cells = numpy.unpackbits(words.view(numpy.uint8), count=shape[0] * shape[1])
+    return cells.reshape(shape)
+
+
+class CycleDetector(object):
+    """
+    Notices when a world comes back to a state it has been in before, which
+    means it will repeat forever. The state of the world is boiled down to a
+    64 bit Zobrist hash which is kept up to date from just the cells that
+    were born or died. A bounded board is hashed 64 cells at a time: each
+    packed word of the board has a key made from where it is and what is
+    in it, so a generation only costs as many keys as it has words with
+    births or deaths in them. On the unbounded plane each living cell has a
+    key made from its position. Each hash is remembered with the generation
+    it was seen in, so the first repeat tells both the period and when the
+    cycle started. Only the last maxEntries hashes are kept, so cycles
+    longer than that aren't noticed.
+    """
+
+    maxEntries = 65536
+
+    def __init__(self, maxEntries=None):
+        if maxEntries is not None:
+            self.maxEntries = maxEntries
+        self.reset()
+
+    def reset(self):
+        """Forget everything, for when the world was changed by hand."""
+        self.__hash = None
+        self.__previous = None
+        self.__seen = {}
+        self.__cycle = None
+
+    def get_hash(self):
+        return self.__hash
+
+    def get_cycle(self):
+        """Returns (start, period) once the world has repeated, else None."""
+        return self.__cycle
+
+    def record(self, generation, cells):
+        """
+        Add a generation of the world.
+        :param generation: which generation this is.
+        :param cells: the board as a (rows, columns) array, or a set of the
+                      (row, column) positions of the living cells for the
+                      unbounded plane.
+        :return: (start, period) if the world has repeated, else None.
+        """
+        if isinstance(cells, (set, frozenset)):
+            if self.__previous is None:
+                changed = cells
+            else:
+                changed = cells ^ self.__previous
+            rows = [row for row, column in changed]
+            columns = [column for row, column in changed]
+            self.__previous = set(cells)
+            #
+            # Births and deaths both just flip the cell's key in or out.
+            #
+            self.__hash = (self.__hash or 0) ^ xor_keys(rows, columns)
+        else:
+            words = pack_words(cells)
+            if self.__previous is None:
+                self.__hash = xor_keys(numpy.arange(words.size), words)
+            else:
+                changed = numpy.flatnonzero(words != self.__previous)
+                #
+                # Take out the old words' keys and put in the new ones.
+                #
+                self.__hash ^= (xor_keys(changed, self.__previous[changed]) ^
+                                xor_keys(changed, words[changed]))
+            self.__previous = words
+        if self.__cycle is None:
+            if self.__hash in self.__seen:
+                start = self.__seen[self.__hash]
+                self.__cycle = (start, generation - start)
+            else:
+                if len(self.__seen) >= self.maxEntries:
+                    del self.__seen[next(iter(self.__seen))]
+                self.__seen[self.__hash] = generation
+        return self.__cycle
+
+
+class History(object):
+    """
+    Remembers past generations of a world so it can be rewound. Every
+    keyframeInterval generations the whole board is kept, packed one bit per
+    cell into 64 bit words (a keyframe); in between only the words that
+    changed are kept, as where they are and which of their cells flipped (a
+    delta). Going back to any generation means
+    unpacking the keyframe before it and replaying at most keyframeInterval
+    deltas. A keyframe and its deltas make a segment, and when the history
+    takes more than maxBytes the oldest segments are thrown away, so memory
+    stays flat however long the world runs.
+    """
+
+    keyframeInterval = 64
+
+    maxBytes = 64 * 1024 * 1024
+
+    def __init__(self, keyframeInterval=None, maxBytes=None):
+        if keyframeInterval is not None:
+            self.keyframeInterval = keyframeInterval
+        if maxBytes is not None:
+            self.maxBytes = maxBytes
+        self.reset()
+
+    def reset(self):
+        """Forget every generation."""
+        #
+        # Each segment is [first generation, shape, packed keyframe, deltas].
+        #
+        self.__segments = []
+        self.__starts = []
+        self.__bytes = 0
+        self.__last = None
+        self.__previous = None
+
+    def get_range(self):
+        """Returns (first, last), the generations that can be gone back to,
+        or None if there aren't any."""
+        if not self.__segments:
+            return None
+        return self.__starts[0], self.__last
+
+    def get_bytes(self):
+        return self.__bytes
+
+    def record(self, generation, cells):
+        """
+        Add a generation of the world. Recording a generation that was
+        already recorded throws away it and everything after it first.
+        :param generation: which generation this is.
+        :param cells: the board as a (rows, columns) array.
+        :return: None
+        """
+        if self.__last is not None and generation <= self.__last:
+            self.truncate(generation - 1)
+        segment = self.__segments[-1] if self.__segments else None
+        if (segment is None or generation != self.__last + 1 or
+                numpy.shape(cells) != segment[1] or
+                generation - segment[0] >= self.keyframeInterval):
+            keyframe = pack_words(cells)
+            self.__segments.append([generation, numpy.shape(cells), keyframe, []])
+            self.__starts.append(generation)
+            self.__bytes += keyframe.nbytes
+            self.__previous = keyframe
+        else:
+            words = pack_words(cells)
+            changed = numpy.flatnonzero(words != self.__previous)
+            delta = (changed.astype(numpy.int32), words[changed] ^ self.__previous[changed])
+            segment[3].append(delta)
+            self.__bytes += delta[0].nbytes + delta[1].nbytes
+            self.__previous = words
+        self.__last = generation
+        while self.__bytes > self.maxBytes and len(self.__segments) > 1:
+            self.__bytes -= self.segment_bytes(self.__segments.pop(0))
+            self.__starts.pop(0)
+
+    def segment_bytes(self, segment):
+        return segment[2].nbytes + sum(changed.nbytes + flipped.nbytes
+                                       for changed, flipped in segment[3])
+
+    def seek(self, generation):
+        """
+        Return the board as it was at a generation.
+        :param generation: a generation inside get_range().
+        :return: (rows, columns) uint8 array.
+        """
+        span = self.get_range()
+        if span is None or not span[0] <= generation <= span[1]:
+            raise ValueError(f'Generation must be in {span}.')
+        start, shape, keyframe, deltas = self.__segments[bisect_right(self.__starts, generation) - 1]
+        words = keyframe.copy()
+        for changed, flipped in deltas[:generation - start]:
+            words[changed] ^= flipped
+        return unpack_words(words, shape)
+
+    def truncate(self, generation):
+        """Throw away everything after a generation."""
+        span = self.get_range()
+        if span is None or generation < span[0]:
+            self.reset()
+            return
+        if generation >= span[1]:
+            return
+        while self.__starts[-1] > generation:
+            self.__bytes -= self.segment_bytes(self.__segments.pop())
+            self.__starts.pop()
+        segment = self.__segments[-1]
+        for changed, flipped in segment[3][generation - segment[0]:]:
+            self.__bytes -= changed.nbytes + flipped.nbytes
+        del segment[3][generation - segment[0]:]
+        self.__previous = pack_words(self.seek(generation))
+        self.__last = generation
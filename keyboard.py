@@ -0,0 +1,97 @@
+import asyncio
+import os
+import re
+import sys
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+
+
+#
+# What arrow keys, function keys and the like send: ESC and then the rest
+# of the sequence, all in one read.
+#
+escapeSequence = re.compile(r'\x1b(?:\[[0-9;?]*[ -/]*[@-~]|O.|.)', re.DOTALL)
+
+
+class Keyboard(object):
+    """
+    Reads key presses one at a time, without waiting for return, for an
+    asyncio event loop. Use it in a with statement: on the way in the
+    terminal is put in cbreak mode and the event loop is told to watch
+    stdin, and on the way out the terminal is put back the way it was.
+    Where there is no termios (Windows), or stdin can't be watched because
+    it is redirected from a file, keys are read by a thread instead (and
+    on Windows still need return). Escape sequences (arrow keys and so on) are
+    dropped, so only an ESC on its own comes through as '\x1b'.
+    """
+
+    def __init__(self, stream=None):
+        self.__stream = stream if stream is not None else sys.stdin
+        self.__queue = asyncio.Queue()
+        self.__saved = None
+        self.__loop = None
+        self.__watching = False
+        self.__reading = False
+
+    def __enter__(self):
+        self.__loop = asyncio.get_running_loop()
+        if termios is not None:
+            descriptor = self.__stream.fileno()
+            if self.__stream.isatty():
+                self.__saved = termios.tcgetattr(descriptor)
+                tty.setcbreak(descriptor)
+            #
+            # epoll won't watch a regular file or /dev/null (python life.py
+            # < commands.txt), so those are read by a thread like Windows.
+            #
+            try:
+                self.__loop.add_reader(descriptor, self.read)
+                self.__watching = True
+            except PermissionError:
+                pass
+        if not self.__watching:
+            self.__reading = True
+            self.__loop.run_in_executor(None, self.read_forever)
+        return self
+
+    def __exit__(self, *details):
+        self.__reading = False
+        if self.__watching:
+            self.__loop.remove_reader(self.__stream.fileno())
+            self.__watching = False
+        if termios is not None:
+            descriptor = self.__stream.fileno()
+            if self.__saved is not None:
+                termios.tcsetattr(descriptor, termios.TCSADRAIN, self.__saved)
+                self.__saved = None
+        return False
+
+    def read(self):
+        """Called by the event loop when there are keys to read."""
+        keys = os.read(self.__stream.fileno(), 64).decode(errors='ignore')
+        if not keys:
+            #
+            # End of file: there will never be more keys.
+            #
+            self.__loop.remove_reader(self.__stream.fileno())
+        keys = escapeSequence.sub('', keys)
+        for key in keys:
+            self.__queue.put_nowait(key)
+
+    def read_forever(self):
+        """Read keys in a thread, where the event loop can't watch stdin.
+        It stops once the with statement is left, so a redirected file
+        isn't read any further than the keys used."""
+        while self.__reading:
+            key = self.__stream.read(1)
+            if not key or not self.__reading:
+                break
+            self.__loop.call_soon_threadsafe(self.__queue.put_nowait, key)
+
+    async def get(self):
+        """Wait for the next key."""
+        return await self.__queue.get()
@@ -0,0 +1,260 @@
+from collections import OrderedDict
+from census import phase_key, trim
+from engine import step_padded
+from lifefile import LifeFile
+from patterns import read_pattern
+from rule import Rule
+import hashlib
+import json
+import numpy
+import os
+import struct
+
+
+def read_any(filename):
+    """
+    Read a pattern file of any format, binary .life files too.
+    :return: (rows, columns, livingRows, livingColumns, rule)
+    """
+    if LifeFile.is_life_file(filename):
+        with LifeFile(filename) as lifeFile:
+            livingRows, livingColumns = numpy.nonzero(lifeFile.read_all())
+            return lifeFile.get_rows(), lifeFile.get_columns(), livingRows, livingColumns, lifeFile.get_rule()
+    return read_pattern(filename)
+
+
+def grow(cells, rule=None):
+    """Return the next generation of a pattern on the unbounded plane by a
+    Rule (None for B3/S23), trimmed to its living cells (an empty array
+    once it dies out). Rules with B0 don't work on the plane."""
+    rows, columns = cells.shape
+    padded = numpy.zeros((rows + 4, columns + 4), dtype=numpy.uint8)
+    padded[2:-2, 2:-2] = cells
+    grown = numpy.empty((rows + 2, columns + 2), dtype=numpy.uint8)
+    step_padded(padded, grown, rule=rule)
+    livingRows = numpy.flatnonzero(grown.any(axis=1))
+    if not livingRows.size:
+        return grown[:0, :0]
+    livingColumns = numpy.flatnonzero(grown.any(axis=0))
+    return grown[livingRows[0]:livingRows[-1] + 1, livingColumns[0]:livingColumns[-1] + 1]
+
+
+class Library(object):
+    """
+    An index of the pattern files in a folder, so the library can be
+    searched without opening them. The index is kept in a JSON file in the
+    folder and brought up to date by refresh, which only reads the files
+    that are new or whose modification time or size changed. For each
+    pattern it keeps the size, population, bounding box of the living
+    cells, a hash of the pattern that is the same however it is turned or
+    flipped, and, for patterns small enough to run, the generation it
+    settles into a cycle and the period of the cycle (moving patterns like
+    gliders count as cycles). Patterns are read when they are asked for,
+    and the last cacheSize of them are kept. A file that can't be read
+    (not really a pattern, or not text) is indexed as unreadable with the
+    error, left out of the names and searches, and tried again once it
+    changes.
+    """
+
+    extensions = ('.life', '.rle', '.cells')
+
+    indexName = '.index.json'
+
+    #
+    # Patterns with more living cells than this aren't run to find their
+    # period, and patterns that haven't settled by analysisGenerations are
+    # given no period.
+    #
+    maxAnalysisPopulation = 2000
+
+    analysisGenerations = 512
+
+    def __init__(self, folder, cacheSize=32):
+        """
+        :param folder: the folder with the pattern files.
+        :param cacheSize: how many read patterns to keep.
+        """
+        self.__folder = folder
+        self.__indexFile = os.path.join(folder, Library.indexName)
+        self.__cacheSize = cacheSize
+        self.__cache = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__patterns = {}
+        if os.path.exists(self.__indexFile):
+            with open(self.__indexFile, 'r') as indexFile:
+                self.__patterns = json.load(indexFile)
+        self.refresh()
+
+    def get_folder(self):
+        return self.__folder
+
+    def get_cache_stats(self):
+        """Returns (hits, misses)."""
+        return self.__hits, self.__misses
+
+    def save(self):
+        """Write the index to its file."""
+        with open(self.__indexFile, 'w') as indexFile:
+            json.dump(self.__patterns, indexFile)
+
+    def refresh(self):
+        """
+        Bring the index up to date with the folder.
+        :return: how many patterns were read again.
+        """
+        found = set()
+        changes = 0
+        for entry in os.scandir(self.__folder):
+            if not entry.is_file() or not entry.name.lower().endswith(Library.extensions):
+                continue
+            found.add(entry.name)
+            status = entry.stat()
+            known = self.__patterns.get(entry.name)
+            if known is not None and known['mtime'] == status.st_mtime_ns and known['bytes'] == status.st_size:
+                continue
+            try:
+                info = Library.analyze(read_any(entry.path))
+            except (OSError, ValueError, IndexError, struct.error) as error:
+                info = {'error': f'{type(error).__name__}: {error}'}
+            info['mtime'] = status.st_mtime_ns
+            info['bytes'] = status.st_size
+            self.__patterns[entry.name] = info
+            self.__cache.pop(entry.name, None)
+            changes += 1
+        for name in set(self.__patterns) - found:
+            del self.__patterns[name]
+            self.__cache.pop(name, None)
+            changes += 1
+        if changes:
+            self.save()
+        return changes
+
+    @classmethod
+    def analyze(cls, pattern):
+        """
+        Work out what the index keeps about a pattern.
+        :param pattern: (rows, columns, livingRows, livingColumns, rule)
+        :return: dictionary of rows, columns, population, box (top, left,
+                 bottom, right, or None when nothing is alive), key, rule,
+                 settles (the generation it starts to cycle) and period,
+                 which are None when they aren't known.
+        """
+        rows, columns, livingRows, livingColumns, rule = pattern
+        population = int(len(livingRows))
+        info = {'rows': rows, 'columns': columns, 'population': population, 'box': None,
+                'key': None, 'rule': rule, 'settles': None, 'period': None}
+        if not population:
+            info.update(settles=0, period=1)
+            return info
+        positions = numpy.stack((livingRows, livingColumns), axis=1)
+        cells, corner = trim(positions)
+        info['box'] = [corner[0], corner[1], corner[0] + cells.shape[0] - 1, corner[1] + cells.shape[1] - 1]
+        info['key'] = hashlib.sha1(phase_key(cells).encode('ascii')).hexdigest()[:16]
+        if population > cls.maxAnalysisPopulation:
+            return info
+        try:
+            rule = Rule.get(rule.split(':')[0]) if rule else None
+        except ValueError:
+            return info
+        if rule is not None and (rule.births_from_nothing() or rule.range > 1):
+            return info
+        #
+        # Run it on the unbounded plane, with the board trimmed to the
+        # living cells every generation, until a shape comes back wherever
+        # it is.
+        #
+        seen = {}
+        for generation in range(cls.analysisGenerations + 1):
+            shape = (cells.shape, numpy.packbits(cells).tobytes()) if cells.size else None
+            if shape in seen:
+                info.update(settles=seen[shape], period=generation - seen[shape])
+                break
+            seen[shape] = generation
+            cells = grow(cells, rule)
+        return info
+
+    def get_names(self):
+        """Return the names of every pattern, sorted."""
+        return sorted(name for name, info in self.__patterns.items() if 'error' not in info)
+
+    def get_unreadable(self):
+        """Return a dictionary of the files that couldn't be read and why."""
+        return {name: info['error'] for name, info in self.__patterns.items() if 'error' in info}
+
+    def get_info(self, name):
+        """Return what the index knows about a pattern (see analyze)."""
+        return self.__patterns[name]
+
+    def find(self, name):
+        """Return the name in the library of a pattern, which may be given
+        without its extension, or None if there is no such pattern."""
+        for candidate in [name] + [name + extension for extension in Library.extensions]:
+            if candidate in self.__patterns and 'error' not in self.__patterns[candidate]:
+                return candidate
+        return None
+
+    def search(self, text='', maxRows=None, maxColumns=None, minPopulation=None, maxPopulation=None,
+               period=None, key=None):
+        """
+        Find patterns by name and by what the index knows about them.
+        :param text: part of the name, in any case.
+        :param maxRows: only patterns whose living cells fit in this many rows.
+        :param maxColumns: and this many columns.
+        :param minPopulation: only patterns with at least this many living cells.
+        :param maxPopulation: and at most this many.
+        :param period: only patterns that settle into a cycle of this period.
+        :param key: only patterns with this hash, which finds the same
+                    pattern saved under other names or turned around.
+        :return: sorted list of names.
+        """
+        text = text.lower()
+        found = []
+        for name, info in self.__patterns.items():
+            if 'error' in info:
+                continue
+            box = info['box'] or [0, 0, -1, -1]
+            if text not in name.lower():
+                continue
+            if maxRows is not None and box[2] - box[0] + 1 > maxRows:
+                continue
+            if maxColumns is not None and box[3] - box[1] + 1 > maxColumns:
+                continue
+            if minPopulation is not None and info['population'] < minPopulation:
+                continue
+            if maxPopulation is not None and info['population'] > maxPopulation:
+                continue
+            if period is not None and info['period'] != period:
+                continue
+            if key is not None and info['key'] != key:
+                continue
+            found.append(name)
+        return sorted(found)
+
+    def describe(self, name):
+        """Return a line about a pattern for listing it."""
+        info = self.__patterns[name]
+        line = f'{name:30} {info["rows"]}x{info["columns"]}  {info["population"]} cells'
+        if info['period'] == 1:
+            line += f'  still from gen {info["settles"]}'
+        elif info['period'] is not None:
+            line += f'  period {info["period"]} from gen {info["settles"]}'
+        return line
+
+    def load(self, name):
+        """
+        Return a pattern, read from its file only if it isn't one of the
+        last ones asked for.
+        :param name: a name in the library.
+        :return: (rows, columns, livingRows, livingColumns, rule)
+        """
+        if name in self.__cache:
+            self.__hits += 1
+            self.__cache.move_to_end(name)
+            return self.__cache[name]
+        self.__misses += 1
+        pattern = read_any(os.path.join(self.__folder, name))
+        self.__cache[name] = pattern
+        if len(self.__cache) > self.__cacheSize:
+            self.__cache.popitem(last=False)
+        return pattern
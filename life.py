@@ -1,5 +1,12 @@
 from world import World
 from cell import Cell
+from geometry import Geometry
+from renderer import Renderer
+from runner import Runner
+from keyboard import Keyboard
+from library import Library
+from rule import Rule, RangeRule
+import asyncio
 import time
 import os
 import toolbox
@@ -8,12 +15,32 @@ class Life(object):
 
     speeds = [10, 7, 5, 3, 2, 1.5, 1, 0.75, 0.5, 0.25, 0.15, 0]
 
+    extensions = ('.life', '.rle', '.cells')
+
+    #
+    # How many library patterns are listed at most.
+    #
+    listLength = 40
+
+    longL = [[1, 0],
+             [1, 0],
+             [1, 0],
+             [1, 1]]
+
+    acorn = [[0, 1, 0, 0, 0, 0, 0],
+             [0, 0, 0, 1, 0, 0, 0],
+             [1, 1, 0, 0, 1, 1, 1]]
+
+    playKeys = '[space] pause/resume   [N]ext   [+] faster   [-] slower   [Q] stop'
+
     def __init__(self):
         self.__world = World(34, 66)
         self.__fillrate = 25
         self.__speed = 5
         self.__delay = Life.speeds[self.__speed]
         self.__menu = 'main'
+        self.__renderer = Renderer()
+        self.__library = None
         self.random()
 
     def main(self):
@@ -34,8 +61,10 @@ class Life(object):
                 self.run_simulation(parameter)
             elif command == 'skip generations':
                 self.skip_generations(parameter)
+            elif command == 'rewind':
+                self.rewind(parameter)
             elif command == 'random world':
-                self.random()
+                self.random(parameter)
             elif command == 'save world':
                 self.save(parameter, './worlds/')
             elif command == 'open world':
@@ -52,8 +81,13 @@ class Life(object):
                 self.set_geometry()
             elif command == 'library':
                 self.from_library(parameter, './library/')
+            elif command == 'record':
+                self.record(parameter, './recordings/')
+            elif command == 'change rule':
+                self.change_rule(parameter)
             self.display()
             command, parameter = self.get_command()
+        self.__world.stop_recording()
         print('See ya, thanks for playing!')
 
     def menu(self):
@@ -61,14 +95,14 @@ class Life(object):
         returns a string containing the menu.
         :return: string containing the menu
         """
-        return '[R]un  s[K]ip   [N]ew   [S]ave   [O]pen   [M]ore   [H]elp [L]ibrary   [Q]uit'
+        return '[R]un  s[K]ip  re[W]ind   [N]ew   [S]ave   [O]pen   [M]ore   [H]elp [L]ibrary   [Q]uit'
 
     def menu_more(self):
         """
         returns a string containing the menu.
         :return: string containing the menu
         """
-        return 's[P]eed   [D]elay   s[I]ze   [G]raphics  g[E]ometry   [H]elp   [B]ack'
+        return 's[P]eed   [D]elay   s[I]ze   [G]raphics  g[E]ometry   r[U]le   re[C]ord   [H]elp   [B]ack'
 
     def get_command(self):
         """
@@ -77,6 +111,7 @@ class Life(object):
         """
         commands = {'r': 'run simulation',
                     'k': 'skip generations',
+                    'w': 'rewind',
                     'n': 'random world',
                     's': 'save world',
                     'o': 'open world',
@@ -86,6 +121,8 @@ class Life(object):
                     'g': 'change graphics',
                     'e': 'geometry',
                     'l': 'library',
+                    'c': 'record',
+                    'u': 'change rule',
                     'm': 'more menu',
                     'b': 'back to main menu',
                     'h': 'help',
@@ -100,7 +137,6 @@ class Life(object):
             userInput = input('Command: ')
             if userInput == '':
                 userInput = 'n'
-                parameter = 1
         command = commands[userInput[0].lower()]
         if len(userInput) > 1:
             parameter = userInput[1:].strip()
@@ -119,6 +155,17 @@ class Life(object):
         string += f'speed: {self.__speed}   '
         string += f'size:[{rows}x{columns}]   '
         string += f'alive: {percentAlive:0.0f}%   '
+        if not self.__world.get_rule().is_life():
+            string += f'rule: {self.__world.get_rule()}   '
+        soup = self.__world.get_soup()
+        if soup:
+            string += f'seed: {soup["seed"]}   '
+        cycle = self.__world.get_cycle()
+        if cycle:
+            start, period = cycle
+            string += f'repeats every {period} since gen:{start}   '
+        if self.__world.is_recording():
+            string += 'recording   '
         return string
 
     def help(self, filename, prompt = None):
@@ -154,17 +201,66 @@ class Life(object):
         else:
             prompt = 'How many generations do you want to do?'
             generations = toolbox.get_integer_between(1, 10000, prompt)
-        for generation in range(generations):
-            self.__world.next_generation()
-            if self.__world.is_stable() == True:
-                break
-            string = self.__world.__str__()
-            string += self.status()
-            string += f'left: {generations - generation}'
-            print(string)
-            time.sleep(self.__delay)
+        #
+        # Whatever was printed before is in the way, so the first frame is
+        # drawn whole and the rest only redraw the cells that changed.
+        #
+        self.__renderer.reset()
+        last = self.__world.get_generation() + generations
+        describe = lambda: self.status() + f'left: {last - self.__world.get_generation()}   '
+        runner = Runner(self.__world, generations, self.__delay, describe)
+        asyncio.run(self.play(runner))
+        print()
         print(self.menu())
 
+    async def play(self, runner, keys=None):
+        """
+        Draw a run while reading keys to control it: space pauses and
+        resumes, n steps one generation while paused, + and - change the
+        speed and q stops. The generations are done by the runner's thread,
+        so keys are handled right away however long a generation takes.
+        :param runner: the Runner to play.
+        :param keys: where to get keys from, a Keyboard if None.
+        :return: None
+        """
+        def draw(cells, text):
+            generationRate, frameRate = runner.get_rates()
+            text += f'{generationRate:0.1f} gen/s   {frameRate:0.1f} fps   '
+            if runner.is_paused():
+                text += 'paused'
+            self.__renderer.draw(cells, text + '\n' + Life.playKeys)
+
+        if keys is None:
+            with Keyboard() as keyboard:
+                await self.play(runner, keyboard)
+            return
+        playing = asyncio.ensure_future(runner.play(draw))
+        while not playing.done():
+            reading = asyncio.ensure_future(keys.get())
+            await asyncio.wait([playing, reading], return_when=asyncio.FIRST_COMPLETED)
+            if not reading.done():
+                reading.cancel()
+                break
+            key = reading.result().lower()
+            if key in ' p':
+                if runner.is_paused():
+                    runner.resume()
+                else:
+                    runner.pause()
+            elif key in 'n.':
+                runner.step()
+            elif key in '+=-':
+                if key == '-':
+                    self.__speed = max(0, self.__speed - 1)
+                else:
+                    self.__speed = min(len(Life.speeds) - 1, self.__speed + 1)
+                self.__delay = Life.speeds[self.__speed]
+                runner.set_delay(self.__delay)
+            elif key in 'q\x1b':
+                runner.stop()
+                runner.resume()
+        await playing
+
     def skip_generations(self, generations):
         """
         Displays the next generation of the world
@@ -177,16 +273,40 @@ class Life(object):
             prompt = 'How many generations do you wanna skip?'
             generations = toolbox.get_integer_between(1, 10000, prompt)
         print(f'Skipping {generations} generations.', end='')
-        while True:
+        if self.__world.get_geometry() == 'plane':
+            #
+            # On the plane HashLife can jump straight to the end.
+            #
+            self.__world.set_engine('hashlife')
+            self.__world.advance(generations)
+        else:
             for generation in range(generations):
                 self.__world.next_generation()
-                self.__world.is_stable(self.__world)
+                if self.__world.is_stable():
+                    break
                 if generation % 100 == 0:
                     print('.', end='')
         print(' done!')
         time.sleep(2)
         self.display()
 
+    def rewind(self, generations):
+        """
+        Go back a number of generations, one if none is given.
+        :param generations: how many generations to go back.
+        :return: None
+        """
+        if toolbox.is_integer(generations) and int(generations) > 0:
+            generations = int(generations)
+        else:
+            generations = 1
+        span = self.__world.get_history_range()
+        if span is None:
+            print('There is no history to go back to.')
+        else:
+            target = max(span[0], self.__world.get_generation() - generations)
+            self.__world.rewind(target)
+
     def change_fillrate(self, fillrate):
         """
         Change the fillrate for the simulation.
@@ -212,6 +332,7 @@ class Life(object):
         else:
             prompt = 'How fast should the generations update?'
             speed = toolbox.get_integer_between(0,11,prompt)
+        self.__speed = speed
         self.__delay = Life.speeds[speed]
 
     def change_graphics(self, whichCharacters):
@@ -242,26 +363,40 @@ class Life(object):
         self.display()
 
     def set_geometry(self):
-        userGeo = toolbox.get_integer_between(1, 2, """
-        Choose 1 or 2:
-        1. bowl
-        2. torus""")
-        self.__world.set_geometry(userGeo)
+        prompt = '\n        Choose a geometry:'
+        for number, name in enumerate(Geometry.names):
+            prompt += f'\n        {number + 1}. {Geometry.geometries[name].description}'
+        userGeo = toolbox.get_integer_between(1, len(Geometry.names), prompt)
+        #
+        # Only the sparse engine can keep track of cells off the screen.
+        #
+        try:
+            if Geometry.names[userGeo - 1] == 'plane' or self.__world.get_engine() == 'hashlife':
+                self.__world.set_engine('sparse')
+            self.__world.set_geometry(userGeo)
+        except ValueError as error:
+            print(error)
         print(self.__world, end='')
         print(self.status() + '\n' + self.menu(), end='')
 
-    def random(self):
+    def random(self, seed=None):
         """
         Create a random world
+        :param seed: the seed of the soup as the status shows it, to make
+                     the same soup again, or None for a new one.
         :return: world
         """
-        self.__world.randomize(self.__fillrate)
+        if seed is not None and toolbox.is_integer(seed) and int(seed) >= 0:
+            self.__world.randomize(self.__fillrate, int(seed))
+        else:
+            self.__world.randomize(self.__fillrate)
         self.display()
 
     def save(self, filename, myPath='./'):
         """
-        Save the current generation of the current world as a text file.
-        :param filename: name of the file, may be None at this point.
+        Save the current generation of the current world as a pattern file.
+        :param filename: name of the file, may be None at this point. It can
+                         end in .rle or .cells; anything else gets .life.
         :param myPath: Where the file should be saved.
         :return: None
         """
@@ -270,7 +405,7 @@ class Life(object):
         #
         # Make sure the file has the correct file extension.
         #
-        if filename[-5:] != '.life':
+        if not filename.lower().endswith(Life.extensions):
             filename = filename + '.life'
         #
         # if the path doesn't already exist, create it.
@@ -285,31 +420,66 @@ class Life(object):
             filename = myPath + filename
         self.__world.save(filename)
 
+    def record(self, filename, myPath='./'):
+        """
+        Start recording every generation to a file, or stop if a recording
+        is already going. Play recordings back with trajectory.py.
+        :param filename: name of the file, may be None at this point.
+        :param myPath: Where the file should be saved.
+        :return: None
+        """
+        if self.__world.is_recording():
+            self.__world.stop_recording()
+            return
+        if filename == None:
+            filename = toolbox.get_string('What do you wanna call the recording? ')
+        if not filename.lower().endswith('.trj'):
+            filename = filename + '.trj'
+        if not os.path.isdir(myPath):
+            os.mkdir(myPath)
+        if filename[0:len(myPath)] != myPath:
+            filename = myPath + filename
+        try:
+            self.__world.start_recording(filename)
+        except ValueError as error:
+            print(error)
+
+    def set_world(self, world):
+        """Replace the world, finishing the old one's recording."""
+        self.__world.stop_recording()
+        self.__world = world
+
+    def find_pattern(self, filename, myPath):
+        """
+        Find a pattern file in a folder, trying each extension if the name
+        doesn't have one.
+        :return: the path to the file, or None if there isn't one.
+        """
+        if filename[0:len(myPath)] == myPath:
+            filename = filename[len(myPath):]
+        if filename.lower().endswith(Life.extensions):
+            names = [filename]
+        else:
+            names = [filename + extension for extension in Life.extensions]
+        for name in names:
+            if os.path.isfile(myPath + name):
+                return myPath + name
+        return None
+
     def open(self, filename, myPath='./'):
         """
-        open a text file and use it to populate a new world.
+        open a pattern file and use it to populate a new world.
         :param filename: name of the file, may be None at this point.
         :param myPath: Where the file is located.
         :return: None
         """
         if filename == None:
             filename = toolbox.get_string('Which file do you wanna open?')
-        #
-        # Check for and add the correct file extension.
-        #
-        if filename[-5:] != '.life':
-            filename = filename + '.life'
-        allFiles = os.listdir(myPath)
-        if filename not in allFiles:
+        path = self.find_pattern(filename, myPath)
+        if path is None:
             print('404: File not found...thanks for breaking the program, idiot.')
         else:
-            #
-            # Add on the correct path for saving files if the user didn't
-            # include it in the filename.
-            #
-            if filename[0:len(myPath)] != myPath:
-                filename = myPath + filename
-            self.__world = World.from_file(filename)
+            self.set_world(World.from_file(path))
 
     def change_size(self, parameter):
         if parameter and ('x' in parameter):
@@ -322,9 +492,36 @@ class Life(object):
             rows = toolbox.get_integer_between(1,40,prompt)
             prompt = 'How many cells in each row?'
             columns = toolbox.get_integer_between(1,120,prompt)
-        self.__world = World(rows, columns)
+        world = World(rows, columns)
+        world.set_rule(self.__world.get_rule())
+        self.set_world(world)
         self.random()
 
+    def change_rule(self, rule):
+        """
+        Change the rule the world runs by.
+        :param rule: a rule like B36/S23 or R5,C0,M1,S34..58,B34..45,NM, or
+                     one of the names in Rule.names or RangeRule.names; may
+                     be None at this point.
+        :return: None
+        """
+        if not rule:
+            print('**************************************')
+            for name, text in list(Rule.names.items()) + list(RangeRule.names.items()):
+                print(f'{name:20} {text}')
+            print('**************************************')
+            rule = toolbox.get_string('Which rule? (a name or a rule like B36/S23) ')
+        try:
+            #
+            # Only the ltl engine can run Larger than Life rules.
+            #
+            if Rule.get(rule).range > 1 and self.__world.get_engine() != 'ltl':
+                self.__world.set_engine('ltl')
+            self.__world.set_rule(rule)
+        except ValueError as error:
+            print(error)
+            time.sleep(2)
+
     def display(self):
         """
         Prints the world, status bar and menu
@@ -345,16 +542,12 @@ class Life(object):
         .... """
         rows = self.__world.get_rows()
         columns = self.__world.get_columns()
-        self.__world = World(rows, columns)
+        self.set_world(World(rows, columns))
 
         middleRow = int(rows / 2)
         middleColumn = int(columns / 2)
 
-        self.__world.set_cell(middleRow - 2, middleColumn, True)
-        self.__world.set_cell(middleRow - 1, middleColumn, True)
-        self.__world.set_cell(middleRow - 0, middleColumn, True)
-        self.__world.set_cell(middleRow + 1, middleColumn, True)
-        self.__world.set_cell(middleRow + 1, middleColumn + 1, True)
+        self.__world.stamp(Life.longL, middleRow - 2, middleColumn)
         self.display()
 
     def acorn_world(self):
@@ -367,34 +560,48 @@ class Life(object):
          """
         rows = self.__world.get_rows()
         columns = self.__world.get_columns()
-        self.__world = World(rows, columns)
+        self.set_world(World(rows, columns))
 
         middleRow = int(rows / 2)
         middleColumn = int(columns / 2)
 
-        self.__world.set_cell(middleRow - 1, middleColumn - 2, True)
-        self.__world.set_cell(middleRow - 0, middleColumn - 0, True)
-        self.__world.set_cell(middleRow + 1, middleColumn - 3, True)
-        self.__world.set_cell(middleRow + 1, middleColumn - 2, True)
-        self.__world.set_cell(middleRow + 1, middleColumn + 1, True)
-        self.__world.set_cell(middleRow + 1, middleColumn + 2, True)
-        self.__world.set_cell(middleRow + 1, middleColumn + 3, True)
+        self.__world.stamp(Life.acorn, middleRow - 1, middleColumn - 3)
         self.display()
 
     def from_library(self, filename, myPath= './'):
-        allFiles = os.listdir(myPath)
-        if filename not in allFiles:
-            for file in allFiles:
-                print(file)
+        """
+        Put a pattern from the library in the middle of a world the size of
+        the current one (or bigger, if the pattern doesn't fit).
+        :param filename: name of the pattern, or part of one to list the
+                         patterns it matches; may be None at this point.
+        :param myPath: Where the library is.
+        :return: None
+        """
+        if self.__library is None or self.__library.get_folder() != myPath:
+            if not os.path.isdir(myPath):
+                print('404: File not found...thanks for breaking the program, idiot.')
+                return
+            self.__library = Library(myPath)
+        else:
+            self.__library.refresh()
         if filename == None:
-            filename = toolbox.get_string('Which world do you wanna use?')
-        if filename[-5:] != '.life':
-            filename = filename + '.life'
+            filename = toolbox.get_string('Which pattern do you wanna use? (part of a name lists them) ')
+        name = self.__library.find(filename)
+        if name is None:
+            matches = self.__library.search(filename)
+            for match in matches[:Life.listLength]:
+                print(self.__library.describe(match))
+            if len(matches) > Life.listLength:
+                print(f'...and {len(matches) - Life.listLength} more')
+            if len(matches) == 1:
+                name = matches[0]
+            elif matches:
+                name = self.__library.find(toolbox.get_string('Which one? '))
+        if name is None:
+            print('404: File not found...thanks for breaking the program, idiot.')
         else:
-            if filename[0:len(myPath)] != myPath:
-                filename = myPath + filename
-            self.__world = World.from_file(filename)
-
+            self.set_world(World.from_pattern(self.__library.load(name), rows=self.__world.get_rows(),
+                                              columns=self.__world.get_columns()))
 
 
 
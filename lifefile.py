@@ -0,0 +1,211 @@
+import numpy
+import struct
+
+
+class LifeFile(object):
+    """
+    A world saved in the binary .life format: a 128 byte header with the
+    size, generation, geometry, rule and how the soup was made, then the
+    rows of the board with one bit per cell. Every row is padded to a
+    whole number of 64 bit words so that the rows line up. The file is
+    opened with a memory map, so opening even a 100000x100000 world
+    (1.25 GB) is instant, and reading or changing a rectangle of it only
+    touches the rows and bytes that the rectangle covers.
+
+    Text .life files from before this format are still read by
+    World.from_file; is_life_file tells the two apart.
+    """
+
+    magic = b'LIFEBIN1'
+
+    version = 2
+
+    #
+    # magic, version, rows, columns, generation, geometry, rule, soup,
+    # long rule bytes. A rule that doesn't fit in its 32 bytes is written
+    # straight after the header instead, padded to 8 bytes, with its
+    # length in the last field, and the board starts after it; for other
+    # rules that field is 0 and the board starts straight after the
+    # header. A soup longer than 50 characters is cut short.
+    #
+    headerFormat = '<8sHIIQ16s32s50sI'
+
+    #
+    # Version 1 files had no long rules and 54 bytes of soup. The soup was
+    # added in the bytes that used to be left empty, so files from before
+    # it read as having no soup.
+    #
+    oldHeaderFormat = '<8sHIIQ16s32s54s'
+
+    headerSize = 128
+
+    ruleSize = 32
+
+    @classmethod
+    def is_life_file(cls, filename):
+        """Return whether a file is in the binary format."""
+        with open(filename, 'rb') as lifeFile:
+            return lifeFile.read(len(cls.magic)) == cls.magic
+
+    @classmethod
+    def create(cls, filename, rows, columns, generation=0, geometry='bowl', rule='B3/S23', soup=''):
+        """
+        Make a new file of dead cells. The file is only set to its size, so
+        on most file systems even a huge world takes no time or disk space
+        until it is written to.
+        :return: the LifeFile, open for reading and writing.
+        """
+        header = cls.pack_header(rows, columns, generation, geometry, rule, soup)
+        with open(filename, 'wb') as lifeFile:
+            lifeFile.write(header)
+            lifeFile.truncate(len(header) + rows * cls.row_bytes(columns))
+        return LifeFile(filename, 'r+')
+
+    @classmethod
+    def row_bytes(cls, columns):
+        return (columns + 63) // 64 * 8
+
+    @classmethod
+    def long_rule_bytes(cls, rule):
+        """Return how many bytes a rule takes after the header (0 if it
+        fits in the header)."""
+        return 0 if len(rule) <= cls.ruleSize else (len(rule) + 7) // 8 * 8
+
+    @classmethod
+    def pack_header(cls, rows, columns, generation, geometry, rule, soup=''):
+        """Return the header, and the rule after it if it is too long for
+        the header."""
+        rule = rule.encode('ascii')
+        longRule = cls.long_rule_bytes(rule)
+        header = struct.pack(cls.headerFormat, cls.magic, cls.version, rows, columns, generation,
+                             geometry.encode('ascii'), b'' if longRule else rule, soup.encode('ascii'),
+                             len(rule) if longRule else 0)
+        return header.ljust(cls.headerSize, b'\0') + (rule.ljust(longRule, b'\0') if longRule else b'')
+
+    def __init__(self, filename, mode='r'):
+        """
+        :param filename: path and filename of a binary .life file.
+        :param mode: 'r' to only read, 'r+' to read and write.
+        """
+        self.__filename = filename
+        self.__mode = mode
+        with open(filename, 'rb') as lifeFile:
+            header = lifeFile.read(LifeFile.headerSize)
+            if len(header) < LifeFile.headerSize or header[:len(LifeFile.magic)] != LifeFile.magic:
+                raise ValueError(f'{filename} is not a binary .life file.')
+            version = struct.unpack_from('<H', header, len(LifeFile.magic))[0]
+            if version > LifeFile.version:
+                raise ValueError(f'{filename} is from a newer version ({version}).')
+            ruleLength = 0
+            if version == 1:
+                (magic, version, self.__rows, self.__columns, self.__generation,
+                 geometry, rule, soup) = struct.unpack_from(LifeFile.oldHeaderFormat, header)
+            else:
+                (magic, version, self.__rows, self.__columns, self.__generation,
+                 geometry, rule, soup, ruleLength) = struct.unpack_from(LifeFile.headerFormat, header)
+            if ruleLength:
+                rule = lifeFile.read(ruleLength)
+        self.__geometry = geometry.rstrip(b'\0').decode('ascii')
+        self.__rule = rule.rstrip(b'\0').decode('ascii')
+        self.__soup = soup.rstrip(b'\0').decode('ascii')
+        self.__offset = LifeFile.headerSize + LifeFile.long_rule_bytes(self.__rule)
+        self.__bits = numpy.memmap(filename, dtype=numpy.uint8, mode=mode, offset=self.__offset,
+                                   shape=(self.__rows, LifeFile.row_bytes(self.__columns)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *details):
+        self.close()
+        return False
+
+    def close(self):
+        """Write any changes and let go of the file."""
+        if self.__bits is not None:
+            if self.__mode != 'r':
+                self.__bits.flush()
+            self.__bits = None
+
+    def get_rows(self):
+        return self.__rows
+
+    def get_columns(self):
+        return self.__columns
+
+    def get_generation(self):
+        return self.__generation
+
+    def get_geometry(self):
+        return self.__geometry
+
+    def get_rule(self):
+        return self.__rule
+
+    def get_soup(self):
+        """Return how the world's soup was made, as World.describe_soup
+        wrote it, or ''."""
+        return self.__soup
+
+    def set_header(self, generation=None, geometry=None, rule=None, soup=None):
+        """Change the generation, geometry, rule or soup in the header. A
+        rule can't be changed to one that needs more or less room after
+        the header; save the world to a new file for that."""
+        if rule is not None and LifeFile.long_rule_bytes(rule) != LifeFile.long_rule_bytes(self.__rule):
+            raise ValueError(f'The rule {rule} needs a new file, it takes a different amount of room.')
+        if generation is not None:
+            self.__generation = generation
+        if geometry is not None:
+            self.__geometry = geometry
+        if rule is not None:
+            self.__rule = rule
+        if soup is not None:
+            self.__soup = soup
+        with open(self.__filename, 'r+b') as lifeFile:
+            lifeFile.write(LifeFile.pack_header(self.__rows, self.__columns, self.__generation,
+                                                self.__geometry, self.__rule, self.__soup))
+
+    def check_region(self, top, left, height, width):
+        if top < 0 or left < 0 or top + height > self.__rows or left + width > self.__columns:
+            raise ValueError(f'The region must be inside the {self.__rows}x{self.__columns} world.')
+
+    def read_region(self, top, left, height, width):
+        """
+        Return a rectangle of the world.
+        :return: (height, width) uint8 array of 0s and 1s.
+        """
+        self.check_region(top, left, height, width)
+        first = left // 8
+        last = (left + width + 7) // 8
+        cells = numpy.unpackbits(self.__bits[top:top + height, first:last], axis=1)
+        return cells[:, left - first * 8:left - first * 8 + width]
+
+    def write_region(self, top, left, cells):
+        """Replace a rectangle of the world, with its top left corner at
+        (top, left), by a 2 dimensional array of 0s and 1s."""
+        cells = numpy.asarray(cells) != 0
+        height, width = cells.shape
+        self.check_region(top, left, height, width)
+        first = left // 8
+        last = (left + width + 7) // 8
+        #
+        # The bytes at the ends of the rectangle are shared with cells
+        # outside it, so unpack them, change just the rectangle and pack
+        # them up again.
+        #
+        packed = self.__bits[top:top + height, first:last]
+        unpacked = numpy.unpackbits(packed, axis=1)
+        unpacked[:, left - first * 8:left - first * 8 + width] = cells
+        packed[:] = numpy.packbits(unpacked, axis=1)
+
+    def read_all(self):
+        return self.read_region(0, 0, self.__rows, self.__columns)
+
+    def write_all(self, cells):
+        self.write_region(0, 0, cells)
+
+
+def save_life(filename, cells, generation=0, geometry='bowl', rule='B3/S23', soup=''):
+    """Write a whole board to a new binary .life file."""
+    rows, columns = numpy.shape(cells)
+    with LifeFile.create(filename, rows, columns, generation, geometry, rule, soup) as lifeFile:
+        lifeFile.write_all(cells)
@@ -0,0 +1,126 @@
+from geometry import Geometry
+from rule import Rule
+import numpy
+
+
+class LargerThanLifeEngine(object):
+    """
+    Steps a world by a Larger than Life rule (a RangeRule), where every
+    cell counts the living cells in the (2 * range + 1) square around it.
+    Adding up the square for every cell would cost range**2 per cell, so
+    instead the engine makes a summed-area table of the padded board once
+    a generation: sums[row, column] is the number of living cells above
+    and to the left of (row, column). The count for any square is then
+    four lookups in the table,
+
+        sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+
+    which costs the same whatever the range is. The halo is range cells
+    wide and filled from the geometry's halo map, so every bounded geometry
+    works. Ordinary totalistic rules (range 1) run on it too.
+    """
+
+    name = 'ltl'
+
+    geometries = Geometry.bounded
+
+    #
+    # The longest range that can be run; World checks other engines
+    # against 1.
+    #
+    maxRange = 64
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__geometry = geometry
+        self.__cells = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        self.set_rule(Rule.get('B3/S23'))
+
+    def set_rule(self, rule):
+        """Change the rule to a RangeRule or a totalistic Rule."""
+        if not rule.totalistic:
+            raise ValueError(f'The ltl engine can only run totalistic rules, not {rule}.')
+        if rule.range > LargerThanLifeEngine.maxRange:
+            raise ValueError(f'The ltl engine can only run rules up to range {LargerThanLifeEngine.maxRange}.')
+        self.__rule = rule
+        self.make_buffers()
+
+    def make_buffers(self):
+        """Make the buffers for the range of the rule, which are reused
+        every generation."""
+        reach = self.__rule.range
+        rows = self.__rows
+        columns = self.__columns
+        self.__halo = Geometry.get(self.__geometry).halo(rows, columns, reach)
+        self.__padded = numpy.zeros((rows + 2 * reach, columns + 2 * reach), dtype=numpy.uint8)
+        #
+        # The table has an extra row and column of 0s at the top and left,
+        # so that squares on the first rows and columns need no special
+        # case. int32 is quicker to add up and holds any board up to about
+        # 46000x46000.
+        #
+        sumType = numpy.int32 if self.__padded.size < 2 ** 31 else numpy.int64
+        self.__sums = numpy.zeros((rows + 2 * reach + 1, columns + 2 * reach + 1), dtype=sumType)
+        self.__counts = numpy.zeros((rows, columns), dtype=sumType)
+
+    def get_cells(self):
+        """Returns the board as a (rows, columns) uint8 array. Don't change it."""
+        return self.__cells
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        self.__cells = (numpy.asarray(cells).reshape(self.__rows, self.__columns) != 0).astype(numpy.uint8)
+
+    def get_cell(self, row, column):
+        return bool(self.__cells[row, column])
+
+    def set_cell(self, row, column, living):
+        self.__cells[row, column] = living
+
+    def get_positions(self, rows, columns):
+        return self.__cells[rows, columns]
+
+    def set_positions(self, rows, columns, living):
+        self.__cells[rows, columns] = living
+
+    def set_geometry(self, geometry):
+        self.__geometry = geometry
+        self.make_buffers()
+
+    def population(self):
+        return int(numpy.count_nonzero(self.__cells))
+
+    def step(self):
+        """Advance the board one generation."""
+        reach = self.__rule.range
+        side = 2 * reach + 1
+        cells = self.__cells
+        padded = self.__padded
+        padded[reach:-reach, reach:-reach] = cells
+        haloRows, haloColumns, sourceRows, sourceColumns = self.__halo
+        padded[haloRows, haloColumns] = cells[sourceRows, sourceColumns]
+        sums = self.__sums
+        #
+        # Add up along the rows in one go, then down the columns a row at
+        # a time: numpy's cumsum down axis 0 walks the board column by
+        # column and is twice as slow as adding whole rows.
+        #
+        numpy.cumsum(padded, axis=1, dtype=sums.dtype, out=sums[1:, 1:])
+        for row in range(2, sums.shape[0]):
+            numpy.add(sums[row], sums[row - 1], out=sums[row])
+        #
+        # The square around cell (row, column) is padded rows row to
+        # row + side - 1, which is sums rows row to row + side.
+        #
+        counts = self.__counts
+        numpy.subtract(sums[side:, side:], sums[:-side, side:], out=counts)
+        counts -= sums[side:, :-side]
+        counts += sums[:-side, :-side]
+        #
+        # The square includes the cell, so 2 * neighbors + the cell is
+        # 2 * the count - the cell.
+        #
+        counts *= 2
+        counts -= cells
+        numpy.take(self.__rule.totals, counts, out=cells, mode='clip')
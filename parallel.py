@@ -0,0 +1,280 @@
+from concurrent.futures import ThreadPoolExecutor
+from engine import step_padded
+from geometry import Geometry
+from multiprocessing import shared_memory
+from rule import Rule
+import multiprocessing
+import numpy
+import os
+import weakref
+
+
+#
+# What each worker process knows about the shared boards. It is filled in
+# once by attach_boards when the worker starts, so the only thing sent to a
+# worker every generation is which tile to do.
+#
+workerBoards = {}
+
+
+def attach_boards(names, shape):
+    """Start a worker process by opening the two shared boards."""
+    for number, name in enumerate(names):
+        memory = shared_memory.SharedMemory(name=name)
+        workerBoards[number] = (memory, numpy.ndarray(shape, dtype=numpy.uint8, buffer=memory.buf))
+
+
+def step_tile(task):
+    """
+    Work out the next generation of one tile in a worker process.
+    :param task: (current, firstRow, lastRow, rule) where current is which
+                 of the two boards holds this generation, the tile is the
+                 rows firstRow up to lastRow of the world and rule is the
+                 rule as a string (Rule.get only compiles it once in each
+                 worker).
+    :return: None
+    """
+    current, firstRow, lastRow, rule = task
+    padded = workerBoards[current][1]
+    following = workerBoards[1 - current][1]
+    #
+    # The tile reads the row above and below it straight out of the shared
+    # board; those are its halo.
+    #
+    step_padded(padded[firstRow:lastRow + 2], following[firstRow + 1:lastRow + 1, 1:-1], rule=Rule.get(rule))
+
+
+def close_boards(pool, memories):
+    """Shut down the pool and give back the shared memory."""
+    if pool is not None:
+        pool.terminate()
+    for memory in memories:
+        memory.close()
+        memory.unlink()
+
+
+class TiledEngine(object):
+    """
+    Steps a world with a pool of worker processes. The board (with its
+    halo) lives in shared memory twice, this generation and the next, and
+    each worker works out one band of rows (a tile) of the next generation
+    straight from the shared board. Every generation the halo around the
+    world is filled from the geometry's halo map and the tiles read the
+    rows next to them from their neighbors, so the only thing that is
+    pickled is which tile to do. The number of worker processes is
+    TiledEngine.workers, or set_workers for one world.
+    """
+
+    name = 'tiled'
+
+    geometries = Geometry.bounded
+
+    workers = os.cpu_count() or 1
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__workers = TiledEngine.workers
+        self.__pool = None
+        shape = (rows + 2, columns + 2)
+        self.__memories = [shared_memory.SharedMemory(create=True, size=shape[0] * shape[1])
+                           for board in range(2)]
+        self.__boards = [numpy.ndarray(shape, dtype=numpy.uint8, buffer=memory.buf)
+                         for memory in self.__memories]
+        for board in self.__boards:
+            board[:] = 0
+        self.__current = 0
+        self.__rule = Rule.get('B3/S23')
+        self.__closer = weakref.finalize(self, close_boards, None, self.__memories)
+        self.set_geometry(geometry)
+
+    def set_rule(self, rule):
+        """Change the rule to a Rule (every rule works here)."""
+        self.__rule = rule
+
+    def set_workers(self, workers):
+        """Change the number of worker processes."""
+        self.__workers = max(1, int(workers))
+        self.close_pool()
+
+    def get_workers(self):
+        return self.__workers
+
+    def start_pool(self):
+        if self.__pool is None:
+            names = [memory.name for memory in self.__memories]
+            self.__pool = multiprocessing.Pool(self.__workers, initializer=attach_boards,
+                                               initargs=(names, self.__boards[0].shape))
+            self.__closer.detach()
+            self.__closer = weakref.finalize(self, close_boards, self.__pool, self.__memories)
+
+    def close_pool(self):
+        if self.__pool is not None:
+            self.__closer.detach()
+            self.__pool.terminate()
+            self.__pool = None
+            self.__closer = weakref.finalize(self, close_boards, None, self.__memories)
+
+    def close(self):
+        """Stop the worker processes and give back the shared memory."""
+        self.__closer()
+
+    def get_cells(self):
+        """Returns the board as a (rows, columns) uint8 array. Don't change
+        it or keep it, the buffer is reused two generations later."""
+        return self.__boards[self.__current][1:-1, 1:-1]
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        cells = numpy.asarray(cells).reshape(self.__rows, self.__columns)
+        self.__boards[self.__current][1:-1, 1:-1] = cells != 0
+
+    def get_cell(self, row, column):
+        return bool(self.__boards[self.__current][row + 1, column + 1])
+
+    def set_cell(self, row, column, living):
+        self.__boards[self.__current][row + 1, column + 1] = living
+
+    def get_positions(self, rows, columns):
+        return self.__boards[self.__current][rows + 1, columns + 1]
+
+    def set_positions(self, rows, columns, living):
+        self.__boards[self.__current][rows + 1, columns + 1] = living
+
+    def set_geometry(self, geometry):
+        self.__halo = Geometry.get(geometry).halo(self.__rows, self.__columns)
+        for board in self.__boards:
+            board[0] = 0
+            board[-1] = 0
+            board[:, 0] = 0
+            board[:, -1] = 0
+
+    def population(self):
+        return int(numpy.count_nonzero(self.get_cells()))
+
+    def tiles(self):
+        """Split the rows into one band for each worker."""
+        bounds = numpy.linspace(0, self.__rows, min(self.__workers, self.__rows) + 1).astype(int)
+        return [(int(first), int(last)) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+
+    def step(self):
+        """Advance the board one generation."""
+        self.start_pool()
+        padded = self.__boards[self.__current]
+        haloRows, haloColumns, sourceRows, sourceColumns = self.__halo
+        padded[haloRows, haloColumns] = padded[sourceRows + 1, sourceColumns + 1]
+        tasks = [(self.__current, first, last, str(self.__rule)) for first, last in self.tiles()]
+        self.__pool.map(step_tile, tasks)
+        self.__current = 1 - self.__current
+
+
+class ThreadedEngine(object):
+    """
+    Steps a world with a pool of threads instead of processes. The board is
+    split into bands of rows (strips) and each thread works out its strip
+    of the next generation into a buffer made once, straight from a padded
+    copy of the board. NumPy lets go of the GIL while it adds up arrays,
+    so the strips really do run at the same time, and there is no process
+    start up or shared memory to set up, which makes this the better
+    choice for medium boards. The number of threads is picked from the size
+    of the board unless set_workers says otherwise.
+    """
+
+    name = 'threaded'
+
+    geometries = Geometry.bounded
+
+    #
+    # Below this many cells per strip, handing out the strips costs more
+    # than it saves.
+    #
+    cellsPerStrip = 256 * 1024
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__cells = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        self.__next = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        self.__padded = numpy.zeros((rows + 2, columns + 2), dtype=numpy.uint8)
+        self.__pool = None
+        self.__rule = None
+        self.set_workers(None)
+        self.set_geometry(geometry)
+
+    def set_rule(self, rule):
+        """Change the rule to a Rule (every rule works here)."""
+        self.__rule = rule
+
+    def set_workers(self, workers):
+        """
+        Change the number of threads.
+        :param workers: number of threads, or None to pick it from the size
+                        of the board.
+        :return: None
+        """
+        if workers is None:
+            strips = (self.__rows * self.__columns) // ThreadedEngine.cellsPerStrip
+            workers = min(os.cpu_count() or 1, strips)
+        self.__workers = max(1, min(int(workers), self.__rows))
+        self.close()
+
+    def get_workers(self):
+        return self.__workers
+
+    def close(self):
+        """Stop the threads."""
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def get_cells(self):
+        """Returns the board as a (rows, columns) uint8 array. Don't change
+        it or keep it, the buffer is reused two generations later."""
+        return self.__cells
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        self.__cells[:] = numpy.asarray(cells).reshape(self.__rows, self.__columns) != 0
+
+    def get_cell(self, row, column):
+        return bool(self.__cells[row, column])
+
+    def set_cell(self, row, column, living):
+        self.__cells[row, column] = living
+
+    def get_positions(self, rows, columns):
+        return self.__cells[rows, columns]
+
+    def set_positions(self, rows, columns, living):
+        self.__cells[rows, columns] = living
+
+    def set_geometry(self, geometry):
+        self.__halo = Geometry.get(geometry).halo(self.__rows, self.__columns)
+        self.__padded[0] = 0
+        self.__padded[-1] = 0
+        self.__padded[:, 0] = 0
+        self.__padded[:, -1] = 0
+
+    def population(self):
+        return int(numpy.count_nonzero(self.__cells))
+
+    def step_strip(self, strip):
+        """Work out the next generation of the rows first up to last."""
+        first, last = strip
+        step_padded(self.__padded[first:last + 2], self.__next[first:last], rule=self.__rule)
+
+    def step(self):
+        """Advance the board one generation."""
+        padded = self.__padded
+        padded[1:-1, 1:-1] = self.__cells
+        haloRows, haloColumns, sourceRows, sourceColumns = self.__halo
+        padded[haloRows, haloColumns] = self.__cells[sourceRows, sourceColumns]
+        bounds = numpy.linspace(0, self.__rows, self.__workers + 1).astype(int)
+        strips = [(int(first), int(last)) for first, last in zip(bounds[:-1], bounds[1:])]
+        if self.__workers == 1:
+            self.step_strip(strips[0])
+        else:
+            if self.__pool is None:
+                self.__pool = ThreadPoolExecutor(self.__workers)
+            list(self.__pool.map(self.step_strip, strips))
+        self.__cells, self.__next = self.__next, self.__cells
@@ -0,0 +1,283 @@
+"""
+Reading and writing patterns in the formats other Life programs use: RLE
+(.rle, what Golly and LifeWiki use) and plaintext (.cells, and the old
+.life files, which are plaintext without the comments). Patterns are
+passed around as the size of the pattern and two arrays with the rows and
+columns of its living cells, so big sparse patterns stay small. Readers go
+through a file once, a chunk at a time, and writers only do work for the
+living cells (and the rows, for plaintext).
+"""
+import numpy
+import re
+
+#
+# How much of an RLE file is read at a time.
+#
+chunkSize = 1024 * 1024
+
+rulePattern = re.compile(r'^!\s*rule\s*[=:]?\s*(\S+)', re.IGNORECASE)
+
+headerPattern = re.compile(r'x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?')
+
+
+def read_rle(stream):
+    """
+    Read an RLE pattern.
+    :param stream: a text file open for reading.
+    :return: (rows, columns, livingRows, livingColumns, rule) where rule is
+             the rule in the header, or None if there isn't one.
+    """
+    rows = columns = 0
+    rule = None
+    line = stream.readline()
+    while line and (line.startswith('#') or not line.strip()):
+        line = stream.readline()
+    header = headerPattern.match(line.strip())
+    if header:
+        columns = int(header.group(1))
+        rows = int(header.group(2))
+        rule = header.group(3)
+        body = ''
+    else:
+        #
+        # No header, the pattern starts straight away.
+        #
+        body = line
+    runRows = []
+    runColumns = []
+    runLengths = []
+    row = column = 0
+    body = numpy.frombuffer(body.encode('latin-1'), dtype=numpy.uint8)
+    finished = False
+    while not finished:
+        chunk = stream.read(chunkSize)
+        if not chunk:
+            finished = True
+        body = numpy.concatenate((body, numpy.frombuffer(chunk.encode('latin-1'), dtype=numpy.uint8)))
+        #
+        # Whitespace means nothing and everything after the ! is ignored.
+        #
+        body = body[body > ord(' ')]
+        end = numpy.flatnonzero(body == ord('!'))
+        if end.size:
+            body = body[:end[0]]
+            finished = True
+        digits = (body >= ord('0')) & (body <= ord('9'))
+        #
+        # A count at the very end may carry on in the next chunk.
+        #
+        cut = body.size
+        while not finished and cut and digits[cut - 1]:
+            cut -= 1
+        tokens, digits, body = body[:cut], digits[:cut], body[cut:]
+        tagsAt = numpy.flatnonzero(~digits)
+        if not tagsAt.size:
+            continue
+        tags = tokens[tagsAt]
+        #
+        # Each tag's count is the digits before it, or 1 if there are none.
+        #
+        digitsAt = numpy.flatnonzero(digits)
+        owners = numpy.searchsorted(tagsAt, digitsAt)
+        places = (tagsAt[owners] - digitsAt - 1).astype(numpy.int64)
+        values = (tokens[digitsAt] - ord('0')).astype(numpy.int64) * 10 ** places
+        counts = numpy.zeros(tagsAt.size, dtype=numpy.int64)
+        numpy.add.at(counts, owners, values)
+        counts[numpy.bincount(owners, minlength=tagsAt.size) == 0] = 1
+        #
+        # Work out where every tag starts: the row is the number of row
+        # ends before it, the column how far along the row it is.
+        #
+        newLines = tags == ord('$')
+        rowsDown = numpy.cumsum(numpy.where(newLines, counts, 0))
+        advance = numpy.where(newLines, 0, counts)
+        along = numpy.cumsum(advance) - advance + column
+        along -= numpy.maximum.accumulate(numpy.where(newLines, along, 0))
+        living = ~newLines & (tags != ord('b')) & (tags != ord('.'))
+        runRows.append(rowsDown[living] + row)
+        runColumns.append(along[living])
+        runLengths.append(counts[living])
+        #
+        # Carry on in the next chunk from where this one stopped.
+        #
+        column = int(along[-1] + advance[-1])
+        row += int(rowsDown[-1])
+    if runRows:
+        runRows = numpy.concatenate(runRows)
+        runColumns = numpy.concatenate(runColumns)
+        runLengths = numpy.concatenate(runLengths)
+    livingRows, livingColumns = expand_runs(runRows, runColumns, runLengths)
+    if livingRows.size:
+        rows = max(rows, int(livingRows.max()) + 1)
+        columns = max(columns, int(livingColumns.max()) + 1)
+    return rows, columns, livingRows, livingColumns, rule
+
+
+def expand_runs(runRows, runColumns, runLengths):
+    """Turn runs of living cells into the rows and columns of each cell."""
+    lengths = numpy.asarray(runLengths, dtype=numpy.int64)
+    livingRows = numpy.repeat(numpy.asarray(runRows, dtype=numpy.int64), lengths)
+    starts = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    livingColumns = (numpy.repeat(numpy.asarray(runColumns, dtype=numpy.int64), lengths) +
+                     numpy.arange(lengths.sum()) - starts)
+    return livingRows, livingColumns
+
+
+def find_runs(livingRows, livingColumns):
+    """
+    Turn living cells into runs along the rows.
+    :return: (runRows, runColumns, runLengths) lists in reading order.
+    """
+    livingRows = numpy.asarray(livingRows, dtype=numpy.int64)
+    livingColumns = numpy.asarray(livingColumns, dtype=numpy.int64)
+    if not livingRows.size:
+        return [], [], []
+    order = numpy.lexsort((livingColumns, livingRows))
+    livingRows = livingRows[order]
+    livingColumns = livingColumns[order]
+    starts = numpy.flatnonzero((numpy.diff(livingRows) != 0) | (numpy.diff(livingColumns) != 1)) + 1
+    starts = numpy.concatenate(([0], starts))
+    lengths = numpy.diff(numpy.concatenate((starts, [livingRows.size])))
+    return livingRows[starts].tolist(), livingColumns[starts].tolist(), lengths.tolist()
+
+
+def transform(rows, columns, livingRows, livingColumns, turns=0, flip=False):
+    """
+    Turn or mirror a pattern.
+    :param turns: quarter turns clockwise.
+    :param flip: mirror the pattern left to right before turning it.
+    :return: (rows, columns, livingRows, livingColumns) of the new pattern.
+    """
+    livingRows = numpy.asarray(livingRows, dtype=numpy.int64)
+    livingColumns = numpy.asarray(livingColumns, dtype=numpy.int64)
+    if flip:
+        livingColumns = columns - 1 - livingColumns
+    for turn in range(turns % 4):
+        livingRows, livingColumns = livingColumns, rows - 1 - livingRows
+        rows, columns = columns, rows
+    return rows, columns, livingRows, livingColumns
+
+
+def write_rle(stream, rows, columns, livingRows, livingColumns, rule='B3/S23', comments=()):
+    """
+    Write a pattern as RLE.
+    :param stream: a text file open for writing.
+    :param rows: rows in the pattern.
+    :param columns: columns in the pattern.
+    :param livingRows: array of the rows of the living cells.
+    :param livingColumns: array of the columns of the living cells.
+    :param rule: the rule for the header.
+    :param comments: lines to put in #C comments.
+    :return: None
+    """
+    for comment in comments:
+        stream.write(f'#C {comment}\n')
+    stream.write(f'x = {columns}, y = {rows}, rule = {rule}\n')
+    tokens = []
+    row = column = 0
+    for runRow, runColumn, length in zip(*find_runs(livingRows, livingColumns)):
+        if runRow != row:
+            tokens.append(f'{runRow - row if runRow - row > 1 else ""}$')
+            row = runRow
+            column = 0
+        if runColumn != column:
+            tokens.append(f'{runColumn - column if runColumn - column > 1 else ""}b')
+        tokens.append(f'{length if length > 1 else ""}o')
+        column = runColumn + length
+    tokens.append('!')
+    #
+    # Lines are kept to 70 characters without splitting a token.
+    #
+    line = []
+    width = 0
+    for token in tokens:
+        if width + len(token) > 70:
+            stream.write(''.join(line) + '\n')
+            line = []
+            width = 0
+        line.append(token)
+        width += len(token)
+    stream.write(''.join(line) + '\n')
+
+
+def read_cells(stream, liveCharacters='O*'):
+    """
+    Read a plaintext pattern: a line for every row, '!' at the start of a
+    comment line, and any of liveCharacters for a living cell. A comment
+    like '!rule B36/S23' gives the rule.
+    :param stream: a text file open for reading.
+    :return: (rows, columns, livingRows, livingColumns, rule) where rule is
+             None if no comment gives it.
+    """
+    live = numpy.array([ord(character) for character in liveCharacters], dtype=numpy.uint32)
+    rows = columns = 0
+    rule = None
+    foundRows = []
+    foundColumns = []
+    for line in stream:
+        if line.startswith('!'):
+            ruleComment = rulePattern.match(line)
+            if ruleComment:
+                rule = ruleComment.group(1)
+            continue
+        line = line.rstrip('\r\n')
+        columns = max(columns, len(line))
+        if line:
+            codes = numpy.frombuffer(line.encode('utf-32-le'), dtype=numpy.uint32)
+            found = numpy.flatnonzero(numpy.isin(codes, live))
+            if found.size:
+                foundRows.append(numpy.full(found.size, rows, dtype=numpy.int64))
+                foundColumns.append(found)
+        rows += 1
+    if foundRows:
+        return (rows, columns, numpy.concatenate(foundRows),
+                numpy.concatenate(foundColumns).astype(numpy.int64), rule)
+    return rows, columns, numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64), rule
+
+
+def write_cells(stream, rows, columns, livingRows, livingColumns, comments=(), fullRows=False):
+    """
+    Write a pattern as plaintext.
+    :param fullRows: write every row out to the full width, as .life files
+                     have always been, instead of stopping each row at its
+                     last living cell.
+    :return: None
+    """
+    for comment in comments:
+        stream.write(f'!{comment}\n')
+    runRows, runColumns, runLengths = find_runs(livingRows, livingColumns)
+    run = 0
+    emptyRow = '.' * columns + '\n' if fullRows else '\n'
+    for row in range(rows):
+        if run < len(runRows) and runRows[run] == row:
+            line = []
+            column = 0
+            while run < len(runRows) and runRows[run] == row:
+                line.append('.' * (runColumns[run] - column) + 'O' * runLengths[run])
+                column = runColumns[run] + runLengths[run]
+                run += 1
+            if fullRows:
+                line.append('.' * (columns - column))
+            line.append('\n')
+            stream.write(''.join(line))
+        else:
+            stream.write(emptyRow)
+
+
+def read_pattern(filename):
+    """Read a pattern file of any of the formats, going by its extension."""
+    with open(filename, 'r') as patternFile:
+        if filename.lower().endswith('.rle'):
+            return read_rle(patternFile)
+        return read_cells(patternFile)
+
+
+def write_pattern(filename, rows, columns, livingRows, livingColumns, rule='B3/S23', comments=()):
+    """Write a pattern file in the format its extension says."""
+    with open(filename, 'w') as patternFile:
+        if filename.lower().endswith('.rle'):
+            write_rle(patternFile, rows, columns, livingRows, livingColumns, rule, comments)
+        elif filename.lower().endswith('.cells'):
+            write_cells(patternFile, rows, columns, livingRows, livingColumns, comments)
+        else:
+            write_cells(patternFile, rows, columns, livingRows, livingColumns, fullRows=True)
@@ -0,0 +1,100 @@
+from cell import Cell
+import numpy
+import sys
+import unicodedata
+
+
+class Renderer(object):
+    """
+    Draws worlds on an ANSI terminal without scrolling. The first frame
+    clears the screen and draws the whole board; after that the renderer
+    compares each board with the one before it and only moves the cursor to
+    the cells that changed and writes those. Each frame is put together in
+    a list and written with one sys.stdout.write, so the terminal gets it
+    all at once.
+    """
+
+    #
+    # Changed cells closer together than this on a row are written as one
+    # run, since the cells in between cost less than another cursor move.
+    #
+    gap = 8
+
+    def __init__(self, stream=None):
+        self.__stream = stream if stream is not None else sys.stdout
+        self.__characters = None
+        self.reset()
+
+    def reset(self):
+        """Forget what is on the screen, so the next frame is drawn whole.
+        Use it after anything else has printed."""
+        self.__previous = None
+
+    def get_table(self):
+        """
+        Return the translation from cell bytes to characters, made again
+        only when Cell's display characters change.
+        :return: (table, width) where width is how many terminal columns
+                 a cell takes up.
+        """
+        characters = (Cell.deadChar, Cell.liveChar)
+        if characters != self.__characters:
+            self.__characters = characters
+            self.__table = {0: Cell.deadChar, 1: Cell.liveChar}
+            self.__width = max(sum(2 if unicodedata.east_asian_width(letter) in 'WF' else 1
+                                   for letter in character)
+                               for character in characters)
+            self.reset()
+        return self.__table, self.__width
+
+    def frame(self, cells, footer=''):
+        """
+        Return the text that changes the screen from the last frame to this
+        one.
+        :param cells: the board as a (rows, columns) array of 0s and 1s.
+        :param footer: text to show under the board, like the status line.
+        :return: string of characters and ANSI escape codes.
+        """
+        table, width = self.get_table()
+        cells = numpy.asarray(cells, dtype=numpy.uint8)
+        rows = cells.shape[0]
+        parts = []
+        if self.__previous is None or self.__previous.shape != cells.shape:
+            #
+            # Home the cursor, clear the screen and draw every row.
+            #
+            parts.append('\x1b[H\x1b[2J')
+            board = numpy.full((rows, cells.shape[1] + 1), ord('\n'), dtype=numpy.uint8)
+            board[:, :-1] = cells
+            parts.append(board.tobytes().decode('latin-1').translate(table))
+            self.__previous = cells.copy()
+        else:
+            changedRows, changedColumns = numpy.nonzero(cells != self.__previous)
+            if changedRows.size:
+                #
+                # Split the changes into runs: a new run starts on a new row
+                # or after a gap of unchanged cells.
+                #
+                starts = numpy.flatnonzero((numpy.diff(changedRows) != 0) |
+                                           (numpy.diff(changedColumns) > Renderer.gap)) + 1
+                starts = numpy.concatenate(([0], starts))
+                ends = numpy.concatenate((starts[1:], [changedRows.size])) - 1
+                text = cells.tobytes().decode('latin-1')
+                columns = cells.shape[1]
+                for row, first, last in zip(changedRows[starts].tolist(),
+                                            changedColumns[starts].tolist(),
+                                            changedColumns[ends].tolist()):
+                    parts.append(f'\x1b[{row + 1};{first * width + 1}H')
+                    parts.append(text[row * columns + first:row * columns + last + 1].translate(table))
+            numpy.copyto(self.__previous, cells)
+        #
+        # The footer goes under the board, after clearing what was there.
+        #
+        parts.append(f'\x1b[{rows + 1};1H\x1b[J')
+        parts.append(footer)
+        return ''.join(parts)
+
+    def draw(self, cells, footer=''):
+        """Write the next frame to the terminal in one go."""
+        self.__stream.write(self.frame(cells, footer))
+        self.__stream.flush()
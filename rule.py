@@ -0,0 +1,287 @@
+import numpy
+import re
+
+
+class Rule(object):
+    """
+    A rule for which cells are born and which survive, given as a B/S string
+    like 'B3/S23' (Life) or 'B36/S23' (HighLife), the older S/B form '23/3',
+    or one of the names in Rule.names. A count can be followed by Hensel
+    letters to make an isotropic non-totalistic rule: 'B2a' is only born
+    with two neighbors that touch at a corner and an edge, 'S2-i' survives
+    with two neighbors unless they are on opposite edges.
+
+    Every rule is compiled once into table, 512 entries for every 3x3
+    block of cells: the block is numbered by adding up the weights of its
+    living cells,
+
+        256 128  64
+         32  16   8
+          4   2   1
+
+    and table[number] is whether the middle cell is alive next generation.
+    Totalistic rules (no letters) also have totals, 18 entries for
+    2 * neighbors + the cell itself, which is what engines that count
+    neighbors use.
+    """
+
+    names = {'life': 'B3/S23',
+             'highlife': 'B36/S23',
+             'day & night': 'B3678/S34678',
+             'seeds': 'B2/S',
+             'life without death': 'B3/S012345678',
+             'replicator': 'B1357/S1357',
+             '2x2': 'B36/S125',
+             'morley': 'B368/S245',
+             'diamoeba': 'B35678/S5678',
+             'tlife': 'B3/S2-i34q'}
+
+    #
+    # The Hensel letters for each number of neighbors, in their usual order.
+    #
+    letters = ['', 'ce', 'cekain', 'cekainyqjr', 'cekainyqjrtwz', 'cekainyqjr', 'cekain', 'ce', '']
+
+    #
+    # The neighbors go round the cell N, NE, E, SE, S, SW, W, NW. These are
+    # one arrangement of each letter for 1 to 4 neighbors; 5 to 7 are the
+    # arrangements of 3 to 1 with living and dead swapped.
+    #
+    ring = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+
+    arrangements = {'1c': 'NE', '1e': 'N',
+                    '2c': 'NE SE', '2e': 'N E', '2k': 'N SE', '2a': 'N NE', '2i': 'N S', '2n': 'NE SW',
+                    '3c': 'NE SE SW', '3e': 'N E S', '3k': 'N E SW', '3a': 'N NE E', '3i': 'N NE NW',
+                    '3n': 'N NE SE', '3y': 'N SE SW', '3q': 'N NE SW', '3j': 'N NE W', '3r': 'N NE S',
+                    '4c': 'NE SE SW NW', '4e': 'N E S W', '4k': 'N NE SE W', '4a': 'N NE E SE',
+                    '4i': 'N NE SE S', '4n': 'N NE SE NW', '4y': 'N NE SE SW', '4q': 'N NE E SW',
+                    '4j': 'N NE S W', '4r': 'N NE E S', '4t': 'N NE S NW', '4w': 'N NE SW W',
+                    '4z': 'N NE S SW'}
+
+    directions = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+    weights = numpy.array([[256, 128, 64],
+                           [32, 16, 8],
+                           [4, 2, 1]], dtype=numpy.uint16)
+
+    #
+    # How far the neighborhood reaches; only RangeRule reaches further.
+    #
+    range = 1
+
+    lettersByRing = {}
+
+    cache = {}
+
+    rulePattern = re.compile(r'^b([0-8a-z\-]*)/?s([0-8a-z\-]*)$|^s([0-8a-z\-]*)/?b([0-8a-z\-]*)$')
+
+    oldPattern = re.compile(r'^([0-8]*)/([0-8]*)$')
+
+    @classmethod
+    def get(cls, rule):
+        """
+        Return the Rule for a string (or a Rule), compiling it only the
+        first time. Larger than Life rules like 'R5,C0,M1,S34..58,B34..45,NM'
+        and the names in RangeRule.names come back as a RangeRule.
+        :param rule: a Rule or RangeRule, a B/S string or a name in
+                     Rule.names or RangeRule.names.
+        :return: a Rule or RangeRule object.
+        """
+        if isinstance(rule, (Rule, RangeRule)):
+            return rule
+        key = rule.strip().lower()
+        if key not in cls.cache:
+            text = RangeRule.names.get(key, key).lower().replace(' ', '')
+            cls.cache[key] = RangeRule(text) if RangeRule.rulePattern.match(text) else Rule(rule)
+        return cls.cache[key]
+
+    @classmethod
+    def letter_of(cls, ring):
+        """
+        Return the Hensel letter of an arrangement of neighbors.
+        :param ring: tuple of 8 0s and 1s in the order of Rule.ring.
+        :return: a letter, or '' for 0 and 8 neighbors.
+        """
+        if not cls.lettersByRing:
+            for name, arrangement in cls.arrangements.items():
+                living = [int(direction in arrangement.split()) for direction in cls.directions]
+                for variant in cls.symmetric(living):
+                    cls.lettersByRing[variant] = name[1]
+                    if name[0] != '4':
+                        cls.lettersByRing[tuple(1 - bit for bit in variant)] = name[1]
+        return cls.lettersByRing.get(tuple(ring), '')
+
+    @classmethod
+    def symmetric(cls, ring):
+        """Return the 8 turns and mirror images of an arrangement."""
+        variants = []
+        for mirrored in (list(ring), [ring[(8 - number) % 8] for number in range(8)]):
+            for turn in range(0, 8, 2):
+                variants.append(tuple(mirrored[(number - turn) % 8] for number in range(8)))
+        return variants
+
+    def __init__(self, rule='B3/S23'):
+        """
+        :param rule: a B/S string or a name in Rule.names.
+        """
+        text = Rule.names.get(rule.strip().lower(), rule).strip().lower()
+        found = Rule.rulePattern.match(text)
+        if found:
+            born, survive = (found.group(1), found.group(2)) if found.group(1) is not None else \
+                (found.group(4), found.group(3))
+        else:
+            found = Rule.oldPattern.match(text)
+            if not found:
+                raise ValueError(f'{rule} is not a rule like B3/S23.')
+            survive, born = found.groups()
+        self.born = self.parse(born, rule)
+        self.survive = self.parse(survive, rule)
+        self.totalistic = all(letters == set(Rule.letters[count])
+                              for part in (self.born, self.survive) for count, letters in part.items())
+        self.table = numpy.zeros(512, dtype=numpy.uint8)
+        for number in range(512):
+            block = [(number >> (8 - place)) & 1 for place in range(9)]
+            alive = block[4]
+            ring = tuple(block[(row + 1) * 3 + column + 1] for row, column in Rule.ring)
+            count = sum(ring)
+            part = self.survive if alive else self.born
+            if count in part and (Rule.letter_of(ring) in part[count] or not Rule.letters[count]):
+                self.table[number] = 1
+        self.totals = None
+        if self.totalistic:
+            self.totals = numpy.zeros(18, dtype=numpy.uint8)
+            for count in range(9):
+                self.totals[2 * count] = count in self.born
+                self.totals[2 * count + 1] = count in self.survive
+        self.text = self.format()
+
+    def parse(self, part, rule):
+        """
+        Turn one half of a rule, like '2-a3', into a dictionary of each
+        count and the set of its letters that are in the rule.
+        """
+        counts = {}
+        for count, minus, letters in re.findall(r'([0-8])(-?)([a-z]*)', part):
+            count = int(count)
+            every = set(Rule.letters[count])
+            if not set(letters) <= every:
+                raise ValueError(f'{rule}: {count} neighbors can only have the letters {"".join(every)}.')
+            if minus:
+                counts[count] = every - set(letters)
+            elif letters:
+                counts[count] = set(letters)
+            else:
+                counts[count] = every
+        if re.sub(r'[0-8]-?[a-z]*', '', part):
+            raise ValueError(f'{rule} is not a rule like B3/S23.')
+        return counts
+
+    def format(self):
+        """Return the rule as a B/S string. Each count's letters are
+        written as they are or as '-' and the letters left out, whichever
+        is shorter, the way Golly writes them."""
+        halves = []
+        for letter, part in (('B', self.born), ('S', self.survive)):
+            text = letter
+            for count in sorted(part):
+                every = Rule.letters[count]
+                text += str(count)
+                if part[count] != set(every):
+                    included = ''.join(sorted(part[count], key=every.index))
+                    excluded = '-' + ''.join(sorted(set(every) - part[count], key=every.index))
+                    text += excluded if len(excluded) < len(included) else included
+            halves.append(text)
+        return '/'.join(halves)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f'Rule({self.text!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self.text == other.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def is_life(self):
+        return self.text == 'B3/S23'
+
+    def births_from_nothing(self):
+        """Return whether dead cells with no living neighbors are born (B0),
+        which the engines for the unbounded plane can't do."""
+        return bool(self.table[0])
+
+
+class RangeRule(object):
+    """
+    A Larger than Life rule, where the neighborhood is every cell within
+    range rows and columns of the cell (a (2 * range + 1) square) instead
+    of just the 8 next to it. It is written the way Golly writes it,
+    'R5,C0,M1,S34..58,B34..45,NM' for Bosco's rule: the range, the number
+    of states (0 or 2, only two states are supported), whether the cell
+    itself is counted (M1) or not (M0), the counts a living cell survives
+    with, the counts a dead cell is born with and the neighborhood (only
+    NM, the square, is supported).
+
+    Like a totalistic Rule, it is compiled into totals, indexed by
+    2 * neighbors + the cell, where neighbors leaves out the cell itself.
+    """
+
+    names = {'bosco': 'R5,C0,M1,S34..58,B34..45,NM',
+             'majority': 'R4,C0,M1,S41..81,B41..81,NM',
+             'waffle': 'R7,C0,M1,S100..200,B75..170,NM',
+             'globe': 'R8,C0,M0,S163..223,B74..252,NM',
+             'bugsmovie': 'R10,C0,M1,S123..212,B123..170,NM'}
+
+    rulePattern = re.compile(r'^r(\d+),c(\d+),m([01]),s(\d+)\.\.(\d+),b(\d+)\.\.(\d+)(?:,n([a-z]))?$')
+
+    totalistic = True
+
+    def __init__(self, rule):
+        """
+        :param rule: a rule like 'R5,C0,M1,S34..58,B34..45,NM'.
+        """
+        found = RangeRule.rulePattern.match(rule.strip().lower().replace(' ', ''))
+        if not found:
+            raise ValueError(f'{rule} is not a rule like R5,C0,M1,S34..58,B34..45,NM.')
+        reach, states, middle, surviveLow, surviveHigh, bornLow, bornHigh, neighborhood = found.groups()
+        if int(reach) < 1:
+            raise ValueError(f'{rule}: the range must be at least 1.')
+        if int(states) not in (0, 2):
+            raise ValueError(f'{rule}: only rules with two states (C0 or C2) are supported.')
+        if neighborhood not in (None, 'm'):
+            raise ValueError(f'{rule}: only the square neighborhood (NM) is supported.')
+        self.range = int(reach)
+        self.middle = int(middle)
+        self.survive = (int(surviveLow), int(surviveHigh))
+        self.born = (int(bornLow), int(bornHigh))
+        #
+        # With M1 the counts include the cell itself, which only makes a
+        # difference to living cells.
+        #
+        cells = (2 * self.range + 1) ** 2
+        neighbors = numpy.arange(cells)
+        self.totals = numpy.zeros(2 * cells, dtype=numpy.uint8)
+        self.totals[0::2] = (self.born[0] <= neighbors) & (neighbors <= self.born[1])
+        self.totals[1::2] = (self.survive[0] <= neighbors + self.middle) & (neighbors + self.middle <= self.survive[1])
+        self.text = (f'R{self.range},C0,M{self.middle},S{self.survive[0]}..{self.survive[1]},'
+                     f'B{self.born[0]}..{self.born[1]},NM')
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f'RangeRule({self.text!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, RangeRule) and self.text == other.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def is_life(self):
+        return False
+
+    def births_from_nothing(self):
+        return bool(self.totals[0])
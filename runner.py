@@ -0,0 +1,256 @@
+import asyncio
+import threading
+import time
+
+
+class Rate(object):
+    """Counts how many times something happens a second, over the last
+    second or so."""
+
+    def __init__(self):
+        self.__count = 0
+        self.__start = time.perf_counter()
+        self.__rate = 0.0
+
+    def tick(self):
+        self.__count += 1
+        elapsed = time.perf_counter() - self.__start
+        if elapsed >= 1:
+            self.__rate = self.__count / elapsed
+            self.__count = 0
+            self.__start += elapsed
+
+    def get(self):
+        return self.__rate
+
+
+class Runner(object):
+    """
+    Runs a world in a thread of its own while the caller draws it. The
+    stepping thread does one generation every delay seconds, taking the
+    time the step took off the sleep, and goes as fast as it can when the
+    delay is 0. Whenever the drawing side is ready for another frame the
+    stepping thread copies the board and its description into it, so the
+    drawing side never waits for a step and generations it had no time to
+    draw are simply skipped. Drawing happens at most framesPerSecond times
+    a second, again taking the time a frame took off the sleep. The run can
+    be paused, stepped a generation at a time while paused, sped up or
+    slowed down and stopped at any time, from another thread or from an
+    asyncio task while play draws it.
+    """
+
+    framesPerSecond = 30
+
+    def __init__(self, world, generations, delay, describe=None):
+        """
+        :param world: the World to run.
+        :param generations: how many generations to run at most. The run
+                            also stops when the world becomes stable.
+        :param delay: seconds between generations.
+        :param describe: a function that returns the text shown under the
+                         board, called in the stepping thread with each
+                         frame.
+        """
+        self.__world = world
+        self.__generations = generations
+        self.__delay = delay
+        self.__describe = describe if describe is not None else str
+        self.__condition = threading.Condition()
+        self.__frame = None
+        self.__wanted = True
+        self.__finished = False
+        self.__stopping = False
+        self.__paused = False
+        self.__steps = 0
+        self.__notify = None
+        self.__error = None
+        self.__generationRate = Rate()
+        self.__frameRate = Rate()
+        self.__thread = None
+
+    def set_delay(self, delay):
+        self.__delay = delay
+
+    def set_notify(self, notify):
+        """Give a function to call from the stepping thread whenever there
+        is a new frame or the run is over."""
+        self.__notify = notify
+
+    def pause(self):
+        with self.__condition:
+            self.__paused = True
+            self.__condition.notify_all()
+
+    def resume(self):
+        with self.__condition:
+            self.__paused = False
+            self.__steps = 0
+            self.__condition.notify_all()
+
+    def is_paused(self):
+        return self.__paused
+
+    def step(self):
+        """Do one more generation while paused."""
+        with self.__condition:
+            self.__steps += 1
+            self.__condition.notify_all()
+
+    def get_rates(self):
+        """Returns (generations a second, frames a second)."""
+        return self.__generationRate.get(), self.__frameRate.get()
+
+    def is_running(self):
+        return not self.__finished
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.step_loop, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Ask the stepping thread to stop after the generation it is on."""
+        with self.__condition:
+            self.__stopping = True
+            self.__condition.notify_all()
+
+    def join(self):
+        """Wait for the stepping thread to finish."""
+        self.__thread.join()
+        if self.__error is not None:
+            raise self.__error
+
+    def publish(self):
+        """Hand the drawing side a copy of the board and its description."""
+        cells = self.__world.get_cells().copy()
+        text = self.__describe()
+        with self.__condition:
+            self.__frame = (cells, text)
+            self.__wanted = False
+            self.__condition.notify_all()
+        if self.__notify is not None:
+            self.__notify()
+
+    def wait_turn(self):
+        """
+        Wait in the stepping thread until the next generation may be done.
+        :return: False if the run should stop.
+        """
+        with self.__condition:
+            if self.__stopping:
+                return False
+            if self.__steps:
+                self.__steps -= 1
+                return True
+            #
+            # Let the drawing side show that the run is paused.
+            #
+            self.__wanted = True
+        self.publish()
+        with self.__condition:
+            self.__condition.wait_for(lambda: not self.__paused or self.__steps or self.__stopping)
+            if self.__paused and self.__steps:
+                self.__steps -= 1
+            return not self.__stopping
+
+    def step_loop(self):
+        """The stepping thread."""
+        try:
+            deadline = time.perf_counter()
+            for generation in range(self.__generations):
+                if self.__paused:
+                    if not self.wait_turn():
+                        break
+                    deadline = time.perf_counter()
+                elif self.__stopping:
+                    break
+                self.__world.next_generation()
+                self.__generationRate.tick()
+                if self.__world.is_stable():
+                    break
+                if self.__wanted:
+                    self.publish()
+                deadline += self.__delay
+                wait = deadline - time.perf_counter()
+                if wait > 0:
+                    #
+                    # Sleep, but wake up for a pause or a stop.
+                    #
+                    with self.__condition:
+                        self.__condition.wait_for(lambda: self.__paused or self.__stopping, wait)
+                else:
+                    #
+                    # Running late; don't try to catch up with a burst.
+                    #
+                    deadline = time.perf_counter()
+            #
+            # The last generation is always shown.
+            #
+            self.publish()
+        except BaseException as error:
+            self.__error = error
+        finally:
+            with self.__condition:
+                self.__finished = True
+                self.__condition.notify_all()
+            if self.__notify is not None:
+                self.__notify()
+
+    def get_frame(self, timeout=None):
+        """
+        Wait for the next frame.
+        :param timeout: seconds to wait at most.
+        :return: (cells, text), or None if there wasn't a new frame in time
+                 or the run is over.
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__frame is not None or self.__finished, timeout)
+            frame = self.__frame
+            self.__frame = None
+            self.__wanted = True
+        return frame
+
+    def run(self, draw):
+        """
+        Run the world to the end, drawing it as it goes.
+        :param draw: a function (cells, text) that shows a frame.
+        :return: None
+        """
+        self.start()
+        period = 1 / Runner.framesPerSecond
+        while True:
+            started = time.perf_counter()
+            frame = self.get_frame()
+            if frame is None:
+                break
+            draw(*frame)
+            self.__frameRate.tick()
+            wait = period - (time.perf_counter() - started)
+            if wait > 0 and self.is_running():
+                time.sleep(wait)
+        self.join()
+
+    async def play(self, draw):
+        """
+        Like run, but for asyncio: waiting for frames doesn't block the
+        event loop, so other tasks (reading keys, say) keep going.
+        :param draw: a function (cells, text) that shows a frame.
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        self.set_notify(lambda: loop.call_soon_threadsafe(ready.set))
+        self.start()
+        period = 1 / Runner.framesPerSecond
+        while self.is_running():
+            started = loop.time()
+            await ready.wait()
+            ready.clear()
+            frame = self.get_frame(0)
+            if frame is not None:
+                draw(*frame)
+                self.__frameRate.tick()
+                await asyncio.sleep(period - (loop.time() - started))
+        frame = self.get_frame(0)
+        if frame is not None:
+            draw(*frame)
+        await loop.run_in_executor(None, self.join)
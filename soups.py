@@ -0,0 +1,140 @@
+"""
+Runs random soups without the menu or the display, for experiments. Each
+soup is a random world that runs until it becomes stable (or for at most
+a number of generations), and one line of JSON is written about it as soon
+as it is done. Soups are spread over a pool of worker processes, and
+running the same command again skips the soups that are already in the
+output file, so an interrupted run picks up where it left off:
+
+    python soups.py 1000 --size 64x64 --fillrate 25 --geometry torus \
+        --generations 10000 --output soups.jsonl
+"""
+from world import World
+from geometry import Geometry
+from census import Census
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+
+#
+# Each worker process keeps its own census cache, so after the first few
+# soups nearly every object is a cache hit.
+#
+workerCensus = None
+
+#
+# The engines a soup can run on: tiled starts processes of its own, which
+# the pool's worker processes aren't allowed to, and hashlife only runs on
+# the unbounded plane.
+#
+engines = ('numpy', 'bitboard', 'sparse', 'topology', 'threaded', 'ltl')
+
+
+def run_soup(task):
+    """
+    Run one soup until it is stable.
+    :param task: dictionary with soup, seed, rows, columns, fillrate,
+                 geometry, engine, generations and census.
+    :return: the task with the results added: lifetime (the generation
+             the soup became stable, or None if it didn't within
+             generations), period, population and seconds, and with
+             census the objects left and how many of each.
+    """
+    global workerCensus
+    started = time.perf_counter()
+    world = World(task['rows'], task['columns'], task['engine'])
+    world.set_geometry(task['geometry'])
+    world.set_history(False)
+    world.randomize(task['fillrate'], task['seed'])
+    for generation in range(task['generations']):
+        world.next_generation()
+        if world.is_stable():
+            break
+    cycle = world.get_cycle()
+    result = dict(task)
+    result['lifetime'] = cycle[0] if cycle else None
+    result['period'] = cycle[1] if cycle else None
+    result['population'] = world.get_living_cell_count()
+    if task.get('census'):
+        if workerCensus is None:
+            workerCensus = Census()
+        result['objects'] = workerCensus.count(world)
+    result['seconds'] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def finished_soups(filename):
+    """Return the numbers of the soups already in an output file. A line
+    cut short by an interruption is ignored, so that soup is done again."""
+    finished = set()
+    if os.path.exists(filename):
+        with open(filename, 'r') as resultFile:
+            for line in resultFile:
+                try:
+                    finished.add(json.loads(line)['soup'])
+                except (ValueError, KeyError):
+                    pass
+    return finished
+
+
+def run_soups(count, rows, columns, fillrate, geometry='torus', generations=10000,
+              filename='soups.jsonl', seed=0, engine='numpy', workers=None, census=False):
+    """
+    Run soups 0 to count - 1 that aren't in the output file yet and add a
+    line to it for each one as it finishes. Soup n always uses the seed
+    seed + n, so any soup can be run again exactly.
+    :return: how many soups were run.
+    """
+    if engine not in engines:
+        raise ValueError(f'Soups can\'t run on the {engine} engine, only on {", ".join(engines)}.')
+    finished = finished_soups(filename)
+    tasks = [{'soup': soup, 'seed': seed + soup, 'rows': rows, 'columns': columns,
+              'fillrate': fillrate, 'geometry': geometry, 'engine': engine,
+              'generations': generations, 'census': census}
+             for soup in range(count) if soup not in finished]
+    if not tasks:
+        return 0
+    if os.path.exists(filename) and os.path.getsize(filename):
+        with open(filename, 'rb') as resultFile:
+            resultFile.seek(-1, os.SEEK_END)
+            complete = resultFile.read(1) == b'\n'
+    else:
+        complete = True
+    with open(filename, 'a') as resultFile:
+        if not complete:
+            #
+            # Finish off a line an interruption cut short.
+            #
+            resultFile.write('\n')
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(run_soup, tasks, chunksize=4):
+                resultFile.write(json.dumps(result) + '\n')
+                resultFile.flush()
+    return len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run random soups until they are stable.')
+    parser.add_argument('count', type=int, help='how many soups')
+    parser.add_argument('--size', default='64x64', help='rows x columns')
+    parser.add_argument('--fillrate', type=float, default=25, help='percent of cells alive')
+    parser.add_argument('--geometry', default='torus', choices=Geometry.bounded)
+    parser.add_argument('--generations', type=int, default=10000, help='most generations per soup')
+    parser.add_argument('--output', default='soups.jsonl')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first soup')
+    parser.add_argument('--engine', default='numpy', choices=engines)
+    parser.add_argument('--workers', type=int, default=None, help='processes, one per CPU by default')
+    parser.add_argument('--census', action='store_true', help='count the objects left in each soup')
+    arguments = parser.parse_args()
+    rows, columns = (int(number) for number in arguments.size.split('x'))
+    count = run_soups(arguments.count, rows, columns, arguments.fillrate, arguments.geometry,
+                      arguments.generations, arguments.output, arguments.seed,
+                      arguments.engine, arguments.workers, arguments.census)
+    print(f'Ran {count} soups into {arguments.output}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+from collections import Counter
+from geometry import Geometry
+from rule import Rule
+import numpy
+
+
+class SparseEngine(object):
+    """
+    Steps a world by keeping only the positions of the living cells in a
+    set. Every generation only the living cells and their neighbors are
+    looked at, so the time it takes depends on the population instead of
+    the size of the world. Besides every bounded geometry it can run on
+    the unbounded plane ('plane'), where the rows and columns of the world
+    are just the window that gets displayed and patterns can leave it and
+    come back. It runs totalistic rules, except ones where cells are born
+    with no living neighbors (B0), since it never looks at those cells.
+    """
+
+    name = 'sparse'
+
+    geometries = Geometry.names
+
+    offsets = [(-1, -1), (-1, 0), (-1, 1),
+               (0, -1),           (0, 1),
+               (1, -1),  (1, 0),  (1, 1)]
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__geometry = Geometry.get(geometry)
+        self.__living = set()
+        self.set_rule(Rule.get('B3/S23'))
+
+    def set_rule(self, rule):
+        """Change the rule to a totalistic Rule without B0."""
+        if not rule.totalistic:
+            raise ValueError(f'The sparse engine can only run totalistic rules, not {rule}.')
+        if rule.births_from_nothing():
+            raise ValueError(f'The sparse engine can\'t run {rule}, where cells are born with no neighbors.')
+        self.__rule = rule
+        self.__born = frozenset(rule.born)
+        self.__survive = frozenset(rule.survive)
+
+    def get_cells(self):
+        """Returns the (rows, columns) window of the board as a uint8 array."""
+        cells = numpy.zeros((self.__rows, self.__columns), dtype=numpy.uint8)
+        inside = [(row, column) for row, column in self.__living
+                  if 0 <= row < self.__rows and 0 <= column < self.__columns]
+        if inside:
+            rows, columns = zip(*inside)
+            cells[list(rows), list(columns)] = 1
+        return cells
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        cells = numpy.asarray(cells).reshape(self.__rows, self.__columns)
+        rows, columns = numpy.nonzero(cells)
+        self.__living = set(zip(rows.tolist(), columns.tolist()))
+
+    def get_living(self):
+        """Returns the set of (row, column) positions of the living cells."""
+        return self.__living
+
+    def set_living(self, living):
+        """Replace the whole board with the given (row, column) positions."""
+        self.__living = set(living)
+
+    def get_cell(self, row, column):
+        return (row, column) in self.__living
+
+    def set_cell(self, row, column, living):
+        if living:
+            self.__living.add((row, column))
+        else:
+            self.__living.discard((row, column))
+
+    def get_positions(self, rows, columns):
+        """Returns the cells at arrays of rows and columns, as uint8."""
+        living = self.__living
+        return numpy.fromiter(((row, column) in living for row, column in zip(rows.tolist(), columns.tolist())),
+                              dtype=numpy.uint8, count=len(rows))
+
+    def set_positions(self, rows, columns, living):
+        """Set the cells at arrays of rows and columns to an array of 0s and 1s."""
+        for row, column, alive in zip(rows.tolist(), columns.tolist(), living.tolist()):
+            if alive:
+                self.__living.add((row, column))
+            else:
+                self.__living.discard((row, column))
+
+    def set_geometry(self, geometry):
+        self.__geometry = Geometry.get(geometry)
+        if geometry != 'plane':
+            #
+            # Cells that wandered off the window don't exist in a bowl or
+            # a torus.
+            #
+            self.__living = {(row, column) for row, column in self.__living
+                             if 0 <= row < self.__rows and 0 <= column < self.__columns}
+
+    def population(self):
+        return len(self.__living)
+
+    def step(self):
+        """Advance the board one generation."""
+        living = self.__living
+        rows = self.__rows
+        columns = self.__columns
+        counts = Counter((row + rowOffset, column + columnOffset)
+                         for row, column in living
+                         for rowOffset, columnOffset in SparseEngine.offsets)
+        if self.__geometry.wrap is not None:
+            #
+            # Move the counts that landed off the edge to where the
+            # geometry says those positions really are.
+            #
+            offEdge = [(row, column) for row, column in counts
+                       if row < 0 or row >= rows or column < 0 or column >= columns]
+            if offEdge:
+                offRows, offColumns = zip(*offEdge)
+                realRows, realColumns, alive = self.__geometry.locate(rows, columns, offRows, offColumns)
+                for position, row, column, isAlive in zip(offEdge, realRows.tolist(),
+                                                          realColumns.tolist(), alive.tolist()):
+                    count = counts.pop(position)
+                    if isAlive:
+                        counts[(row, column)] += count
+        if self.__rule.is_life():
+            self.__living = {position for position, count in counts.items()
+                             if count == 3 or (count == 2 and position in living)}
+            return
+        born = self.__born
+        survive = self.__survive
+        following = {position for position, count in counts.items()
+                     if count in (survive if position in living else born)}
+        if 0 in survive:
+            #
+            # Cells with no neighbors aren't in counts at all.
+            #
+            following.update(position for position in living if position not in counts)
+        self.__living = following
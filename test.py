@@ -1,6 +1,27 @@
 from cell import Cell
 from world import World
+from geometry import Geometry
+from history import History
+from renderer import Renderer
+from runner import Runner
+from keyboard import Keyboard
+from life import Life
+import asyncio
+import soups
+from batch import WorldBatch
+from census import Census
+import patterns
+from lifefile import LifeFile
+from trajectory import Recorder, Trajectory, replay
+from library import Library
+from rule import Rule, RangeRule
+import numpy
+import json
+import tempfile
+import io
 import time
+import os
+import tracemalloc
 
 def test1():
     print('----Cell Tests----')
@@ -37,9 +58,9 @@ def test3():
     w1.set_cell(2,1,True)
     print(w1)
 
-    w1._World__grid[0][0].debug()
-    w1._World__grid[1][0].debug()
-    w1._World__grid[2][2].debug()
+    w1.get_cell(0,0).debug()
+    w1.get_cell(1,0).debug()
+    w1.get_cell(2,2).debug()
 
 def test4():
 
@@ -88,6 +109,1149 @@ def test6():
         print(w1)
         time.sleep(0.5)
 
+def test7():
+    print('----Numpy Engine Tests----')
+    live = Cell.liveChar
+    dead = Cell.deadChar
+    w1 = World(5,5)
+    w1.set_cell(2,1,True)
+    w1.set_cell(2,2,True)
+    w1.set_cell(2,3,True)
+    w1.next_generation()
+    assert w1.__str__() == (dead * 5 + '\n' + (dead * 2 + live + dead * 2 + '\n') * 3 + dead * 5 + '\n')
+    assert w1.get_living_cell_count() == 3
+    assert w1.get_generation() == 1
+    #
+    # A glider on a torus comes back to where it started after it has
+    # travelled all the way around the world (4 generations per cell).
+    #
+    w2 = World(6,6)
+    w2.set_geometry(2)
+    for row, column in [(0,1), (1,2), (2,0), (2,1), (2,2)]:
+        w2.set_cell(row, column, True)
+    start = w2.__str__()
+    for generation in range(24):
+        w2.next_generation()
+        assert w2.get_living_cell_count() == 5
+    assert w2.__str__() == start
+    #
+    # In the bowl the same glider turns into a block in the corner.
+    #
+    w3 = World(6,6)
+    for row, column in [(0,1), (1,2), (2,0), (2,1), (2,2)]:
+        w3.set_cell(row, column, True)
+    for generation in range(24):
+        w3.next_generation()
+    assert w3.get_living_cell_count() == 4
+
+def test8():
+    print('----Bitboard Engine Tests----')
+    for geometry in [1, 2]:
+        w1 = World(30, 100)
+        w1.randomize(35)
+        filename = os.path.join(tempfile.mkdtemp(), 'test_bitboard.life')
+        w1.save(filename)
+        w2 = World.from_file(filename, 'bitboard')
+        assert w2.get_engine() == 'bitboard'
+        assert w2.get_rows() == 30 and w2.get_columns() == 100
+        assert w1.__str__() == w2.__str__()
+        w1.set_geometry(geometry)
+        w2.set_geometry(geometry)
+        for generation in range(50):
+            w1.next_generation()
+            w2.next_generation()
+            assert w1.__str__() == w2.__str__()
+            assert w1.get_living_cell_count() == w2.get_living_cell_count()
+
+def test9():
+    print('----Sparse Engine Tests----')
+    for geometry in [1, 2]:
+        w1 = World(25, 40)
+        w1.set_geometry(geometry)
+        w1.randomize(30)
+        filename = os.path.join(tempfile.mkdtemp(), 'test_sparse.life')
+        w1.save(filename)
+        w2 = World.from_file(filename, 'sparse')
+        w2.set_geometry(geometry)
+        for generation in range(50):
+            w1.next_generation()
+            w2.next_generation()
+            assert w1.__str__() == w2.__str__()
+            assert w1.get_living_cell_count() == w2.get_living_cell_count()
+    #
+    # On the plane a glider flies out of the window and keeps going.
+    #
+    w3 = World(6, 6, 'sparse')
+    w3.set_geometry(3)
+    for row, column in [(0,1), (1,2), (2,0), (2,1), (2,2)]:
+        w3.set_cell(row, column, True)
+    for generation in range(40):
+        w3.next_generation()
+    assert w3.get_living_cell_count() == 5
+    assert w3.__str__().count(Cell.liveChar) == 0
+    try:
+        World(6, 6).set_geometry(3)
+        assert False
+    except ValueError:
+        pass
+
+def test10():
+    print('----HashLife Engine Tests----')
+    w1 = World(20, 30, 'sparse')
+    w1.set_geometry(3)
+    w1.randomize(35)
+    filename = os.path.join(tempfile.mkdtemp(), 'test_hashlife.life')
+    w1.save(filename)
+    w2 = World.from_file(filename, 'sparse')
+    w2.set_geometry(3)
+    w2.set_engine('hashlife')
+    for generations in [1, 2, 5, 16, 100]:
+        for generation in range(generations):
+            w1.next_generation()
+        w2.advance(generations)
+        assert w1.__str__() == w2.__str__()
+        assert w1.get_living_cell_count() == w2.get_living_cell_count()
+    assert w1.get_generation() == w2.get_generation()
+    #
+    # A glider keeps its five cells however far it goes.
+    #
+    w3 = World(10, 10, 'hashlife')
+    w3.set_geometry(3)
+    for row, column in [(0,1), (1,2), (2,0), (2,1), (2,2)]:
+        w3.set_cell(row, column, True)
+    w3.advance(1000000)
+    assert w3.get_living_cell_count() == 5
+    assert w3.__str__().count(Cell.liveChar) == 0
+    w3.set_engine('sparse')
+    assert w3.get_living_cell_count() == 5
+
+def test11():
+    print('----Topology Engine Tests----')
+    for geometry in [1, 2]:
+        w1 = World(25, 40)
+        w1.set_geometry(geometry)
+        w1.randomize(30)
+        filename = os.path.join(tempfile.mkdtemp(), 'test_topology.life')
+        w1.save(filename)
+        w2 = World.from_file(filename, 'topology')
+        w2.set_geometry(geometry)
+        for generation in range(50):
+            w1.next_generation()
+            w2.next_generation()
+            assert w1.__str__() == w2.__str__()
+    #
+    # The topology is only worked out once for each size and geometry.
+    #
+    w3 = World(25, 40, 'topology')
+    w3.set_geometry(2)
+    assert w3._World__engine.get_topology() is w2._World__engine.get_topology()
+    assert len(w1.get_cell(0, 0).get_neighbors()) == 8
+    w1.set_geometry(1)
+    assert len(w1.get_cell(0, 0).get_neighbors()) == 3
+    assert len(w1.get_cell(0, 5).get_neighbors()) == 5
+
+def test12():
+    print('----Geometry Tests----')
+    for geometry in Geometry.bounded:
+        w1 = World(12, 70)
+        w1.randomize(35)
+        filename = os.path.join(tempfile.mkdtemp(), 'test_geometry.life')
+        w1.save(filename)
+        worlds = [w1] + [World.from_file(filename, engine)
+                         for engine in ['bitboard', 'sparse', 'topology']]
+        for w2 in worlds:
+            w2.set_geometry(geometry)
+        for generation in range(30):
+            for w2 in worlds:
+                w2.next_generation()
+            for w2 in worlds[1:]:
+                assert w2.__str__() == w1.__str__()
+    #
+    # Each map is only worked out once for each size.
+    #
+    klein = Geometry.get('klein')
+    assert klein.halo(12, 70) is klein.halo(12, 70)
+    #
+    # On a Klein bottle going off the bottom brings you back at the top,
+    # flipped left to right.
+    #
+    rows, columns, living = klein.locate(12, 70, [12], [3])
+    assert (rows[0], columns[0], living[0]) == (0, 66, True)
+    rows, columns, living = Geometry.get('mobius').locate(12, 70, [-1], [3])
+    assert not living[0]
+
+def test13():
+    print('----Footprint Tests----')
+    c1 = Cell(0, 0)
+    assert not hasattr(c1, '__dict__')
+    w1 = World(3, 3)
+    c2 = w1.get_cell(1, 1)
+    c2.set_living(True)
+    assert w1.is_living(1, 1)
+    assert w1.get_cell(1, 1).get_living()
+    assert w1.get_cell(0, 0).living_neighbors() == 1
+    #
+    # See the README for the bytes per cell of each engine.
+    #
+    for engine, limit in [('numpy', 4.5), ('bitboard', 0.5)]:
+        World(10, 10, engine).randomize(25)
+        tracemalloc.start()
+        w2 = World(1000, 1000, engine)
+        w2.randomize(25)
+        w2._World__engine.step()
+        footprint = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'{engine}: {footprint / 1000000:0.2f} bytes per cell')
+        assert footprint < limit * 1000000
+
+def test14():
+    print('----Tiled Engine Tests----')
+    for geometry in ['bowl', 'torus', 'klein']:
+        w1 = World(40, 70)
+        w1.randomize(30)
+        filename = os.path.join(tempfile.mkdtemp(), 'test_tiled.life')
+        w1.save(filename)
+        w2 = World.from_file(filename, 'tiled')
+        w2.set_workers(3)
+        w1.set_geometry(geometry)
+        w2.set_geometry(geometry)
+        for generation in range(30):
+            w1.next_generation()
+            w2.next_generation()
+            assert w1.__str__() == w2.__str__()
+        w2.set_engine('numpy')
+        assert w1.__str__() == w2.__str__()
+
+def test15():
+    print('----Threaded Engine Tests----')
+    w1 = World(40, 70)
+    w1.randomize(30)
+    filename = os.path.join(tempfile.mkdtemp(), 'test_threaded.life')
+    w1.save(filename)
+    w2 = World.from_file(filename, 'threaded')
+    assert w2._World__engine.get_workers() == 1
+    w2.set_workers(4)
+    for geometry in ['bowl', 'torus', 'mobius']:
+        w1.set_geometry(geometry)
+        w2.set_geometry(geometry)
+        for generation in range(30):
+            w1.next_generation()
+            w2.next_generation()
+            assert w1.__str__() == w2.__str__()
+    w2.set_engine('numpy')
+    assert w1.__str__() == w2.__str__()
+
+def test16():
+    print('----Cycle Tests----')
+    #
+    # A blinker has period 2 and a block period 1.
+    #
+    w1 = World(6, 6)
+    for column in [1, 2, 3]:
+        w1.set_cell(2, column, True)
+    while not w1.is_stable():
+        w1.next_generation()
+    assert w1.get_cycle() == (0, 2)
+    w1.set_cell(5, 5, True)
+    assert not w1.is_stable()
+    w2 = World(4, 4)
+    for row, column in [(1, 1), (1, 2), (2, 1), (2, 2)]:
+        w2.set_cell(row, column, True)
+    w2.next_generation()
+    assert w2.get_cycle() == (0, 1)
+    #
+    # A glider on an 8x8 torus comes back after 32 generations, which the
+    # old timeline (the last three generations) could never notice.
+    #
+    w3 = World(8, 8)
+    w3.set_geometry('torus')
+    for row, column in [(0,1), (1,2), (2,0), (2,1), (2,2)]:
+        w3.set_cell(row, column, True)
+    for generation in range(100):
+        w3.next_generation()
+        if w3.is_stable():
+            break
+    assert w3.get_cycle() == (0, 32)
+    #
+    # The pentadecathlon takes 3 generations to settle down into period 15.
+    #
+    w4 = World(20, 20, 'sparse')
+    for column in range(5, 15):
+        w4.set_cell(10, column, True)
+    while not w4.is_stable():
+        w4.next_generation()
+    assert w4.get_cycle()[1] == 15
+
+def test17():
+    print('----History Tests----')
+    w1 = World(20, 30)
+    w1.set_geometry('torus')
+    w1.randomize(30)
+    boards = [w1.__str__()]
+    for generation in range(200):
+        w1.next_generation()
+        boards.append(w1.__str__())
+    assert w1.get_history_range() == (0, 200)
+    for generation in [0, 1, 63, 64, 65, 150, 200]:
+        w1.rewind(generation)
+        assert w1.__str__() == boards[generation]
+        assert w1.get_generation() == generation
+    #
+    # Stepping on from a rewind gives the same future again.
+    #
+    w1.rewind(100)
+    w1.next_generation()
+    assert w1.__str__() == boards[101]
+    assert w1.get_history_range() == (0, 101)
+    #
+    # With a small budget only the most recent segments are kept.
+    #
+    w1._World__history = History(keyframeInterval=16, maxBytes=2000)
+    w1.edited()
+    for generation in range(2000):
+        w1.next_generation()
+    first, last = w1.get_history_range()
+    assert last == w1.get_generation()
+    assert first > 1000
+    assert w1._World__history.get_bytes() <= 2000
+
+def test18():
+    print('----Renderer Tests----')
+    Cell.set_display('basic')
+    w1 = World(10, 20)
+    w1.set_cell(2, 3, True)
+    screen = io.StringIO()
+    r1 = Renderer(screen)
+    r1.draw(w1.get_cells(), 'status')
+    first = screen.getvalue()
+    assert first.startswith('\x1b[H\x1b[2J')
+    assert w1.__str__() in first
+    #
+    # The next frame only moves to the cell that changed.
+    #
+    w1.set_cell(5, 7, True)
+    screen.seek(0)
+    screen.truncate()
+    r1.draw(w1.get_cells(), 'status')
+    second = screen.getvalue()
+    assert second == '\x1b[6;8HO\x1b[11;1H\x1b[Jstatus'
+    #
+    # Nearby changes on a row are written as one run.
+    #
+    w1.set_cell(5, 7, False)
+    w1.set_cell(5, 10, True)
+    assert r1.frame(w1.get_cells()) == '\x1b[6;8H...O\x1b[11;1H\x1b[J'
+    #
+    # Wide characters take up two columns.
+    #
+    Cell.set_display('squares')
+    assert r1.frame(w1.get_cells()).startswith('\x1b[H\x1b[2J')
+    w1.set_cell(0, 4, True)
+    assert r1.frame(w1.get_cells()).startswith('\x1b[1;9H' + Cell.liveChar)
+    Cell.set_display('basic')
+
+def test19():
+    print('----Runner Tests----')
+    w1 = World(200, 200)
+    w1.set_geometry('torus')
+    w1.randomize(30)
+    frames = []
+    r1 = Runner(w1, 300, 0, w1.get_generation)
+    r1.run(lambda cells, generation: frames.append((cells.__str__(), generation)))
+    #
+    # Frames it had no time to draw are skipped, and the last one is
+    # always drawn.
+    #
+    assert 0 < len(frames) < 300
+    assert frames[-1][1] == w1.get_generation()
+    assert [generation for cells, generation in frames] == sorted(set(generation for cells, generation in frames))
+    generationRate, frameRate = r1.get_rates()
+    assert frameRate <= Runner.framesPerSecond * 1.5
+    #
+    # The delay sets the pace of the generations, not the drawing.
+    #
+    # Drawing that is slower than the delay doesn't hold the generations
+    # back, it just draws fewer of them; and the generations never come
+    # faster than the delay.
+    #
+    w1 = World(10, 10)
+    w1.set_geometry('torus')
+    for row, column in [(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)]:
+        w1.set_cell(row, column, True)
+    frames = []
+    start = time.perf_counter()
+    r1 = Runner(w1, 20, 0.02)
+    r1.run(lambda cells, text: frames.append(time.sleep(0.1)))
+    assert w1.get_generation() == 20
+    assert len(frames) < 20
+    assert time.perf_counter() - start > 0.3
+
+def test20():
+    print('----Play Tests----')
+    w1 = World(20, 20)
+    w1.set_geometry('torus')
+    for row, column in [(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)]:
+        w1.set_cell(row, column, True)
+    l1 = Life()
+    l1._Life__renderer = Renderer(io.StringIO())
+    r1 = Runner(w1, 1000, 30)
+    keys = asyncio.Queue()
+
+    async def press():
+        #
+        # Pause straight away, step three generations, then stop.
+        #
+        keys.put_nowait(' ')
+        await asyncio.sleep(0.2)
+        for step in range(3):
+            keys.put_nowait('n')
+        await asyncio.sleep(0.2)
+        assert r1.is_paused()
+        assert w1.get_generation() == 4
+        keys.put_nowait('+')
+        keys.put_nowait('q')
+
+    async def play():
+        start = time.perf_counter()
+        await asyncio.gather(l1.play(r1, keys), press())
+        #
+        # Stopping doesn't wait for the 30 second delay to run out.
+        #
+        assert time.perf_counter() - start < 10
+
+    asyncio.run(play())
+    assert w1.get_generation() == 4
+    assert l1._Life__speed == 6
+    assert 'paused' in l1._Life__renderer._Renderer__stream.getvalue()
+    #
+    # An arrow key is an escape sequence, which is dropped instead of
+    # stopping the run like ESC on its own does.
+    #
+    async def read_keys():
+        readEnd, writeEnd = os.pipe()
+        with os.fdopen(readEnd, 'r') as stream, Keyboard(stream) as keyboard:
+            os.write(writeEnd, b'\x1b[Aq')
+            first = await keyboard.get()
+            os.write(writeEnd, b'\x1b')
+            second = await keyboard.get()
+        os.close(writeEnd)
+        return first, second
+
+    if os.name == 'posix':
+        assert asyncio.run(read_keys()) == ('q', '\x1b')
+    #
+    # Keys still come through when stdin is redirected from a file, which
+    # the event loop can't watch, or from /dev/null.
+    #
+    keyFile = os.path.join(tempfile.mkdtemp(), 'keys.txt')
+    with open(keyFile, 'w') as stream:
+        stream.write('+q')
+
+    async def read_file():
+        with open(keyFile, 'r') as stream, Keyboard(stream) as keyboard:
+            keys = [await keyboard.get(), await keyboard.get()]
+        with open(os.devnull, 'r') as stream, Keyboard(stream):
+            pass
+        return keys
+
+    assert asyncio.run(read_file()) == ['+', 'q']
+
+def test21():
+    print('----Soup Tests----')
+    filename = os.path.join(tempfile.mkdtemp(), 'soups.jsonl')
+    assert soups.run_soups(6, 24, 24, 30, 'torus', 2000, filename, seed=7, workers=2) == 6
+    with open(filename) as resultFile:
+        results = {result['soup']: result for result in map(json.loads, resultFile)}
+    assert sorted(results) == list(range(6))
+    for result in results.values():
+        assert result['seed'] == 7 + result['soup']
+        assert result['lifetime'] is None or result['period'] >= 1
+    #
+    # Cut the last line short as if the run was interrupted; running again
+    # only does that soup, and gets the same answer.
+    #
+    with open(filename, 'rb+') as resultFile:
+        resultFile.seek(-20, os.SEEK_END)
+        resultFile.truncate()
+    assert soups.run_soups(6, 24, 24, 30, 'torus', 2000, filename, seed=7, workers=2) == 1
+    assert soups.run_soups(6, 24, 24, 30, 'torus', 2000, filename, seed=7, workers=2) == 0
+    for engine in ('tiled', 'hashlife'):
+        try:
+            soups.run_soups(6, 24, 24, 30, 'torus', 2000, filename, seed=7, engine=engine, workers=2)
+            assert False
+        except ValueError:
+            pass
+    with open(filename) as resultFile:
+        lines = resultFile.read().splitlines()
+    again = json.loads(lines[-1])
+    assert len(lines) == 7
+    for key in ['lifetime', 'period', 'population']:
+        assert again[key] == results[again['soup']][key]
+
+def test22():
+    print('----Batch Tests----')
+    b1 = WorldBatch(12, 16, 16, 'torus', maxGenerations=500)
+    b1.randomize([10, 20, 30, 40] * 3, seed=3)
+    starts = [b1.get_board(board) for board in range(12)]
+    assert b1.run() == 0
+    assert b1.get_generation() <= 500
+    lifetimes = b1.get_lifetimes()
+    periods = b1.get_periods()
+    populations = b1.get_populations()
+    steps = b1.get_steps()
+    for board in range(12):
+        #
+        # Every board ends up the same as if it was run as a World.
+        #
+        w1 = World(16, 16)
+        w1.set_geometry('torus')
+        w1.set_cells(starts[board])
+        for generation in range(500):
+            w1.next_generation()
+            if w1.is_stable():
+                break
+        if w1.get_cycle():
+            assert (lifetimes[board], periods[board]) == w1.get_cycle()
+        else:
+            assert lifetimes[board] == -1
+        assert populations[board] == w1.get_living_cell_count()
+        assert steps[board] == w1.get_generation()
+        w2 = b1.get_world(board)
+        assert w2.__str__() == w1.__str__()
+        assert w2.get_generation() == w1.get_generation()
+    #
+    # Retired boards stop while the others carry on.
+    #
+    b2 = WorldBatch(2, 8, 8, 'bowl')
+    b2.set_board(1, numpy.eye(8))
+    b2.step()
+    assert list(b2.get_running()) == [1]
+
+def test23():
+    print('----Census Tests----')
+    w1 = World(30, 30)
+    w1.set_geometry('torus')
+    #
+    # The block is across the corner of the torus.
+    #
+    scene = {'block': [(29, 29), (29, 0), (0, 29), (0, 0)],
+             'blinker': [(10, 2), (11, 2), (12, 2)],
+             'beacon': [(2, 10), (2, 11), (3, 10), (3, 11), (4, 12), (4, 13), (5, 12), (5, 13)],
+             'glider': [(20, 21), (21, 22), (22, 20), (22, 21), (22, 22)],
+             'beehive': [(15, 15), (15, 16), (16, 14), (16, 17), (17, 15), (17, 16)]}
+    for positions in scene.values():
+        for row, column in positions:
+            w1.set_cell(row, column, True)
+    filename = os.path.join(tempfile.mkdtemp(), 'census.json')
+    c1 = Census(filename)
+    counts = c1.add(w1, period=4)
+    assert counts == {'block': 1, 'blinker': 1, 'beacon': 1, 'glider': 1, 'beehive': 1}
+    #
+    # Other phases and orientations are all cache hits.
+    #
+    hits, misses = c1.get_cache_stats()
+    assert misses == 0
+    w1.next_generation()
+    assert c1.add(w1, period=4) == counts
+    assert c1.get_cache_stats()[1] == 0
+    #
+    # Something new is worked out once and then found in the cache.
+    #
+    w2 = World(10, 10)
+    for row, column in [(2, 2), (2, 3), (3, 2), (3, 4), (4, 4), (5, 4), (5, 5)]:
+        w2.set_cell(row, column, True)
+    name = list(c1.count(w2))[0]
+    assert name.startswith('xs7_')
+    assert c1.get_object(name)['period'] == 1
+    assert c1.get_cache_stats()[1] == 1
+    c1.count(w2)
+    assert c1.get_cache_stats()[1] == 1
+    assert c1.get_object('glider')['displacement'] == [1, 1]
+    #
+    # The totals add up across runs through the file.
+    #
+    c1.save()
+    c2 = Census(filename)
+    c2.add(w1, period=4)
+    assert c2.get_totals()['glider'] == 3
+    assert c2.get_cache_stats() == (5, 0)
+    #
+    # Objects are run by the world's rule and cached apart for each rule,
+    # so the blinker and beehive are new objects by another rule, and a
+    # rule with letters is run by HashLife.
+    #
+    w3 = World(20, 20)
+    for row, column in scene['blinker'] + scene['beehive']:
+        w3.set_cell(row, column, True)
+    for rule in ('B36/S245', 'B3/S2-a3'):
+        w3.set_rule(rule)
+        misses = c2.get_cache_stats()[1]
+        counts = c2.count(w3, period=2)
+        assert c2.get_cache_stats()[1] == misses + 2
+        objects = sorted((c2.get_object(name)['period'], c2.get_object(name)['rule']) for name in counts)
+        assert objects == [(1, rule), (2, rule)]
+    w3.set_rule('B3/S23')
+    assert c2.count(w3) == {'blinker': 1, 'beehive': 1}
+    for rule in ('B03/S23', 'bosco'):
+        w4 = World(20, 20, 'ltl')
+        w4.set_rule(rule)
+        try:
+            c2.count(w4)
+            assert False
+        except ValueError:
+            pass
+
+def test24():
+    print('----Pattern File Tests----')
+    folder = tempfile.mkdtemp()
+    gun = os.path.join(folder, 'gun.rle')
+    with open(gun, 'w') as gunFile:
+        gunFile.write('#N Gosper glider gun\n'
+                      'x = 36, y = 9, rule = B3/S23\n'
+                      '24bo$22bobo$12b2o6b2o12b2o$11bo3bo4b2o12b2o$2o8bo5bo3b2o$2o8bo3bob2o4b\n'
+                      'obo$10bo5bo7bo$11bo3bo$12b2o!\n')
+    w1 = World.from_file(gun)
+    assert (w1.get_rows(), w1.get_columns()) == (9, 36)
+    assert w1.get_living_cell_count() == 36
+    assert w1.is_living(0, 24) and w1.is_living(8, 13) and not w1.is_living(8, 14)
+    #
+    # Reading a chunk at a time gives the same pattern, even when a count
+    # is split between chunks.
+    #
+    patterns.chunkSize = 7
+    w2 = World.from_file(gun)
+    patterns.chunkSize = 1024 * 1024
+    assert w2.__str__() == w1.__str__()
+    #
+    # Every format gives back the same world, and a bigger world has the
+    # pattern in the middle.
+    #
+    w1 = World(40, 50)
+    w1.randomize(20)
+    for extension in ['.rle', '.cells', '.life']:
+        filename = os.path.join(folder, 'soup' + extension)
+        w1.save(filename)
+        assert World.from_file(filename).__str__() == w1.__str__()
+    w3 = World.from_file(gun, rows=19, columns=40)
+    assert w3.is_living(5, 26)
+    assert w3.get_living_cell_count() == 36
+    #
+    # A big empty world with a few cells makes a tiny RLE file.
+    #
+    w4 = World(3000, 3000, 'sparse')
+    for row, column in [(0, 1), (1, 2), (2, 0), (2, 1), (2, 2)]:
+        w4.set_cell(row + 1500, column + 1500, True)
+    filename = os.path.join(folder, 'glider.rle')
+    w4.save(filename)
+    assert os.path.getsize(filename) < 100
+    assert World.from_file(filename, 'sparse').get_living_cell_count() == 5
+
+def test25():
+    print('----Binary Life File Tests----')
+    folder = tempfile.mkdtemp()
+    w1 = World(37, 70)
+    w1.set_geometry('klein')
+    w1.randomize(40)
+    for generation in range(5):
+        w1.next_generation()
+    filename = os.path.join(folder, 'soup.life')
+    w1.save(filename)
+    assert LifeFile.is_life_file(filename)
+    assert os.path.getsize(filename) == LifeFile.headerSize + 37 * 16
+    w2 = World.from_file(filename)
+    assert w2.__str__() == w1.__str__()
+    assert w2.get_generation() == 5
+    assert w2.get_geometry() == 'klein'
+    #
+    # Old text .life files still open.
+    #
+    textFile = os.path.join(folder, 'old.life')
+    with open(textFile, 'w') as oldFile:
+        oldFile.write('.O..\n..O.\nOOO.\n')
+    assert not LifeFile.is_life_file(textFile)
+    assert World.from_file(textFile).get_living_cell_count() == 5
+    #
+    # A huge world opens straight away, and a corner of it can be read and
+    # changed without the rest.
+    #
+    filename = os.path.join(folder, 'huge.life')
+    start = time.perf_counter()
+    with LifeFile.create(filename, 20000, 30000, generation=7) as lifeFile:
+        lifeFile.write_region(19990, 29995, numpy.ones((3, 5)))
+        lifeFile.write_region(5, 13, [[1, 0, 1]])
+    with LifeFile(filename) as lifeFile:
+        assert (lifeFile.get_rows(), lifeFile.get_columns()) == (20000, 30000)
+        assert lifeFile.get_generation() == 7
+        assert lifeFile.read_region(19989, 29994, 5, 6).sum() == 15
+        assert lifeFile.read_region(5, 12, 1, 5).tolist() == [[0, 1, 0, 1, 0]]
+    assert time.perf_counter() - start < 10
+
+
+def test26():
+    print('----Trajectory Tests----')
+    folder = tempfile.mkdtemp()
+    filename = os.path.join(folder, 'run.trj')
+    w1 = World(40, 90)
+    w1.set_geometry('torus')
+    w1.randomize(35)
+    w1.start_recording(filename)
+    boards = {0: w1.get_cells().copy()}
+    for generation in range(1, 601):
+        w1.next_generation()
+        boards[generation] = w1.get_cells().copy()
+    #
+    # Skipping ahead starts a new keyframe.
+    #
+    w1.advance(10)
+    w1.next_generation()
+    boards[611] = w1.get_cells().copy()
+    w1.stop_recording()
+    trajectory = Trajectory(filename)
+    assert trajectory.get_range() == (0, 611)
+    assert trajectory.get_geometry() == 'torus'
+    for generation in (0, 1, 255, 256, 257, 599, 600, 611):
+        assert (trajectory.seek(generation) == boards[generation]).all()
+    played = list(trajectory.frames(590))
+    assert [generation for generation, cells in played] == list(range(590, 601)) + [610, 611]
+    assert (played[3][1] == boards[593]).all()
+    #
+    # A recording that was cut off still plays up to where it stops.
+    #
+    with open(filename, 'rb') as whole, open(filename + '.cut', 'wb') as cut:
+        cut.write(whole.read()[:-5])
+    assert Trajectory(filename + '.cut').get_range()[1] < 611
+    stream = io.StringIO()
+    replay(filename, speed=10000, start=600, renderer=Renderer(stream))
+    assert 'gen:611 of 611' in stream.getvalue()
+    #
+    # A rule too long for the header is kept after it.
+    #
+    rule = 'B2-ea3-ir4-at5kqj6ek7c/S1c2-in3-aq4-et5-k6n7e8'
+    filename = os.path.join(folder, 'long.trj')
+    w2 = World(20, 30)
+    w2.set_rule(rule)
+    w2.randomize(30, seed=6)
+    w2.start_recording(filename)
+    boards = [w2.get_cells().copy()]
+    for generation in range(20):
+        w2.next_generation()
+        boards.append(w2.get_cells().copy())
+    w2.stop_recording()
+    trajectory = Trajectory(filename)
+    assert trajectory.get_rule() == rule
+    assert trajectory.get_range() == (0, 20)
+    assert (trajectory.seek(20) == boards[20]).all()
+    #
+    # Rewinding while recording leaves out what was recorded after the
+    # generation it went back to, also in the middle of a chunk.
+    #
+    filename = os.path.join(folder, 'rewind.trj')
+    w3 = World(20, 30)
+    w3.randomize(35, seed=9)
+    w3.start_recording(filename)
+    boards = {0: w3.get_cells().copy()}
+    for generation in range(1, 11):
+        w3.next_generation()
+        boards[generation] = w3.get_cells().copy()
+    w3.rewind(5)
+    w3.set_cell(0, 0, not w3.get_cells()[0, 0])
+    boards[5] = w3.get_cells().copy()
+    for generation in range(6, 9):
+        w3.next_generation()
+        boards[generation] = w3.get_cells().copy()
+    w3.stop_recording()
+    trajectory = Trajectory(filename)
+    assert trajectory.get_range() == (0, 8)
+    assert [generation for generation, cells in trajectory.frames()] == list(range(9))
+    for generation in range(9):
+        assert (trajectory.seek(generation) == boards[generation]).all(), generation
+    try:
+        trajectory.seek(9)
+        assert False
+    except ValueError:
+        pass
+
+
+def test27():
+    print('----Library Tests----')
+    folder = tempfile.mkdtemp()
+    with open(os.path.join(folder, 'glider.rle'), 'w') as patternFile:
+        patternFile.write('x = 3, y = 3, rule = B3/S23\nbo$2bo$3o!\n')
+    with open(os.path.join(folder, 'turned glider.cells'), 'w') as patternFile:
+        patternFile.write('!Name: turned\nOOO\nO..\n.O.\n')
+    with open(os.path.join(folder, 'blinker.cells'), 'w') as patternFile:
+        patternFile.write('.....\n.OOO.\n.....\n')
+    blocks = World(6, 6)
+    blocks.set_cell(2, 2, True)
+    blocks.set_cell(2, 3, True)
+    blocks.set_cell(3, 2, True)
+    blocks.set_cell(3, 3, True)
+    blocks.save(os.path.join(folder, 'block.life'))
+    library = Library(folder, cacheSize=2)
+    assert library.get_names() == ['blinker.cells', 'block.life', 'glider.rle', 'turned glider.cells']
+    glider = library.get_info('glider.rle')
+    assert (glider['population'], glider['period'], glider['settles']) == (5, 4, 0)
+    assert glider['key'] == library.get_info('turned glider.cells')['key']
+    blinker = library.get_info('blinker.cells')
+    assert (blinker['rows'], blinker['columns'], blinker['box']) == (3, 5, [1, 1, 1, 3])
+    assert library.get_info('block.life')['period'] == 1
+    assert library.search('glider') == ['glider.rle', 'turned glider.cells']
+    assert library.search(period=2) == ['blinker.cells']
+    assert library.search(maxRows=1) == ['blinker.cells']
+    assert library.search(key=glider['key'], maxColumns=2) == []
+    assert library.find('glider') == 'glider.rle'
+    #
+    # Patterns are read once and kept until they are the oldest of more
+    # than cacheSize.
+    #
+    library.load('glider.rle')
+    library.load('glider.rle')
+    library.load('blinker.cells')
+    library.load('block.life')
+    library.load('block.life')
+    assert library.get_cache_stats() == (2, 3)
+    library.load('glider.rle')
+    assert library.get_cache_stats() == (2, 4)
+    world = World.from_pattern(library.load('blinker.cells'), rows=9, columns=9)
+    assert world.get_living_cell_count() == 3
+    #
+    # The index is saved, and only changed files are read again.
+    #
+    assert Library(folder).refresh() == 0
+    with open(os.path.join(folder, 'blinker.cells'), 'w') as patternFile:
+        patternFile.write('OOO\n')
+    os.remove(os.path.join(folder, 'block.life'))
+    again = Library(folder)
+    assert again.refresh() == 0
+    assert again.get_names() == ['blinker.cells', 'glider.rle', 'turned glider.cells']
+    assert again.get_info('blinker.cells')['rows'] == 1
+    #
+    # A file that can't be read doesn't stop the rest being indexed.
+    #
+    with open(os.path.join(folder, 'broken.rle'), 'wb') as patternFile:
+        patternFile.write(b'x = 3, y = 3\n\xff\xfe\x80bo$2bo$3o!\n')
+    broken = Library(folder)
+    assert broken.get_names() == ['blinker.cells', 'glider.rle', 'turned glider.cells']
+    assert list(broken.get_unreadable()) == ['broken.rle']
+    assert broken.find('broken') is None and broken.search() == broken.get_names()
+    assert Library(folder).refresh() == 0
+
+
+def test28():
+    print('----Bulk Editing Tests----')
+    glider = [[0, 1, 0],
+              [0, 0, 1],
+              [1, 1, 1]]
+    for engine in ('numpy', 'bitboard', 'sparse', 'hashlife'):
+        w1 = World(20, 30, engine)
+        w1.set_positions([1, 2, 3], [4, 5, 6])
+        assert w1.get_living_cell_count() == 3
+        w1.set_positions([1, 2], [4, 5], [False, True])
+        assert w1.get_positions([1, 2, 3], [4, 5, 6]).tolist() == [0, 1, 1]
+        w1.clear_rectangle(0, 0, 20, 30)
+        w1.fill_rectangle(10, 10, 2, 3)
+        assert w1.get_living_cell_count() == 6
+        #
+        # A glider turned a quarter turn clockwise, and the same one
+        # flipped over on top of it with xor only leaves what differs.
+        #
+        w1.clear_rectangle(0, 0, 20, 30)
+        w1.stamp(glider, 0, 0, turns=1)
+        assert w1.get_cells()[:3, :3].tolist() == [[1, 0, 0], [1, 0, 1], [1, 1, 0]]
+        w1.stamp(glider, 0, 0, turns=1, flip=True, blend='xor')
+        assert w1.get_cells()[:3, :3].tolist() == [[0, 1, 0], [0, 0, 0], [0, 1, 0]]
+        w1.stamp(glider, 0, 0, blend='replace')
+        assert w1.get_cells()[:3, :3].tolist() == glider
+        #
+        # Copies that fall off the edge of a bounded world are cut off.
+        #
+        w1.clear_rectangle(0, 0, 20, 30)
+        w1.stamp(glider, [5, 18], [5, 28])
+        assert w1.get_living_cell_count() == 6
+        w1.set_mask([[True, False], [False, True]], 10, 10)
+        assert w1.is_living(11, 11) and not w1.is_living(10, 11)
+    #
+    # Thousands of gliders go in with a few array operations, not a call
+    # per cell.
+    #
+    w1 = World(1000, 1000)
+    corners = numpy.arange(3000) * 331 % 997
+    cellCalls = []
+    w1._World__engine.set_cell = lambda row, column, living: cellCalls.append((row, column))
+    w1.stamp(glider, corners, corners[::-1])
+    assert not cellCalls
+    del w1._World__engine.set_cell
+    assert w1.get_positions(corners[:1] + 2, corners[-1:]).tolist() == [1]
+    #
+    # The plane keeps cells outside the window.
+    #
+    w2 = World(10, 10, 'sparse')
+    w2.set_geometry('plane')
+    w2.stamp(glider, -5, -5)
+    assert w2.get_positions([-3], [-5]).tolist() == [1]
+
+
+def test29():
+    print('----Seeded Soup Tests----')
+    w1 = World(60, 80)
+    w1.randomize(30, seed=12345)
+    w2 = World(60, 80, 'bitboard')
+    w2.randomize(30, seed=12345)
+    assert w1.__str__() == w2.__str__()
+    w2.randomize(30, seed=54321)
+    assert w1.__str__() != w2.__str__()
+    #
+    # A soup without a seed gets one, which makes it again.
+    #
+    w2.randomize(30)
+    soup = w2.get_soup()
+    w1.randomize(**soup)
+    assert w1.__str__() == w2.__str__()
+    w1.randomize(0)
+    assert w1.get_living_cell_count() == 0
+    w1.randomize(100)
+    assert w1.get_living_cell_count() == 60 * 80
+    w1.randomize(25, seed=1, region=(10, 20, 16, 16), symmetry='D8')
+    cells = w1.get_cells()
+    soupCells = cells[10:26, 20:36]
+    assert w1.get_living_cell_count() == soupCells.sum() > 0
+    for turned in (numpy.rot90(soupCells), soupCells.T, soupCells[::-1]):
+        assert (turned == soupCells).all()
+    try:
+        w1.randomize(25, region=(0, 0, 10, 12), symmetry='C4')
+        assert False
+    except ValueError:
+        pass
+    #
+    # Saved files say how the soup was made, until the world is changed
+    # by hand.
+    #
+    folder = tempfile.mkdtemp()
+    w1.randomize(35, seed=99, symmetry='C2')
+    w1.save(os.path.join(folder, 'soup.rle'))
+    with open(os.path.join(folder, 'soup.rle'), 'r') as rleFile:
+        assert '#C soup seed 99, 35%, C2\n' in rleFile.read()
+    w1.save(os.path.join(folder, 'soup.life'))
+    with LifeFile(os.path.join(folder, 'soup.life')) as lifeFile:
+        assert lifeFile.get_soup() == 'seed 99, 35%, C2'
+    w1.set_cell(0, 0, True)
+    assert w1.get_soup() is None
+    #
+    # A 10000x10000 soup is quick.
+    #
+    w3 = World(10000, 10000)
+    start = time.perf_counter()
+    w3.randomize(25, seed=3)
+    assert time.perf_counter() - start < 10
+
+
+def test30():
+    print('----Rule Tests----')
+    assert Rule('B3/S23').is_life()
+    assert Rule.get('highlife') == Rule('b36s23') == Rule('23/36') == Rule('S23/B36')
+    assert str(Rule('B3/S2-i34q')) == 'B3/S2-i34q'
+    assert str(Rule('B2cekin3cekanyqjr4cekinyqjrtwz/S2cekan')) == 'B2-a3-i4-a/S2-i'
+    assert Rule('B36/S23').totalistic and not Rule('B2a/S').totalistic
+    try:
+        Rule('B9/S23')
+        assert False
+    except ValueError:
+        pass
+    #
+    # The table of a totalistic rule only depends on the count, and a
+    # Hensel letter picks out one arrangement of the neighbors.
+    #
+    life = Rule('B3/S23')
+    for number in range(512):
+        count = bin(number & ~16).count('1')
+        assert life.table[number] == (count == 3 or (count == 2 and number & 16 != 0))
+    kite = Rule('B2a/S')
+    assert kite.table[256 + 128] == 1 and kite.table[256 + 64] == 0 and kite.table[128 + 2] == 0
+    #
+    # Every engine steps a soup to the same board by a totalistic rule,
+    # and the ones that look at the whole block of nine by a rule with
+    # letters.
+    #
+    for rule, engines in (('B36/S23', World.engines), ('B3678/S34678', World.engines),
+                          ('B2/S', World.engines),
+                          ('B2-a3/S12-k', ('numpy', 'topology', 'threaded', 'hashlife'))):
+        boards = []
+        for engine in engines:
+            geometry = 'plane' if engine == 'hashlife' else 'torus'
+            w1 = World(40, 50, engine)
+            w1.set_geometry(geometry)
+            w1.set_rule(rule)
+            w1.randomize(30, seed=5, region=(15, 20, 10, 10))
+            for generation in range(6):
+                w1.next_generation()
+            boards.append(w1.__str__())
+        assert len(set(boards)) == 1, rule
+    #
+    # The HighLife replicator makes copies of itself.
+    #
+    replicatorRows = numpy.array([0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4])
+    replicatorColumns = numpy.array([2, 3, 4, 1, 4, 0, 4, 0, 3, 0, 1, 2])
+    w1 = World(64, 64)
+    w1.set_rule('highlife')
+    w1.stamp((5, 5, replicatorRows, replicatorColumns), 30, 30)
+    for generation in range(12):
+        w1.next_generation()
+    copies = World(64, 64)
+    copies.stamp((5, 5, replicatorRows, replicatorColumns), 28, 28)
+    copies.stamp((5, 5, replicatorRows, replicatorColumns), 32, 32)
+    assert w1.__str__() == copies.__str__()
+    w1.set_rule('life')
+    copies.set_rule('highlife')
+    for generation in range(12):
+        w1.next_generation()
+        copies.next_generation()
+    assert w1.__str__() != copies.__str__()
+    try:
+        World(10, 10, 'bitboard').set_rule('B2a/S')
+        assert False
+    except ValueError:
+        pass
+    #
+    # The rule is saved with the world and comes back when it is opened,
+    # and it goes along when the engine changes.
+    #
+    folder = tempfile.mkdtemp()
+    w1.set_rule('B36/S23')
+    for extension in ('.life', '.rle', '.cells'):
+        w1.save(os.path.join(folder, 'highlife' + extension))
+        w2 = World.from_file(os.path.join(folder, 'highlife' + extension))
+        assert w2.get_rule() == Rule('B36/S23')
+    #
+    # Rules too long for the 32 bytes in the .life header are kept after
+    # it, and the board still reads back.
+    #
+    assert str(Rule('B2-a3-i4-a/S2-i3-a4-e')) == 'B2-a3-i4-a/S2-i3-a4-e'
+    for rule, engine in (('B2-ea3-ir4-at5kqj6ek7c/S1c2-in3-aq4-et5-k6n7e8', 'numpy'),
+                         ('R10,C0,M1,S1234..2212,B123..170,NM', 'ltl')):
+        w3 = World(30, 40, engine)
+        w3.set_rule(rule)
+        w3.randomize(30, seed=4)
+        assert str(w3.get_rule()) == rule and len(rule) > LifeFile.ruleSize
+        for extension in ('.life', '.rle', '.cells'):
+            filename = os.path.join(folder, 'long' + extension)
+            w3.save(filename)
+            w4 = World.from_file(filename)
+            assert w4.get_rule() == w3.get_rule()
+            assert w4.__str__() == w3.__str__()
+        with LifeFile(os.path.join(folder, 'long.life'), 'r+') as lifeFile:
+            assert lifeFile.get_rule() == str(w3.get_rule())
+            try:
+                lifeFile.set_header(rule='B3/S23')
+                assert False
+            except ValueError:
+                pass
+    w2.set_rule('B2a/S')
+    try:
+        w2.set_engine('bitboard')
+        assert False
+    except ValueError:
+        pass
+    assert w2.get_engine() == 'numpy'
+    w2.set_rule('B36/S23')
+    w2.set_engine('bitboard')
+    assert w2.get_rule() == Rule('B36/S23')
+    #
+    # A rule costs about the same every generation as Life does.
+    #
+    w3 = World(1024, 1024)
+    w3.randomize(30, seed=3)
+    timings = []
+    for rule in ('B3/S23', 'B36/S23', 'B2-a3/S12-k'):
+        w3.set_rule(rule)
+        start = time.perf_counter()
+        for generation in range(5):
+            w3.next_generation()
+        timings.append(time.perf_counter() - start)
+    assert max(timings) < 10 * timings[0]
+
+
+def test31():
+    print('----Larger than Life Tests----')
+    bosco = Rule.get('bosco')
+    assert isinstance(bosco, RangeRule) and bosco.range == 5
+    assert bosco == Rule.get('r5,c0,m1,s34..58,b34..45,nm') == Rule.get('R5,C0,M1,S34..58,B34..45')
+    for text in ('R5,C3,M1,S34..58,B34..45,NM', 'R5,C0,M1,S34..58,B34..45,NN'):
+        try:
+            Rule.get(text)
+            assert False
+        except ValueError:
+            pass
+    #
+    # The counts from the summed-area table are the same as adding up
+    # every square, on a bowl and a torus.
+    #
+    rule = Rule.get('R3,C0,M0,S8..14,B9..12,NM')
+    for geometry in ('bowl', 'torus'):
+        w1 = World(24, 30, 'ltl')
+        w1.set_geometry(geometry)
+        w1.set_rule(rule)
+        w1.randomize(45, seed=8)
+        cells = w1.get_cells().copy()
+        if geometry == 'torus':
+            padded = numpy.pad(cells, 3, mode='wrap')
+        else:
+            padded = numpy.pad(cells, 3)
+        expected = numpy.zeros_like(cells)
+        for row in range(24):
+            for column in range(30):
+                neighbors = padded[row:row + 7, column:column + 7].sum() - cells[row, column]
+                if cells[row, column]:
+                    expected[row, column] = 8 <= neighbors <= 14
+                else:
+                    expected[row, column] = 9 <= neighbors <= 12
+        w1.next_generation()
+        assert (w1.get_cells() == expected).all(), geometry
+    #
+    # Range 1 rules run the same as on the other engines.
+    #
+    w1 = World(40, 50, 'ltl')
+    w2 = World(40, 50)
+    for world in (w1, w2):
+        world.set_geometry('klein')
+        world.set_rule('B36/S23')
+        world.randomize(30, seed=4)
+        for generation in range(10):
+            world.next_generation()
+    assert w1.__str__() == w2.__str__()
+    #
+    # Only the ltl engine reaches that far, and files keep the rule.
+    #
+    try:
+        w2.set_rule('bosco')
+        assert False
+    except ValueError:
+        pass
+    w1.set_rule('bosco')
+    try:
+        w1.set_engine('numpy')
+        assert False
+    except ValueError:
+        pass
+    assert w1.get_engine() == 'ltl'
+    folder = tempfile.mkdtemp()
+    for extension in ('.life', '.rle', '.cells'):
+        w1.save(os.path.join(folder, 'bosco' + extension))
+        w2 = World.from_file(os.path.join(folder, 'bosco' + extension))
+        assert w2.get_rule() == bosco and w2.get_engine() == 'ltl'
+    #
+    # A step costs about the same at range 10 as at range 2.
+    #
+    w3 = World(1024, 1024, 'ltl')
+    w3.set_geometry('torus')
+    w3.randomize(50, seed=2)
+    timings = []
+    for rule in ('R2,C0,M1,S5..9,B4..7,NM', 'R10,C0,M1,S123..212,B123..170,NM'):
+        w3.set_rule(rule)
+        start = time.perf_counter()
+        for generation in range(5):
+            w3.next_generation()
+        timings.append(time.perf_counter() - start)
+    assert timings[1] < 3 * timings[0]
 
 
 if __name__ == '__main__':
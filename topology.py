@@ -0,0 +1,167 @@
+from geometry import Geometry
+from rule import Rule
+import numpy
+
+
+class Topology(object):
+    """
+    The neighbors of every cell in a world of a given size and geometry,
+    worked out once. Cells are numbered row by row (row * columns + column)
+    and neighbors[k][cell] is the number of the k-th neighbor of cell, as
+    placed by the Geometry. A neighbor that is always dead (off the edge of
+    a bowl, say) is given the number rows * columns, which is a spare cell
+    at the end of the board that never comes alive. That costs 32 bytes
+    per cell, so only the last few topologies are kept.
+    """
+
+    offsets = [(-1, -1), (-1, 0), (-1, 1),
+               (0, -1),           (0, 1),
+               (1, -1),  (1, 0),  (1, 1)]
+
+    cache = {}
+
+    cacheSize = 4
+
+    @classmethod
+    def get(cls, rows, columns, geometry):
+        """
+        Return the Topology for a size and geometry, making it only if it
+        hasn't been made already.
+        :param rows: rows in the world.
+        :param columns: columns in the world.
+        :param geometry: a key to the bounded Geometry.geometries.
+        :return: a Topology object.
+        """
+        key = (rows, columns, geometry)
+        if key not in cls.cache:
+            if len(cls.cache) >= cls.cacheSize:
+                del cls.cache[next(iter(cls.cache))]
+            cls.cache[key] = Topology(rows, columns, geometry)
+        return cls.cache[key]
+
+    def __init__(self, rows, columns, geometry):
+        self.rows = rows
+        self.columns = columns
+        self.geometry = geometry
+        self.size = rows * columns
+        cellRows, cellColumns = numpy.divmod(numpy.arange(self.size, dtype=numpy.int64), columns)
+        self.neighbors = numpy.empty((8, self.size), dtype=numpy.int32)
+        for number, (rowOffset, columnOffset) in enumerate(Topology.offsets):
+            neighborRows, neighborColumns, living = Geometry.get(geometry).locate(
+                rows, columns, cellRows + rowOffset, cellColumns + columnOffset)
+            self.neighbors[number] = numpy.where(living, neighborRows * columns + neighborColumns,
+                                                 self.size)
+
+    def neighbors_of(self, row, column):
+        """Return a list of the (row, column) positions of a cell's neighbors."""
+        cell = row * self.columns + column
+        return [divmod(int(neighbor), self.columns) for neighbor in self.neighbors[:, cell]
+                if neighbor != self.size]
+
+
+class TopologyEngine(object):
+    """
+    Steps a world by looking up every cell's neighbors in a Topology that
+    is worked out once for the size and geometry. The board is kept in two
+    buffers, the current generation and the next one, which trade places
+    every generation, so stepping doesn't allocate anything.
+    """
+
+    name = 'topology'
+
+    geometries = Geometry.bounded
+
+    #
+    # Rules that aren't totalistic look up the rule's 512 entry table,
+    # indexed by adding up weights[k] for every living neighbor k (the
+    # weights of Rule.weights, in the order of Topology.offsets) and the
+    # cell's own weight.
+    #
+    weights = [int(Rule.weights[rowOffset + 1, columnOffset + 1])
+               for rowOffset, columnOffset in Topology.offsets]
+
+    centerWeight = int(Rule.weights[1, 1])
+
+    def __init__(self, rows, columns, geometry='bowl'):
+        self.__rows = rows
+        self.__columns = columns
+        self.__size = rows * columns
+        self.__topology = Topology.get(rows, columns, geometry)
+        #
+        # Both buffers have the spare always dead cell at the end.
+        #
+        self.__current = numpy.zeros(self.__size + 1, dtype=numpy.uint8)
+        self.__next = numpy.zeros(self.__size + 1, dtype=numpy.uint8)
+        self.__counts = numpy.zeros(self.__size, dtype=numpy.uint8)
+        self.__gathered = numpy.zeros(self.__size, dtype=numpy.uint8)
+        self.__rule = Rule.get('B3/S23')
+        self.__blocks = None
+
+    def set_rule(self, rule):
+        """Change the rule to a Rule (every rule works here)."""
+        self.__rule = rule
+        self.__blocks = None if rule.totalistic else numpy.zeros(self.__size, dtype=numpy.uint16)
+
+    def get_topology(self):
+        return self.__topology
+
+    def get_cells(self):
+        """Returns the board as a (rows, columns) uint8 array. Don't change
+        it or keep it, the buffer is reused two generations later."""
+        return self.__current[:self.__size].reshape(self.__rows, self.__columns)
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        self.__current[:self.__size] = numpy.asarray(cells).reshape(self.__size) != 0
+
+    def get_cell(self, row, column):
+        return bool(self.__current[row * self.__columns + column])
+
+    def set_cell(self, row, column, living):
+        self.__current[row * self.__columns + column] = living
+
+    def get_positions(self, rows, columns):
+        return self.__current[rows * self.__columns + columns]
+
+    def set_positions(self, rows, columns, living):
+        self.__current[rows * self.__columns + columns] = living
+
+    def set_geometry(self, geometry):
+        self.__topology = Topology.get(self.__rows, self.__columns, geometry)
+
+    def population(self):
+        return int(numpy.count_nonzero(self.__current[:self.__size]))
+
+    def step(self):
+        """Advance the board one generation."""
+        current = self.__current
+        counts = self.__counts
+        gathered = self.__gathered
+        neighbors = self.__topology.neighbors
+        if self.__blocks is not None:
+            self.step_table()
+            return
+        numpy.take(current, neighbors[0], out=counts, mode='clip')
+        for number in range(1, 8):
+            numpy.take(current, neighbors[number], out=gathered, mode='clip')
+            numpy.add(counts, gathered, out=counts)
+        #
+        # The next state of a cell is the rule's totals[2 * neighbors + living].
+        #
+        numpy.multiply(counts, 2, out=counts)
+        numpy.add(counts, current[:self.__size], out=counts)
+        numpy.take(self.__rule.totals, counts, out=self.__next[:self.__size], mode='clip')
+        self.__current, self.__next = self.__next, current
+
+    def step_table(self):
+        """Advance the board one generation by a rule that isn't totalistic."""
+        current = self.__current
+        blocks = self.__blocks
+        gathered = self.__gathered
+        neighbors = self.__topology.neighbors
+        numpy.multiply(current[:self.__size], TopologyEngine.centerWeight, out=blocks)
+        for number in range(8):
+            numpy.take(current, neighbors[number], out=gathered, mode='clip')
+            blocks += gathered * numpy.uint16(TopologyEngine.weights[number])
+        numpy.take(self.__rule.table, blocks, out=self.__next[:self.__size], mode='clip')
+        self.__current, self.__next = self.__next, current
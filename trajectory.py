@@ -0,0 +1,356 @@
+"""
+Recording whole runs to a file and playing them back.
+World.start_recording makes a Recorder, which adds every generation the
+world goes through to an append-only file until World.stop_recording, and
+a Trajectory reads the file back and can go to any generation in it
+without stepping the world again. To play a recording on the terminal:
+
+    python trajectory.py recording.trj --speed 20 --start 500
+"""
+from history import pack_words, unpack_words
+from renderer import Renderer
+from runner import Runner
+import argparse
+import numpy
+import struct
+import time
+import zlib
+
+
+magic = b'LIFETRJ2'
+
+#
+# magic, rows, columns, geometry, rule, long rule bytes. As in a .life
+# file, a rule longer than its 32 bytes is written straight after the
+# header, padded to 8 bytes, with its length in the last field, and the
+# records start after it.
+#
+headerFormat = '<8sII16s32sI'
+
+#
+# Recordings from before long rules had no length field.
+#
+oldMagic = b'LIFETRJ1'
+
+oldHeaderFormat = '<8sII16s32s'
+
+headerSize = 128
+
+ruleSize = 32
+
+
+def long_rule_bytes(rule):
+    """Return how many bytes a rule takes after the header (0 if it fits
+    in the header)."""
+    return 0 if len(rule) <= ruleSize else (len(rule) + 7) // 8 * 8
+
+#
+# kind, first generation, generations, bytes. The kinds are K for a
+# keyframe (the whole board, compressed), D for a chunk of sparse deltas
+# (compressed) and F for one full delta (not compressed).
+#
+recordFormat = '<cQIQ'
+
+recordSize = struct.calcsize(recordFormat)
+
+
+class Recorder(object):
+    """
+    Writes the generations of a world to an append-only file. The board is
+    packed into 64 bit words and each generation is kept as the XOR of its
+    words with the last generation's. Most of the time few words change, so
+    only the changed ones are kept, with where they are, and chunkSize
+    generations of those are compressed with zlib together. When most of
+    the words change (a big chaotic soup) the XOR is written as it is:
+    that hardly compresses, and compressing it would cost more than the
+    step. Every keyframeInterval generations, and whenever the generations
+    don't follow on (the world was edited or rewound), the whole board is
+    written as a keyframe, which is where playback can start from.
+    """
+
+    keyframeInterval = 256
+
+    chunkSize = 16
+
+    #
+    # Deltas that change more than this fraction of the words are written
+    # in full.
+    #
+    sparseFraction = 0.25
+
+    def __init__(self, filename, rows, columns, geometry='bowl', rule='B3/S23'):
+        self.__file = open(filename, 'wb')
+        rule = rule.encode('ascii')
+        longRule = long_rule_bytes(rule)
+        header = struct.pack(headerFormat, magic, rows, columns, geometry.encode('ascii'),
+                             b'' if longRule else rule, len(rule) if longRule else 0)
+        self.__file.write(header.ljust(headerSize, b'\0'))
+        if longRule:
+            self.__file.write(rule.ljust(longRule, b'\0'))
+        self.__previous = None
+        self.__last = None
+        self.__keyframe = None
+        self.__chunk = []
+        self.__chunkStart = None
+
+    def close(self):
+        """Write what is still waiting and close the file."""
+        if self.__file is not None:
+            self.flush_chunk()
+            self.__file.close()
+            self.__file = None
+
+    def write_record(self, kind, first, generations, payload):
+        self.__file.write(struct.pack(recordFormat, kind, first, generations, memoryview(payload).nbytes))
+        self.__file.write(payload)
+
+    def flush_chunk(self):
+        """Compress the waiting sparse deltas and write them."""
+        if self.__chunk:
+            payload = zlib.compress(b''.join(self.__chunk), 1)
+            self.write_record(b'D', self.__chunkStart, len(self.__chunk), payload)
+            self.__chunk = []
+        self.__file.flush()
+
+    def record(self, generation, cells):
+        """
+        Add a generation.
+        :param generation: which generation this is.
+        :param cells: the board as a (rows, columns) array.
+        :return: None
+        """
+        words = pack_words(cells)
+        if (self.__last is None or generation != self.__last + 1 or
+                generation - self.__keyframe >= Recorder.keyframeInterval):
+            self.flush_chunk()
+            self.write_record(b'K', generation, 1, zlib.compress(words.tobytes(), 1))
+            self.__keyframe = generation
+        else:
+            flipped = words ^ self.__previous
+            if numpy.count_nonzero(flipped) > Recorder.sparseFraction * words.size:
+                self.flush_chunk()
+                self.write_record(b'F', generation, 1, flipped)
+            else:
+                changed = numpy.flatnonzero(flipped)
+                if not self.__chunk:
+                    self.__chunkStart = generation
+                self.__chunk.append(struct.pack('<I', changed.size) +
+                                    changed.astype('<i4').tobytes() + flipped[changed].tobytes())
+                if len(self.__chunk) >= Recorder.chunkSize:
+                    self.flush_chunk()
+        self.__previous = words
+        self.__last = generation
+
+
+class Trajectory(object):
+    """
+    Reads a file written by a Recorder. Opening it only reads the record
+    headers, to find the keyframes; going to a generation reads the
+    keyframe before it and the deltas after that. A record cut short (the
+    recording was stopped without closing it) is left out. When the world
+    was rewound while it was recorded, the file goes on with a keyframe at
+    an earlier generation; the generations recorded before from there on
+    are left out, so the recording is what the world went through last.
+    """
+
+    def __init__(self, filename):
+        self.__file = open(filename, 'rb')
+        header = self.__file.read(headerSize)
+        if len(header) < headerSize or header[:len(magic)] not in (magic, oldMagic):
+            raise ValueError(f'{filename} is not a recording.')
+        ruleLength = 0
+        if header[:len(magic)] == oldMagic:
+            fileMagic, self.__rows, self.__columns, geometry, rule = struct.unpack_from(oldHeaderFormat, header)
+        else:
+            (fileMagic, self.__rows, self.__columns, geometry,
+             rule, ruleLength) = struct.unpack_from(headerFormat, header)
+        if ruleLength:
+            rule = self.__file.read(ruleLength)
+        self.__geometry = geometry.rstrip(b'\0').decode('ascii')
+        self.__rule = rule.rstrip(b'\0').decode('ascii')
+        #
+        # Each record is (kind, first generation, generations, where its
+        # bytes start, how many bytes).
+        #
+        self.__records = []
+        self.__file.seek(0, 2)
+        end = self.__file.tell()
+        offset = headerSize + long_rule_bytes(self.__rule)
+        while offset + recordSize <= end:
+            self.__file.seek(offset)
+            kind, first, generations, length = struct.unpack(recordFormat, self.__file.read(recordSize))
+            if offset + recordSize + length > end:
+                break
+            if kind == b'K':
+                self.cut(first)
+            self.__records.append((kind, first, generations, offset + recordSize, length))
+            offset += recordSize + length
+        self.__keyframes = [number for number, record in enumerate(self.__records) if record[0] == b'K']
+
+    def cut(self, generation):
+        """Leave out the records from a generation on, and the end of a
+        chunk of deltas that runs past it."""
+        records = self.__records
+        while records and records[-1][1] >= generation:
+            records.pop()
+        if records:
+            kind, first, generations, offset, length = records[-1]
+            if first + generations > generation:
+                records[-1] = (kind, first, generation - first, offset, length)
+
+    def close(self):
+        self.__file.close()
+
+    def get_rows(self):
+        return self.__rows
+
+    def get_columns(self):
+        return self.__columns
+
+    def get_geometry(self):
+        return self.__geometry
+
+    def get_rule(self):
+        return self.__rule
+
+    def get_range(self):
+        """Returns (first, last), the generations in the recording, or None."""
+        if not self.__keyframes:
+            return None
+        #
+        # The records only go forwards once cut, so the last one ends the
+        # recording.
+        #
+        kind, first, generations, offset, length = self.__records[-1]
+        return self.__records[self.__keyframes[0]][1], first + generations - 1
+
+    def read_payload(self, record):
+        kind, first, generations, offset, length = record
+        self.__file.seek(offset)
+        payload = self.__file.read(length)
+        if kind in (b'K', b'D'):
+            payload = zlib.decompress(payload)
+        return payload
+
+    def deltas(self, record):
+        """
+        Go through the generations of a delta record.
+        :return: iterator of (generation, indices, flipped): which words
+                 changed and what to XOR them with.
+        """
+        kind, first, generations = record[:3]
+        payload = self.read_payload(record)
+        if kind == b'F':
+            flipped = numpy.frombuffer(payload, dtype='<u8')
+            yield first, slice(None), flipped
+            return
+        position = 0
+        for generation in range(first, first + generations):
+            changed = struct.unpack_from('<I', payload, position)[0]
+            position += 4
+            indices = numpy.frombuffer(payload, dtype='<i4', count=changed, offset=position)
+            position += 4 * changed
+            flipped = numpy.frombuffer(payload, dtype='<u8', count=changed, offset=position)
+            position += 8 * changed
+            yield generation, indices, flipped
+
+    def frames(self, start=None):
+        """
+        Go through the generations one after another.
+        :param start: the generation to start at, or the first one.
+        :return: iterator of (generation, cells) where cells is a
+                 (rows, columns) uint8 array.
+        """
+        span = self.get_range()
+        if span is None:
+            return
+        if start is None:
+            start = span[0]
+        shape = (self.__rows, self.__columns)
+        words = None
+        for number in range(self.first_record(start), len(self.__records)):
+            record = self.__records[number]
+            if record[0] == b'K':
+                words = numpy.frombuffer(self.read_payload(record), dtype='<u8').copy()
+                if record[1] >= start:
+                    yield record[1], unpack_words(words, shape)
+                continue
+            for generation, indices, flipped in self.deltas(record):
+                words[indices] ^= flipped
+                if generation >= start:
+                    yield generation, unpack_words(words, shape)
+
+    def first_record(self, generation):
+        """Return the number of the last keyframe at or before a generation."""
+        keyframe = self.__keyframes[0]
+        for number in self.__keyframes:
+            if self.__records[number][1] > generation:
+                break
+            keyframe = number
+        return keyframe
+
+    def seek(self, generation):
+        """
+        Return the board at a generation.
+        :param generation: a generation inside get_range().
+        :return: (rows, columns) uint8 array.
+        """
+        span = self.get_range()
+        if span is None or not span[0] <= generation <= span[1]:
+            raise ValueError(f'Generation must be in {span}.')
+        shape = (self.__rows, self.__columns)
+        number = self.first_record(generation)
+        words = numpy.frombuffer(self.read_payload(self.__records[number]), dtype='<u8').copy()
+        for record in self.__records[number + 1:]:
+            if record[1] > generation or record[0] == b'K':
+                break
+            for done, indices, flipped in self.deltas(record):
+                if done > generation:
+                    break
+                words[indices] ^= flipped
+        return unpack_words(words, shape)
+
+
+def replay(filename, speed=10, start=None, renderer=None):
+    """
+    Play a recording on the terminal.
+    :param filename: the recording.
+    :param speed: generations a second. Generations that come faster than
+                  frames can be drawn are skipped.
+    :param start: the generation to start at, or the first one.
+    :param renderer: the Renderer to draw with, or a new one.
+    :return: None
+    """
+    trajectory = Trajectory(filename)
+    renderer = renderer if renderer is not None else Renderer()
+    span = trajectory.get_range()
+    period = 1 / Runner.framesPerSecond
+    started = time.perf_counter()
+    first = None
+    drawn = started - period
+    for generation, cells in trajectory.frames(start):
+        if first is None:
+            first = generation
+        due = started + (generation - first) / speed
+        now = time.perf_counter()
+        if now < due:
+            time.sleep(due - now)
+        elif now - drawn < period and generation != span[1]:
+            continue
+        renderer.draw(cells, f'Replay:   gen:{generation} of {span[1]}   speed: {speed} gen/s')
+        drawn = time.perf_counter()
+    trajectory.close()
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play back a recorded run.')
+    parser.add_argument('filename')
+    parser.add_argument('--speed', type=float, default=10, help='generations a second')
+    parser.add_argument('--start', type=int, default=None, help='generation to start at')
+    arguments = parser.parse_args()
+    replay(arguments.filename, arguments.speed, arguments.start)
+
+
+if __name__ == '__main__':
+    main()
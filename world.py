@@ -1,37 +1,123 @@
 from cell import Cell
-import random
+from geometry import Geometry
+from engine import NumpyEngine
+from bitboard import BitboardEngine
+from sparse import SparseEngine
+from hashlife import HashLifeEngine
+from topology import Topology, TopologyEngine
+from parallel import TiledEngine, ThreadedEngine
+from ltl import LargerThanLifeEngine
+from history import CycleDetector, History
+from patterns import read_pattern, write_pattern, transform
+from lifefile import LifeFile, save_life
+from trajectory import Recorder
+from rule import Rule
+import numpy
 
 class World(object):
 
+    engines = {'numpy': NumpyEngine,
+               'bitboard': BitboardEngine,
+               'sparse': SparseEngine,
+               'hashlife': HashLifeEngine,
+               'topology': TopologyEngine,
+               'tiled': TiledEngine,
+               'threaded': ThreadedEngine,
+               'ltl': LargerThanLifeEngine}
+
+    symmetries = ('C1', 'C2', 'C4', 'D8')
+
+    #
+    # How many random numbers randomize makes at a time.
+    #
+    randomBand = 1 << 20
+
     @classmethod
-    def from_file(cls, filename):
+    def from_file(cls, filename, engine='numpy', rows=None, columns=None):
         """
-        Given a properly formatted text file, return a new World object.
-        :param filename: path and filename to the text file.
-        :return: a new World object made from the text file.
+        Given a pattern file, return a new World object. Binary .life files
+        (see LifeFile) come back with their generation, geometry and rule; RLE
+        files (.rle) and plaintext files (.cells, and the old text .life
+        files) can be read too.
+        :param filename: path and filename to the pattern file.
+        :param engine: A key to the engines for the new world.
+        :param rows: rows in the new world, or None for as many as the
+                     pattern has. A world bigger than the pattern has the
+                     pattern in the middle.
+        :param columns: columns in the new world, or None.
+        :return: a new World object made from the file.
         """
-        with open(filename, 'r') as myFile:
-            text = myFile.readlines()
-        rows = len(text)
-        columns = len(text[0])
-
-
-        newWorld = World(rows, columns)
-        for rowNumber, row in enumerate(text):
-            for columnNumber, cellText in enumerate(row):
-                if cellText == Cell.liveChar:
-                    newWorld.set_cell(rowNumber, columnNumber, True)
+        if not LifeFile.is_life_file(filename):
+            return cls.from_pattern(read_pattern(filename), engine, rows, columns)
+        with LifeFile(filename) as lifeFile:
+            patternRows = lifeFile.get_rows()
+            patternColumns = lifeFile.get_columns()
+            pattern = lifeFile.read_all()
+            generation = lifeFile.get_generation()
+            geometry = lifeFile.get_geometry()
+            rule = lifeFile.get_rule()
+        newWorld = cls.from_pattern((patternRows, patternColumns, None, None, rule), engine, rows, columns)
+        if geometry in newWorld.__engine.geometries and newWorld.get_rows() == patternRows \
+                and newWorld.get_columns() == patternColumns:
+            newWorld.set_geometry(geometry)
+            newWorld.set_cells(pattern)
+        else:
+            cells = numpy.zeros((newWorld.get_rows(), newWorld.get_columns()), dtype=numpy.uint8)
+            top = (newWorld.get_rows() - patternRows) // 2
+            left = (newWorld.get_columns() - patternColumns) // 2
+            cells[top:top + patternRows, left:left + patternColumns] = pattern
+            newWorld.set_cells(cells)
+        newWorld.set_generation(generation)
         return newWorld
 
+    @classmethod
+    def from_pattern(cls, pattern, engine='numpy', rows=None, columns=None):
+        """
+        Return a new World with a pattern in the middle, running the
+        pattern's rule. A Larger than Life rule is run by the ltl engine
+        if the engine asked for can't.
+        :param pattern: (patternRows, patternColumns, livingRows,
+                        livingColumns, rule) as read_pattern returns it.
+                        The living cells may be None for an empty world,
+                        and the rule None for B3/S23.
+        :param engine: A key to the engines for the new world.
+        :param rows: rows in the new world, or None for as many as the
+                     pattern has.
+        :param columns: columns in the new world, or None.
+        :return: a new World object.
+        """
+        patternRows, patternColumns, livingRows, livingColumns, rule = pattern
+        rows = max(rows or 0, patternRows)
+        columns = max(columns or 0, patternColumns)
+        if rule:
+            #
+            # Golly puts the size of a bounded grid after a colon, like
+            # B3/S23:T100,100; the world has its own size and geometry.
+            #
+            rule = Rule.get(rule.split(':')[0])
+            if rule.range > getattr(World.engines[engine], 'maxRange', 1):
+                engine = 'ltl'
+        newWorld = World(rows, columns, engine)
+        if rule:
+            newWorld.set_rule(rule)
+        if livingRows is not None:
+            cells = numpy.zeros((rows, columns), dtype=numpy.uint8)
+            cells[livingRows + (rows - patternRows) // 2, livingColumns + (columns - patternColumns) // 2] = 1
+            newWorld.set_cells(cells)
+        return newWorld
 
-    def __init__(self, rows, columns):
+    def __init__(self, rows, columns, engine='numpy'):
         self.__rows = rows
         self.__columns = columns
-        self.__grid = self.create_grid()
-        self.__livingCellCount = 0
         self.__currentGeo = 'bowl'
-        self.create_neighbors()
-        self.__timeline = []
+        self.__engine = World.engines[engine](rows, columns, self.__currentGeo)
+        self.__rule = Rule.get('B3/S23')
+        self.__generation = 0
+        self.__cycle = CycleDetector()
+        self.__history = History()
+        self.__recorder = None
+        self.__soup = None
+        self.__edited = True
 
     def __str__(self):
         """Return a string that represents the current generation. For example,
@@ -42,371 +128,515 @@ class World(object):
         .....
         .....
         A world (4x5) with one living cell would look like this, assuming
-        that Cell.liveChar is an 'X' at position self.__grid[1][3]:
+        that Cell.liveChar is an 'X' at position (1, 3):
         .....
         ...X.
         .....
         .....
-        Of course, you would not check on Cell.deadChar or Cell.liveChar. You
-        would rely on the cell to know how it should be printed.
-        """
-        string = ''
-        for row in self.__grid:
-            for cell in row:
-                string += cell.__str__()
-            string += '\n'
-        return string
-
-    def create_grid(self):
-        """Return the grid as a list of lists. There should be one list
-        to contain the entire grid and in that list there should be one
-        list to contain each row in the generation. Each of the "row lists"
-        should contain one object of class Cell for each column in the world."""
-
-        grid = []
-        for rowNumber in range(self.__rows):
-            row = []
-            for columnNumber in range(self.__columns):
-                row.append(Cell(rowNumber, columnNumber))
-            grid.append(row)
-        return grid
-
-    def create_neighbors(self):
-        if self.__currentGeo == 'bowl':
-            World.bowl_neighbors(self)
-        elif self.__currentGeo == 'torus':
-            World.torus_neighbors(self)
-
-    def bowl_neighbors(self):
-        """Loop through the grid and assign the neighbors to each cell."""
-        #print('---creating neighbors---')
-        for row in self.__grid:
-            for cell in row:
-                #
-                # There are some nine situations that we have to account for:
-                #
-                # 1. upper left corner (3 neighbors)
-                # 2. rest of the top row (5 neighbors)
-                # 3. upper right corner (3 neighbors)
-                # 4. far left side (5 neighbors)
-                # 5. normal cells (8 neighbors)
-                # 6. far right side (5 neighbors)
-                # 7. lower left corner (3 neighbors)
-                # 8. rest of bottom row (5 neighbors)
-                # 9. lower right corner (3 neighbors)
-                #
-                row = cell.get_row()
-                column = cell.get_column()
-                #print(f'({row},{column})')
-                # top row
-                if row == 0:
-                    # 1. upper left corner (3 neighbors)
-                    if column == 0:
-                        #print('upper left')
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 2. rest of the top row (5 neighbors)
-                    elif column < (self.__columns - 1):
-                        #print('upper row')
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 3. upper right corner (3 neighbors)
-                    else:
-                        #print('upper right')
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                # middle row
-                elif row < (self.__rows - 1):
-                    # 4. far left side (5 neighbors)
-                    if column == 0:
-                        #print('left side')
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 5. normal cells (8 neighbors)
-                    elif column < (self.__columns - 1):
-                        #print('middle')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 6. far right side (5 neighbors)
-                    else:
-                        #print('right side')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                # bottom row
-                else:
-                    # 7. lower left corner (3 neighbors)
-                    if column == 0:
-                        #print('lower left')
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                    # 8. rest of the bottom row (5 neighbors)
-                    elif column < (self.__columns - 1):
-                        #print('lower row')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                    # 9. lower right corner (3 neighbors)
-                    else:
-                        #print('lower right')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row][column - 1])
+        """
+        #
+        # Add a column of 2s to the end of every row for the newlines and
+        # translate the whole board to characters in one go.
+        #
+        cells = self.__engine.get_cells()
+        board = numpy.full((self.__rows, self.__columns + 1), 2, dtype=numpy.uint8)
+        board[:, :-1] = cells
+        table = {0: Cell.deadChar, 1: Cell.liveChar, 2: '\n'}
+        return board.tobytes().decode('latin-1').translate(table)
+
+    def get_cell(self, row, column):
+        """
+        Return a Cell for the given position. The world doesn't keep Cell
+        objects around; this one is only a view of the world, so it is
+        always up to date and setting it changes the world.
+        :param row: row of the cell.
+        :param column: column of the cell.
+        :return: a Cell object.
+        """
+        return Cell(row, column, self)
+
+    def is_living(self, row, column):
+        """Return whether the cell at (row, column) is alive."""
+        return self.__engine.get_cell(row, column)
+
+    def neighbors_of(self, row, column):
+        """Return a list of the (row, column) positions of a cell's neighbors."""
+        if self.__currentGeo == 'plane':
+            return [(row + rowOffset, column + columnOffset)
+                    for rowOffset, columnOffset in Topology.offsets]
+        topology = Topology.get(self.__rows, self.__columns, self.__currentGeo)
+        return topology.neighbors_of(row, column)
 
     def set_cell(self, row, column, living):
-        """Change the state of the cell at self.__grid[row][column] to the
-         value of living."""
-        self.__grid[row][column].set_living(living)
+        """Change the state of the cell at (row, column) to the value of living."""
+        if not isinstance(living, bool):
+            raise TypeError('state must be boolean.')
+        self.__engine.set_cell(row, column, living)
+        self.__soup = None
+        self.edited()
 
     def set_geometry(self, userGeo):
-        if userGeo == 1:
-            self.__currentGeo = 'bowl'
+        """
+        Change the shape of the world.
+        :param userGeo: A key to the Geometry.geometries, or its number in
+                        Geometry.names counting from 1 (1 for a bowl, 2 for
+                        a torus, 3 for the unbounded plane and so on).
+        :return: None
+        """
+        if isinstance(userGeo, int):
+            geometry = Geometry.names[userGeo - 1]
         else:
-            self.__currentGeo = 'torus'
+            geometry = Geometry.get(userGeo).name
+        if geometry not in self.__engine.geometries:
+            raise ValueError(f'The {self.__engine.name} engine only supports {self.__engine.geometries}.')
+        self.__currentGeo = geometry
+        self.__engine.set_geometry(geometry)
+        self.edited()
 
+    def get_geometry(self):
+        return self.__currentGeo
 
-    def next_generation(self):
-        """Changes the grid to the next generation after following the
-        propagation rules. """
-        self.__livingCellCount = 0
-        newGrid = self.create_grid()
-        for row in self.__grid:
-            for cell in row:
-                if cell.get_living() == True:
-                    if cell.living_neighbors() in [2, 3]:
-                        newGrid[cell.get_row()][cell.get_column()].set_living(True)
-                        self.__livingCellCount += 1
-                else:
-                    if cell.living_neighbors() == 3:
-                        newGrid[cell.get_row()][cell.get_column()].set_living(True)
-                        self.__livingCellCount += 1
-        self.__grid = newGrid
-        self.create_neighbors()
-
-    def randomize(self, percent):
-        """Randomly make each cell in the world alive based on the percent given."""
-        self.__livingCellCount = 0
-        for row in self.__grid:
-            for cell in row:
-                if random.randint(0,100) <= percent:
-                    cell.set_living(True)
-                    self.__livingCellCount += 1
-                else:
-                    cell.set_living(False)
-
-
-    def torus_neighbors(self):
-        """
-        Loop through the grid and assign the neighbors to each cell.
+    def set_rule(self, rule):
+        """
+        Change the rule the world runs by. The rule is compiled once into
+        lookup tables (see Rule), so any rule steps about as fast as any
+        other. Larger than Life rules (see RangeRule) need the ltl engine.
+        :param rule: a Rule or RangeRule, a string like 'B36/S23' or
+                     'R5,C0,M1,S34..58,B34..45,NM', or a name in Rule.names
+                     or RangeRule.names.
         :return: None
         """
-        # print('---creating neighbors---')
-        for row in self.__grid:
-            for cell in row:
-                #
-                # There are some nine situations that we have to account for:
-                #
-                # 1. upper left corner (3 neighbors)
-                # 2. rest of the top row (5 neighbors)
-                # 3. upper right corner (3 neighbors)
-                # 4. far left side (5 neighbors)
-                # 5. normal cells (8 neighbors)
-                # 6. far right side (5 neighbors)
-                # 7. lower left corner (3 neighbors)
-                # 8. rest of bottom row (5 neighbors)
-                # 9. lower right corner (3 neighbors)
-                #
-                row = cell.get_row()
-                column = cell.get_column()
-                # print(f'({row},{column})')
-                # top row
-                if row == 0:
-                    # 1. upper left corner (3 neighbors)
-                    if column == 0:
-                        # print('upper left')
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column + 1])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row + 1][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 2. rest of the top row (5 neighbors)
-                    elif column < (self.__columns - 1):
-                        # print('upper row')
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column - 1])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column + 1])
-                    # 3. upper right corner (3 neighbors)
-                    else:
-                        # print('upper right')
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][0])
-                        cell.add_neighbor(self.__grid[row][0])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][0])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column])
-                        cell.add_neighbor(self.__grid[self.__rows - 1][column - 1])
-
-                # middle row
-                elif row < (self.__rows - 1):
-                    # 4. far left side (5 neighbors)
-                    if column == 0:
-                        # print('left side')
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row - 1][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row + 1][self.__columns - 1])
-                    # 5. normal cells (8 neighbors)
-                    elif column < (self.__columns - 1):
-                        # print('middle')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row + 1][column + 1])
-                    # 6. far right side (5 neighbors)
-                    else:
-                        # print('right side')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column - 1])
-                        cell.add_neighbor(self.__grid[row + 1][column])
-                        cell.add_neighbor(self.__grid[row][0])
-                        cell.add_neighbor(self.__grid[row + 1][0])
-                        cell.add_neighbor(self.__grid[row - 1][0])
-                # bottom row
-                else:
-                    # 7. lower left corner (3 neighbors)
-                    if column == 0:
-                        # print('lower left')
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[0][column + 1])
-                        cell.add_neighbor(self.__grid[0][column])
-                        cell.add_neighbor(self.__grid[0][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row][self.__columns - 1])
-                        cell.add_neighbor(self.__grid[row - 1][self.__columns - 1])
-                    # 8. rest of the bottom row (5 neighbors)
-                    elif column < (self.__columns - 1):
-                        # print('lower row')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row - 1][column + 1])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[row][column + 1])
-                        cell.add_neighbor(self.__grid[0][column])
-                        cell.add_neighbor(self.__grid[0][column + 1])
-                        cell.add_neighbor(self.__grid[0][column - 1])
-                    # 9. lower right corner (3 neighbors)
-                    else:
-                        # print('lower right')
-                        cell.add_neighbor(self.__grid[row - 1][column - 1])
-                        cell.add_neighbor(self.__grid[row - 1][column])
-                        cell.add_neighbor(self.__grid[row][column - 1])
-                        cell.add_neighbor(self.__grid[0][column - 1])
-                        cell.add_neighbor(self.__grid[0][column])
-                        cell.add_neighbor(self.__grid[0][0])
-                        cell.add_neighbor(self.__grid[row][0])
-                        cell.add_neighbor(self.__grid[row - 1][0])
+        rule = Rule.get(rule)
+        self.check_range(self.__engine, rule)
+        self.__engine.set_rule(rule)
+        self.__rule = rule
+        self.edited()
 
-    def set_cell(self, row, column, living):
-        """Change the state of the cell at self.__grid[row][column] to the
-         value of living."""
-        self.__grid[row][column].set_living(living)
+    def get_rule(self):
+        """Returns the Rule (or RangeRule) the world runs by."""
+        return self.__rule
+
+    def check_range(self, engine, rule):
+        """Raise a ValueError if an engine (or engine class) can't reach as
+        far as a rule's neighborhood does. Engines that can have maxRange;
+        the others only look at the 8 cells next to each cell."""
+        if rule.range > getattr(engine, 'maxRange', 1):
+            raise ValueError(f'The {engine.name} engine can\'t run {rule}, use the ltl engine.')
+
+    def set_engine(self, engine):
+        """
+        Move the world over to a different stepping engine.
+        :param engine: A key to the engines
+        :return: None
+        """
+        legalValues = World.engines.keys()
+        if engine in legalValues:
+            if self.__currentGeo not in World.engines[engine].geometries:
+                raise ValueError(f'The {engine} engine does not support the {self.__currentGeo} geometry.')
+            self.check_range(World.engines[engine], self.__rule)
+            newEngine = World.engines[engine](self.__rows, self.__columns, self.__currentGeo)
+            newEngine.set_rule(self.__rule)
+            oldEngine = self.__engine
+            self.__engine = newEngine
+            #
+            # On the plane there can be living cells outside the window.
+            #
+            if self.__currentGeo == 'plane':
+                self.__engine.set_living(oldEngine.get_living())
+            else:
+                self.__engine.set_cells(oldEngine.get_cells())
+            if hasattr(oldEngine, 'close'):
+                oldEngine.close()
+            self.edited()
+        else:
+            raise ValueError(f'Engine must be in {legalValues}.')
+
+    def get_engine(self):
+        return self.__engine.name
+
+    def set_workers(self, workers):
+        """
+        Change how many workers the engine splits each generation between.
+        :param workers: number of workers.
+        :return: None
+        """
+        if hasattr(self.__engine, 'set_workers'):
+            self.__engine.set_workers(workers)
+        else:
+            raise ValueError(f'The {self.__engine.name} engine only has one worker.')
+
+    def get_cells(self):
+        """Return the board (the window of it on the unbounded plane) as a
+        (rows, columns) uint8 array. Don't change it or keep it."""
+        return self.__engine.get_cells()
+
+    def set_cells(self, cells):
+        """Replace the whole board with a (rows, columns) array of 0s and 1s."""
+        self.__engine.set_cells(cells)
+        self.__soup = None
+        self.edited()
+
+    def get_positions(self, rows, columns):
+        """
+        Return the cells at many positions at once.
+        :param rows: array of rows.
+        :param columns: array of columns, the same length.
+        :return: uint8 array of 0s and 1s.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64).ravel()
+        columns = numpy.asarray(columns, dtype=numpy.int64).ravel()
+        if hasattr(self.__engine, 'get_positions'):
+            return self.__engine.get_positions(rows, columns)
+        if self.__currentGeo == 'plane':
+            return numpy.array([self.__engine.get_cell(row, column)
+                                for row, column in zip(rows.tolist(), columns.tolist())], dtype=numpy.uint8)
+        return self.__engine.get_cells()[rows, columns]
+
+    def set_positions(self, rows, columns, living=True, blend='replace'):
+        """
+        Change many cells at once. Cells that fall outside a bounded world
+        are left out; on the unbounded plane they are kept.
+        :param rows: array of rows.
+        :param columns: array of columns, the same length.
+        :param living: True or False for all of them, or an array of them.
+        :param blend: 'replace' sets the cells to living, 'or' only makes
+                      cells alive where living is True, and 'xor' flips the
+                      cells where living is True. When a position comes up
+                      more than once, 'replace' keeps it alive if any of
+                      them is, and 'xor' flips it once for each.
+        :return: None
+        """
+        rows, columns, living = [array.ravel() for array in numpy.broadcast_arrays(
+            numpy.asarray(rows, dtype=numpy.int64), numpy.asarray(columns, dtype=numpy.int64),
+            numpy.asarray(living, dtype=bool))]
+        if blend not in ('replace', 'or', 'xor'):
+            raise ValueError("Blend must be 'replace', 'or' or 'xor'.")
+        if self.__currentGeo != 'plane':
+            inside = (rows >= 0) & (rows < self.__rows) & (columns >= 0) & (columns < self.__columns)
+            rows, columns, living = rows[inside], columns[inside], living[inside]
+        if blend != 'replace':
+            rows, columns = rows[living], columns[living]
+        if not rows.size:
+            return
+        #
+        # Put repeated positions together, so that every engine ends up
+        # with the same cells.
+        #
+        order = numpy.lexsort((columns, rows))
+        rows, columns = rows[order], columns[order]
+        starts = numpy.flatnonzero(numpy.concatenate(([True], (numpy.diff(rows) != 0) | (numpy.diff(columns) != 0))))
+        if blend == 'replace':
+            living = numpy.logical_or.reduceat(living[order], starts)
+        elif blend == 'or':
+            living = numpy.ones(starts.size, dtype=bool)
+        else:
+            flips = numpy.diff(numpy.concatenate((starts, [rows.size])))
+            starts = starts[flips % 2 == 1]
+        rows, columns = rows[starts], columns[starts]
+        if blend == 'xor':
+            living = self.get_positions(rows, columns) == 0
+        living = living.astype(numpy.uint8)
+        if hasattr(self.__engine, 'set_positions'):
+            self.__engine.set_positions(rows, columns, living)
+        elif self.__currentGeo == 'plane':
+            for row, column, alive in zip(rows.tolist(), columns.tolist(), living.tolist()):
+                self.__engine.set_cell(row, column, bool(alive))
+        else:
+            cells = self.__engine.get_cells().copy()
+            cells[rows, columns] = living
+            self.__engine.set_cells(cells)
+        self.__soup = None
+        self.edited()
+
+    def set_mask(self, mask, top=0, left=0, living=True):
+        """Set the cells where a two dimensional array is True (or not 0),
+        with the array's top left corner at (top, left), to living."""
+        maskRows, maskColumns = numpy.nonzero(numpy.asarray(mask))
+        self.set_positions(maskRows + top, maskColumns + left, living)
+
+    def fill_rectangle(self, top, left, height, width, living=True):
+        """Make every cell in a rectangle alive, or dead."""
+        rectangleRows, rectangleColumns = numpy.mgrid[top:top + height, left:left + width]
+        self.set_positions(rectangleRows, rectangleColumns, living)
+
+    def clear_rectangle(self, top, left, height, width):
+        """Kill every cell in a rectangle."""
+        self.fill_rectangle(top, left, height, width, False)
+
+    def stamp(self, pattern, top, left, turns=0, flip=False, blend='or'):
+        """
+        Put a pattern into the world, or many copies of it.
+        :param pattern: (patternRows, patternColumns, livingRows,
+                        livingColumns, rule) as read_pattern and
+                        Library.load return it, or a two dimensional array
+                        of 0s and 1s.
+        :param top: the row of the pattern's top left corner, or an array of
+                    them to stamp a copy at each.
+        :param left: the column of the corner, or an array of them.
+        :param turns: quarter turns clockwise.
+        :param flip: mirror the pattern left to right before turning it.
+        :param blend: 'or' adds the pattern's living cells, 'xor' flips the
+                      cells under them and 'replace' makes the world look
+                      like the pattern, dead cells too, in its rectangle.
+        :return: None
+        """
+        if isinstance(pattern, tuple):
+            patternRows, patternColumns, livingRows, livingColumns = pattern[:4]
+        else:
+            pattern = numpy.asarray(pattern)
+            patternRows, patternColumns = pattern.shape
+            livingRows, livingColumns = numpy.nonzero(pattern)
+        patternRows, patternColumns, livingRows, livingColumns = transform(
+            patternRows, patternColumns, livingRows, livingColumns, turns, flip)
+        if blend == 'replace':
+            area = numpy.zeros((patternRows, patternColumns), dtype=bool)
+            area[livingRows, livingColumns] = True
+            livingRows, livingColumns = numpy.mgrid[:patternRows, :patternColumns]
+            living = area.ravel()
+        else:
+            living = numpy.ones(len(livingRows), dtype=bool)
+        top = numpy.asarray(top, dtype=numpy.int64).reshape(-1, 1)
+        left = numpy.asarray(left, dtype=numpy.int64).reshape(-1, 1)
+        self.set_positions(top + livingRows.reshape(1, -1), left + livingColumns.reshape(1, -1),
+                           living.reshape(1, -1), blend)
+
+    def get_state(self):
+        """Return what the CycleDetector needs to know about the world: the
+        board, or the set of living cells on the unbounded plane."""
+        if self.__currentGeo == 'plane':
+            return self.__engine.get_living()
+        return self.__engine.get_cells()
+
+    def edited(self):
+        """Note that the world was changed by something other than stepping,
+        so the cycle detector has to start over and the history has to take
+        a fresh look at this generation."""
+        self.__cycle.reset()
+        self.__edited = True
+
+    def record(self):
+        """Tell the cycle detector and the history about this generation."""
+        self.__cycle.record(self.__generation, self.get_state())
+        if self.__history is not None and self.__currentGeo != 'plane':
+            self.__history.record(self.__generation, self.__engine.get_cells())
+        if self.__recorder is not None and self.__currentGeo != 'plane':
+            self.__recorder.record(self.__generation, self.__engine.get_cells())
+
+    def catch_up(self):
+        """Record this generation if the world was edited since it was."""
+        if self.__edited:
+            self.record()
+            self.__edited = False
 
     def next_generation(self):
-        """Changes the grid to the next generation after following the
+        """Changes the world to the next generation after following the
         propagation rules. """
-        self.__livingCellCount = 0
-        newGrid = self.create_grid()
-        for row in self.__grid:
-            for cell in row:
-                if cell.get_living() == True:
-                    if cell.living_neighbors() in [2, 3]:
-                        newGrid[cell.get_row()][cell.get_column()].set_living(True)
-                        self.__livingCellCount += 1
-                else:
-                    if cell.living_neighbors() == 3:
-                        newGrid[cell.get_row()][cell.get_column()].set_living(True)
-                        self.__livingCellCount += 1
-        self.__grid = newGrid
-        self.create_neighbors()
-        #self._generation += 1
-        #todo Make sure I add the basic display string.
-        self.__timeline.append(self.__str__())
+        self.catch_up()
+        self.__engine.step()
+        self.__generation += 1
+        self.record()
+
+    def advance(self, generations):
+        """
+        Move the world forward a number of generations at once. Engines that
+        can jump ahead (like hashlife) do it in one go, the others step one
+        generation at a time.
+        :param generations: how many generations to move forward.
+        :return: None
+        """
+        if hasattr(self.__engine, 'advance'):
+            self.__engine.advance(generations)
+        else:
+            for generation in range(generations):
+                self.__engine.step()
+        self.__generation += generations
+        self.edited()
+
+    def rewind(self, generation):
+        """
+        Put the world back the way it was at an earlier generation.
+        :param generation: a generation inside get_history_range().
+        :return: None
+        """
+        if self.__currentGeo == 'plane':
+            raise ValueError('The unbounded plane has no history.')
+        if self.__history is None:
+            raise ValueError('This world keeps no history.')
+        self.catch_up()
+        self.__engine.set_cells(self.__history.seek(generation))
+        self.__generation = generation
+        self.__cycle.reset()
+        self.__cycle.record(generation, self.get_state())
+
+    def get_history_range(self):
+        """Returns (first, last), the generations rewind can go to, or None."""
+        self.catch_up()
+        if self.__history is None:
+            return None
+        return self.__history.get_range()
+
+    def set_history(self, keep):
+        """Turn keeping a history for rewind on or off. Runs that will never
+        be rewound are faster without it."""
+        if not keep:
+            self.__history = None
+        elif self.__history is None:
+            self.__history = History()
+            self.edited()
+
+    def start_recording(self, filename):
+        """
+        Write every generation from now on to a recording, which can be
+        played back with trajectory.py. Recording the unbounded plane isn't
+        possible.
+        :param filename: path and filename of the recording.
+        :return: None
+        """
+        if self.__currentGeo == 'plane':
+            raise ValueError('The unbounded plane can not be recorded.')
+        self.stop_recording()
+        self.__recorder = Recorder(filename, self.__rows, self.__columns, self.__currentGeo, str(self.__rule))
+        self.edited()
+
+    def stop_recording(self):
+        """Finish the recording, if there is one."""
+        if self.__recorder is not None:
+            self.catch_up()
+            self.__recorder.close()
+            self.__recorder = None
+
+    def is_recording(self):
+        return self.__recorder is not None
 
     def is_stable(self):
-        stable = False
-        currentWorld = self.__str__()
-        for lastWorld in self.__timeline[-4:-1]:
-            if currentWorld == lastWorld:
-                stable = True
-        return stable
-
-
-
-    def randomize(self, percent):
-        """Randomly make each cell in the world alive based on the percent given."""
-        self.__livingCellCount = 0
-        for row in self.__grid:
-            for cell in row:
-                if random.randint(0,100) <= percent:
-                    cell.set_living(True)
-                    self.__livingCellCount += 1
-                else:
-                    cell.set_living(False)
+        """Return True once the world has come back to a state it was in
+        before, which means it will repeat forever."""
+        return self.__cycle.get_cycle() is not None
+
+    def get_cycle(self):
+        """Return (start, period) once the world repeats: the generation the
+        cycle started in and how many generations it takes. Else None."""
+        return self.__cycle.get_cycle()
+
+    def randomize(self, percent, seed=None, region=None, symmetry='C1'):
+        """
+        Fill the world with a random soup. The soup only depends on the
+        arguments, so get_soup is enough to make the same one again.
+        :param percent: the chance, from 0 to 100, that a cell is alive.
+        :param seed: seed for the random numbers, or None for a new one.
+        :param region: (top, left, height, width) of the part to fill, with
+                       the rest of the world dead, or None for all of it.
+        :param symmetry: one of World.symmetries: 'C1' for none, 'C2' for
+                         the same turned half way round, 'C4' for the same
+                         turned a quarter (the region has to be square) and
+                         'D8' for that and mirrored too.
+        :return: None
+        """
+        if seed is None:
+            seed = int(numpy.random.SeedSequence().generate_state(1)[0])
+        top, left, height, width = region if region is not None else (0, 0, self.__rows, self.__columns)
+        if top < 0 or left < 0 or top + height > self.__rows or left + width > self.__columns:
+            raise ValueError(f'The region must be inside the {self.__rows}x{self.__columns} world.')
+        if symmetry not in World.symmetries:
+            raise ValueError(f'Symmetry must be in {World.symmetries}.')
+        if symmetry in ('C4', 'D8') and height != width:
+            raise ValueError(f'{symmetry} soups have to be square.')
+        generator = numpy.random.default_rng(seed)
+        #
+        # A cell is alive when a 16 bit random number is below the percent
+        # of 65536, so 0% is all dead and 100% is all alive. The numbers are
+        # made a band of rows at a time to keep the memory down.
+        #
+        threshold = round(min(max(percent, 0), 100) * 65536 / 100)
+        soup = numpy.empty((height, width), dtype=bool)
+        band = max(1, World.randomBand // max(width, 1))
+        for row in range(0, height, band):
+            numbers = generator.integers(0, 65536, size=(min(band, height - row), width), dtype=numpy.uint16)
+            numpy.less(numbers, threshold, out=soup[row:row + band])
+        if symmetry != 'C1':
+            soup = World.make_symmetric(soup, symmetry)
+        if region is None:
+            self.__engine.set_cells(soup)
+        else:
+            cells = numpy.zeros((self.__rows, self.__columns), dtype=numpy.uint8)
+            cells[top:top + height, left:left + width] = soup
+            self.__engine.set_cells(cells)
+        self.__soup = {'seed': seed, 'percent': percent, 'region': region, 'symmetry': symmetry}
+        self.edited()
+
+    @classmethod
+    def make_symmetric(cls, cells, symmetry):
+        """
+        Return a copy of a rectangle of cells with a symmetry, made by
+        giving each cell the value of the first cell, in reading order, of
+        the ones the symmetry moves it to.
+        """
+        height, width = cells.shape
+        rows = numpy.arange(height, dtype=numpy.int64)[:, None]
+        columns = numpy.arange(width, dtype=numpy.int64)[None, :]
+        images = [(height - 1 - rows, width - 1 - columns)]
+        if symmetry in ('C4', 'D8'):
+            images += [(columns, height - 1 - rows), (width - 1 - columns, rows)]
+        if symmetry == 'D8':
+            images += [(rows, width - 1 - columns), (height - 1 - rows, columns),
+                       (columns, rows), (width - 1 - columns, height - 1 - rows)]
+        first = rows * width + columns
+        for imageRows, imageColumns in images:
+            first = numpy.minimum(first, imageRows * width + imageColumns)
+        return cells.ravel()[first]
+
+    def get_soup(self):
+        """Return how the last soup was made (seed, percent, region and
+        symmetry, the arguments to randomize), or None if the world wasn't
+        made by randomize or was changed by hand since."""
+        return dict(self.__soup) if self.__soup is not None else None
+
+    def describe_soup(self):
+        """Return the soup as a line of text for saved files, or None."""
+        if self.__soup is None:
+            return None
+        text = f'seed {self.__soup["seed"]}, {self.__soup["percent"]:g}%, {self.__soup["symmetry"]}'
+        if self.__soup['region'] is not None:
+            text += ', region {} {} {}x{}'.format(*self.__soup['region'])
+        return text
 
     def save(self, filename):
         """
-        Save the world as a text file.
-        :param filename: path and filename with '.life' at the end.
+        Save the world and its rule, in the format the extension says:
+        '.life' for the binary format with one bit per cell, '.rle' for RLE
+        and '.cells' for plaintext (where the rule is a comment).
+        :param filename: path and filename with the extension at the end.
         :return: None
         """
-        currentDisplaySet = Cell.currentDisplaySet
-        Cell.set_display('basic')
-        text = self.__str__()
-        Cell.set_display(currentDisplaySet)
-        with open(filename, 'w') as myFile:
-            myFile.write(text)
+        soup = self.describe_soup()
+        if filename.lower().endswith('.life'):
+            save_life(filename, self.__engine.get_cells(), self.__generation, self.__currentGeo,
+                      str(self.__rule), soup or '')
+            return
+        comments = [f'generation {self.__generation}, {self.__currentGeo}']
+        if soup is not None:
+            comments.append(f'soup {soup}')
+        if filename.lower().endswith('.cells'):
+            comments.append(f'rule {self.__rule}')
+        livingRows, livingColumns = self.get_living_positions()
+        write_pattern(filename, self.__rows, self.__columns, livingRows, livingColumns, str(self.__rule),
+                      comments)
+
+    def get_living_positions(self):
+        """
+        Return where the living cells in the window are, without looking at
+        every dead cell when the engine keeps a set of the living ones.
+        :return: (rows, columns) arrays.
+        """
+        if hasattr(self.__engine, 'get_living'):
+            inside = [(row, column) for row, column in self.__engine.get_living()
+                      if 0 <= row < self.__rows and 0 <= column < self.__columns]
+            positions = numpy.array(inside, dtype=numpy.int64).reshape(-1, 2)
+            return positions[:, 0], positions[:, 1]
+        return numpy.nonzero(self.__engine.get_cells())
 
     def get_living_cell_count(self):
-        return self.__livingCellCount
+        return self.__engine.population()
 
     def get_rows(self):
         return self.__rows
@@ -415,4 +645,12 @@ class World(object):
         return self.__columns
 
     def get_generation(self):
-        return self.get_generation
\ No newline at end of file
+        return self.__generation
+
+    def set_generation(self, generation):
+        """Say which generation the world is on, for a world that was run
+        somewhere else. The history starts over from here."""
+        self.__generation = generation
+        if self.__history is not None:
+            self.__history.reset()
+        self.edited()